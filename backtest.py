@@ -0,0 +1,188 @@
+"""Backtest histórico: o mesmo contrato assinado em cada mês desde o Plano Real.
+
+As séries do SGS (INCC, IPCA, TR, Poupança) são buscadas uma única vez; para
+cada mês de início os índices reais são recortados do histórico com a mesma
+defasagem usada em `buscar_indices_bc`, e todos os inícios são avaliados num
+único lote pelo motor vetorizado. O resultado traz custo total, maior parcela e
+CET de cada cenário por mês de assinatura, além da distribuição desses valores.
+
+Uso:
+    python backtest.py --params contrato.json --inicio 07/1994 --saida backtest.csv
+    python backtest.py --sgs-local
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from motor import CODIGOS_SGS, DEFASAGEM_INDICES, buscar_series_bc
+from motor_vetorizado import CENARIOS, data_do_mes_absoluto, mes_absoluto, simular_cenarios_lote
+
+INICIO_PLANO_REAL = '07/1994'
+
+MODOS = ('hibrido', 'puro')
+
+METRICAS = ('custo_total', 'maior_parcela', 'cet')
+
+# ============================================
+# HISTÓRICO DE ÍNDICES
+# ============================================
+
+def carregar_historico(inicio=INICIO_PLANO_REAL, fim=None):
+    """Busca no SGS, numa única chamada, as séries mensais de `inicio` (MM/AAAA) até `fim` (padrão: hoje)."""
+    data_inicio = datetime.strptime(inicio, "%m/%Y") - relativedelta(months=DEFASAGEM_INDICES)
+    data_fim = datetime.strptime(fim, "%m/%Y") if fim else datetime.now()
+    return buscar_series_bc(data_inicio, data_fim)
+
+
+def _vetores_historico(historico):
+    """Converte o DataFrame do SGS em vetores indexados por mês absoluto."""
+    meses = np.array([mes_absoluto(d) for d in historico.index], dtype=np.int64)
+    primeiro = int(meses.min())
+    vetores = {}
+    for chave in CODIGOS_SGS.values():
+        vetor = np.full(int(meses.max()) - primeiro + 1, np.nan)
+        if chave in historico:
+            vetor[meses - primeiro] = historico[chave].to_numpy(dtype=float)
+        vetores[chave] = vetor
+    return primeiro, vetores
+
+
+def series_por_inicio(historico, meses_primeira_parcela, largura):
+    """Recorta o histórico para cada contrato: posição m-1 = índice aplicado na parcela m.
+
+    Retorna ({chave: matriz (contratos x largura)}, último mês com algum dado real por contrato).
+    """
+    primeiro, vetores = _vetores_historico(historico)
+    posicoes = np.asarray(meses_primeira_parcela, dtype=np.int64)[:, None] - DEFASAGEM_INDICES + np.arange(largura)[None, :] - primeiro
+    dentro = (posicoes >= 0) & (posicoes < len(next(iter(vetores.values()))))
+    posicoes = np.clip(posicoes, 0, None)
+    series = {}
+    algum_dado = np.zeros(posicoes.shape, dtype=bool)
+    for chave, vetor in vetores.items():
+        matriz = np.where(dentro, vetor[np.minimum(posicoes, len(vetor) - 1)], np.nan)
+        series[chave] = matriz
+        algum_dado |= ~np.isnan(matriz)
+    colunas = np.arange(1, largura + 1)[None, :]
+    ultimo_mes = np.where(algum_dado, colunas, 0).max(axis=1) if largura else np.zeros(len(posicoes), dtype=np.int64)
+    return series, ultimo_mes
+
+# ============================================
+# BACKTEST
+# ============================================
+
+def _deslocar(mes_ano, meses):
+    return (datetime.strptime(mes_ano, "%m/%Y") + relativedelta(months=meses)).strftime("%m/%Y")
+
+
+def executar_backtest(params, params_banco, historico, inicio=INICIO_PLANO_REAL, fim=None, modo='hibrido', cenarios=CENARIOS, diagnosticos=None):
+    """Avalia o contrato assinado em cada mês entre `inicio` e `fim` (padrão: último mês do histórico).
+
+    As distâncias entre início da obra, assinatura e primeira parcela são
+    mantidas. No modo 'hibrido' os meses sem índice real usam as médias dos
+    parâmetros; no modo 'puro' a correção do cenário da construtora é limitada
+    ao último mês com dado real (como no botão "Simular Apenas com BC", que não
+    limita os cenários com banco) e inícios sem nenhum dado são descartados.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"modo deve ser um de {list(MODOS)}")
+    if historico.empty:
+        raise ValueError("histórico de índices vazio")
+
+    data_assinatura = datetime.strptime(params['mes_assinatura'], "%m/%Y")
+    carencia = mes_absoluto(datetime.strptime(params['mes_primeira_parcela'], "%m/%Y")) - mes_absoluto(data_assinatura)
+    obra_antes = mes_absoluto(data_assinatura) - mes_absoluto(params['data_inicio_obra'])
+
+    primeiro = mes_absoluto(datetime.strptime(inicio, "%m/%Y"))
+    ultimo = mes_absoluto(datetime.strptime(fim, "%m/%Y")) if fim else mes_absoluto(historico.index.max())
+    inicios = np.arange(primeiro, ultimo + 1)
+    if len(inicios) == 0:
+        raise ValueError("intervalo de inícios vazio")
+
+    lista_params = []
+    for mes in inicios:
+        mes_ano = data_do_mes_absoluto(mes).strftime("%m/%Y")
+        lista_params.append(dict(
+            params,
+            mes_assinatura=mes_ano,
+            mes_primeira_parcela=_deslocar(mes_ano, carencia),
+            data_inicio_obra=(data_do_mes_absoluto(mes) - relativedelta(months=obra_antes)).date(),
+        ))
+
+    largura = params.get('num_parcelas_entrada', 0) + params['meses_pre'] + params['meses_pos']
+    series, ultimo_mes_real = series_por_inicio(historico, inicios + carencia, largura)
+
+    if modo == 'puro':
+        com_dado = ultimo_mes_real > 0
+        lista_params = [p for p, ok in zip(lista_params, com_dado) if ok]
+        inicios, ultimo_mes_real = inicios[com_dado], ultimo_mes_real[com_dado]
+        series = {chave: matriz[com_dado] for chave, matriz in series.items()}
+
+    resultados = {}
+    if modo == 'puro' and 'construtora' in cenarios:
+        # Como no botão, o limite de correção vale só para o cenário da construtora
+        limitados = [dict(p, limite_correcao=int(u)) for p, u in zip(lista_params, ultimo_mes_real)]
+        resultados.update(simular_cenarios_lote(limitados, params_banco, cenarios=('construtora',), diagnosticos=diagnosticos, series_reais=series))
+    restantes = tuple(c for c in cenarios if c not in resultados)
+    if restantes:
+        resultados.update(simular_cenarios_lote(lista_params, params_banco, cenarios=restantes, diagnosticos=diagnosticos, series_reais=series))
+
+    colunas = {}
+    for cenario in cenarios:
+        r = resultados[cenario]
+        for metrica in METRICAS:
+            colunas[(cenario, metrica)] = np.where(r['valido'], r[metrica], np.nan)
+    tabela = pd.DataFrame(colunas, index=pd.DatetimeIndex([data_do_mes_absoluto(m) for m in inicios], name='Assinatura'))
+    tabela.columns = pd.MultiIndex.from_tuples(tabela.columns, names=['cenario', 'metrica'])
+    tabela[('indices', 'meses_com_dado_real')] = ultimo_mes_real
+    return tabela
+
+
+def distribuicao_backtest(tabela, percentis=(0.05, 0.25, 0.5, 0.75, 0.95)):
+    """Distribuição (média, desvio, mínimo, percentis, máximo) de cada métrica de cada cenário."""
+    metricas = tabela.drop(columns='indices', level=0, errors='ignore')
+    return metricas.describe(percentiles=list(percentis)).T
+
+# ============================================
+# LINHA DE COMANDO
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest histórico do contrato para cada mês de assinatura")
+    parser.add_argument('--params', help="JSON no formato das requisições do servico.py (padrão: contrato de exemplo)")
+    parser.add_argument('--inicio', default=INICIO_PLANO_REAL)
+    parser.add_argument('--fim')
+    parser.add_argument('--modo', choices=MODOS, default='hibrido')
+    parser.add_argument('--saida', help="grava a tabela completa em CSV")
+    parser.add_argument('--sgs-local', action='store_true', help="usa séries sintéticas locais no lugar da API do BC")
+    args = parser.parse_args()
+
+    if args.sgs_local:
+        import sgs_local
+        sys.modules['sgs'] = sgs_local
+    import servico
+
+    corpo = servico.PAYLOAD_EXEMPLO
+    if args.params:
+        with open(args.params, encoding='utf-8') as arquivo:
+            corpo = json.load(arquivo)
+    params, params_banco, _, erros = servico.validar_requisicao(corpo)
+    if erros:
+        print("\n".join(erros))
+        sys.exit(1)
+
+    historico = carregar_historico(args.inicio, args.fim)
+    diagnosticos = []
+    tabela = executar_backtest(params, params_banco, historico, args.inicio, args.fim, args.modo, diagnosticos=diagnosticos)
+    print(f"{len(tabela)} meses de assinatura avaliados")
+    print(distribuicao_backtest(tabela).to_string(float_format=lambda v: f"{v:,.2f}"))
+    if args.saida:
+        tabela.to_csv(args.saida)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Teste de carga da interface Streamlit com sessões simuladas.
+
+Cada sessão roda o `streamlit_app.py` pela API de testes do Streamlit
+(`AppTest`, sem navegador) e repete um roteiro de uso: altera entradas,
+aperta os quatro botões de simulação (com o `sgs_local` no lugar da API do
+BC) e confere as tabelas detalhadas. O `AppTest` mantém um runtime global por
+processo, então cada sessão roda no seu próprio processo; todas começam juntas
+depois de importar o Streamlit.
+
+O relatório traz percentis da latência de cada rerun (por ação e no total),
+CPU e memória por sessão e a vazão de reruns por segundo de CPU, que indica
+quantas sessões ativas um processo do servidor comporta.
+
+Limitação: como cada sessão tem o próprio processo, o teste não mede a
+disputa dentro de um mesmo servidor — o GIL, o pool de cenários do
+`cache_resource` e o armazém de índices compartilhados entre sessões. As
+sessões disputam só a CPU da máquina; a latência real de várias sessões num
+único processo do Streamlit tende a ser maior.
+
+Uso:
+    python carga_streamlit.py --sessoes 1 2 4 8 --iteracoes 2
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sys
+import time
+
+from servico import RegistroLatencia
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py')
+
+BOTOES_SIMULACAO = (
+    "1. Simular com Médias",
+    "2. Simular Híbrido (BC + Médias)",
+    "3. Simular Apenas com BC (Puro)",
+    "4. Simular com Limite",
+)
+
+PREFIXO_TABELA = "👁️ Ver Tabela Detalhada"
+
+# Tempo máximo de espera pelas demais sessões na largada e pelo resultado de cada uma (s)
+ESPERA_BARREIRA = 120
+ESPERA_SESSAO = 1800
+
+LIMITACAO = ("cada sessão roda em processo próprio: não mede a disputa dentro de um servidor "
+             "(GIL, pool de cenários e armazém de índices compartilhados)")
+
+
+def _memoria_mb():
+    """Memória residente atual do processo (Linux), com o pico como alternativa."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _cpu_s():
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    return uso.ru_utime + uso.ru_stime
+
+# ============================================
+# SESSÃO SIMULADA
+# ============================================
+
+def _rerun(at, acao, medicoes):
+    inicio = time.perf_counter()
+    at.run()
+    medicoes.append((acao, time.perf_counter() - inicio, 'excecao' if len(at.exception) else 'ok'))
+
+
+def roteiro_sessao(at, rng, medicoes):
+    """Uma rodada de uso: muda entradas, aperta os quatro botões e confere as tabelas detalhadas."""
+    at.number_input(key='valor_entrada').set_value(round(rng.uniform(15000, 60000), 2))
+    _rerun(at, 'alterar_entrada', medicoes)
+    at.number_input(key='meses_pos').set_value(rng.randint(60, 200))
+    _rerun(at, 'alterar_prazo', medicoes)
+    if 'taxa_juros_anual' in at.session_state:
+        at.number_input(key='taxa_juros_anual').set_value(round(rng.uniform(8.0, 12.0), 2))
+        _rerun(at, 'alterar_taxa', medicoes)
+
+    tabelas = 0
+    for i, rotulo in enumerate(BOTOES_SIMULACAO, start=1):
+        botao = next((b for b in at.button if b.label == rotulo), None)
+        if botao is None:
+            medicoes.append((f'botao_{i}', 0.0, 'ausente'))
+            continue
+        botao.click()
+        _rerun(at, f'botao_{i}', medicoes)
+        # As tabelas detalhadas vêm prontas em expansores; abri-los não gera rerun no servidor
+        tabelas = sum(1 for e in at.expander if e.label.startswith(PREFIXO_TABELA))
+    return tabelas
+
+
+def executar_sessao(indice, iteracoes, semente, atraso_sgs, barreira, fila):
+    """Processo de uma sessão: importa, espera as demais e executa o roteiro `iteracoes` vezes.
+
+    Qualquer falha (inclusive na importação ou na barreira) vai para o campo `erro`; o resultado
+    é sempre enviado, para o processo principal não ficar esperando.
+    """
+    memoria_base = _memoria_mb()
+    medicoes = []
+    tabelas = 0
+    erro = None
+    cpu_inicio, inicio = _cpu_s(), time.perf_counter()
+    try:
+        import sgs_local
+        sys.modules['sgs'] = sgs_local
+        sgs_local.ATRASO_PADRAO = atraso_sgs
+        logging.getLogger('streamlit').setLevel(logging.ERROR)
+        logging.getLogger('motor').setLevel(logging.ERROR)
+        from streamlit.testing.v1 import AppTest
+
+        memoria_base = _memoria_mb()
+        rng = random.Random(semente * 1000 + indice)
+        barreira.wait(ESPERA_BARREIRA)
+        cpu_inicio, inicio = _cpu_s(), time.perf_counter()
+        at = AppTest.from_file(APP, default_timeout=300)
+        _rerun(at, 'carregar', medicoes)
+        for _ in range(iteracoes):
+            tabelas = roteiro_sessao(at, rng, medicoes)
+    except BaseException as e:
+        erro = f"{type(e).__name__}: {e}"
+    finally:
+        fila.put({
+            'sessao': indice, 'medicoes': medicoes, 'tabelas_detalhadas': tabelas, 'erro': erro,
+            'duracao_s': time.perf_counter() - inicio, 'cpu_s': _cpu_s() - cpu_inicio,
+            'memoria_sessao_mb': _memoria_mb() - memoria_base,
+            'memoria_pico_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        })
+
+
+def _sessao_perdida(indice, motivo):
+    return {'sessao': indice, 'medicoes': [], 'tabelas_detalhadas': 0, 'erro': motivo,
+            'duracao_s': 0.0, 'cpu_s': 0.0, 'memoria_sessao_mb': 0.0, 'memoria_pico_mb': 0.0}
+
+
+def coletar_resultados(processos, fila, espera=ESPERA_SESSAO):
+    """Lê um resultado por sessão; sessões que morrem sem enviar (ou estouram `espera`) viram erro."""
+    resultados = {}
+    limite = time.monotonic() + espera
+    while len(resultados) < len(processos):
+        try:
+            r = fila.get(timeout=1)
+            resultados[r['sessao']] = r
+            continue
+        except queue.Empty:
+            pass
+        mortos = [i for i, p in enumerate(processos) if i not in resultados and p.exitcode is not None]
+        if mortos:
+            # Um resultado enviado logo antes da saída ainda pode estar a caminho
+            try:
+                while True:
+                    r = fila.get(timeout=1)
+                    resultados[r['sessao']] = r
+            except queue.Empty:
+                pass
+            for i in mortos:
+                if i not in resultados:
+                    resultados[i] = _sessao_perdida(i, f"processo encerrado sem resultado (exitcode {processos[i].exitcode})")
+        if time.monotonic() > limite:
+            for i, p in enumerate(processos):
+                if i not in resultados:
+                    p.terminate()
+                    resultados[i] = _sessao_perdida(i, f"sem resultado em {espera} s")
+    return [resultados[i] for i in range(len(processos))]
+
+# ============================================
+# CARGA
+# ============================================
+
+def executar_carga(sessoes, iteracoes=2, semente=0, atraso_sgs=0.0):
+    """Roda `sessoes` sessões simultâneas e devolve latências, CPU e memória agregadas."""
+    contexto = multiprocessing.get_context('fork')
+    barreira = contexto.Barrier(sessoes)
+    fila = contexto.Queue()
+    processos = [contexto.Process(target=executar_sessao, args=(i, iteracoes, semente, atraso_sgs, barreira, fila))
+                 for i in range(sessoes)]
+    for p in processos:
+        p.start()
+    resultados = coletar_resultados(processos, fila)
+    for p in processos:
+        p.join()
+
+    latencias = RegistroLatencia()
+    for r in resultados:
+        for acao, segundos, status in r['medicoes']:
+            if status == 'ausente':
+                continue
+            latencias.registrar(acao, segundos, status)
+            latencias.registrar('todas', segundos, status)
+    reruns = sum(len(r['medicoes']) for r in resultados)
+    cpu = sum(r['cpu_s'] for r in resultados)
+    return {
+        'sessoes': sessoes,
+        'reruns': reruns,
+        'duracao_s': max(r['duracao_s'] for r in resultados),
+        'cpu_por_sessao_s': cpu / sessoes,
+        'cpu_por_rerun_ms': cpu / reruns * 1000 if reruns else 0.0,
+        'reruns_por_s_de_cpu': reruns / cpu if cpu else 0.0,
+        'memoria_por_sessao_mb': sum(r['memoria_sessao_mb'] for r in resultados) / sessoes,
+        'memoria_pico_mb': max(r['memoria_pico_mb'] for r in resultados),
+        'tabelas_detalhadas': min(r['tabelas_detalhadas'] for r in resultados),
+        'erros': [r['erro'] for r in resultados if r['erro']],
+        'latencias': latencias.resumo(),
+        'limitacao': LIMITACAO,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da interface Streamlit com sessões simultâneas")
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--iteracoes', type=int, default=2, help="rodadas do roteiro por sessão")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--atraso-sgs', type=float, default=0.0, help="latência simulada da API do BC (s)")
+    parser.add_argument('--json', action='store_true', help="imprime o relatório completo em JSON")
+    args = parser.parse_args()
+
+    relatorios = [executar_carga(n, args.iteracoes, args.semente, args.atraso_sgs) for n in args.sessoes]
+    if args.json:
+        print(json.dumps(relatorios, indent=2, ensure_ascii=False))
+        return
+    print(f"{'sessões':>7} {'reruns':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'máx ms':>8} {'CPU/sessão s':>12} {'CPU/rerun ms':>12} {'MB/sessão':>9} {'reruns/s CPU':>12}")
+    for r in relatorios:
+        todas = r['latencias'].get('todas', {})
+        print(f"{r['sessoes']:>7} {r['reruns']:>6} {todas.get('p50_ms', 0):>8.0f} {todas.get('p90_ms', 0):>8.0f} {todas.get('p99_ms', 0):>8.0f} "
+              f"{todas.get('max_ms', 0):>8.0f} {r['cpu_por_sessao_s']:>12.2f} {r['cpu_por_rerun_ms']:>12.0f} {r['memoria_por_sessao_mb']:>9.1f} {r['reruns_por_s_de_cpu']:>12.1f}")
+        for erro in r['erros']:
+            print(f"        erro: {erro}")
+    ultimo = relatorios[-1]
+    print("\nLatência por ação (p50 / p90 ms) com", ultimo['sessoes'], "sessões:")
+    for acao, dados in ultimo['latencias'].items():
+        if acao != 'todas':
+            print(f"  {acao:<16} {dados['p50_ms']:>8.0f} {dados['p90_ms']:>8.0f}")
+    print(f"Tabelas detalhadas renderizadas por sessão: {ultimo['tabelas_detalhadas']}")
+    print(f"\nLimitação: {LIMITACAO}.")
+
+
+if __name__ == '__main__':
+    main()
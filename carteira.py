@@ -0,0 +1,176 @@
+"""Simulação de carteira: recebíveis mensais de todas as unidades de um empreendimento.
+
+Cada unidade traz seus próprios `params` (entrada, extras, prazos) e a rota de
+financiamento escolhida pelo comprador. Todas as unidades são avaliadas de uma
+vez pelo motor vetorizado e os fluxos recebidos pela construtora são agregados
+por mês, rota e fase. O detalhe completo de uma unidade é gerado sob demanda
+pelo motor de referência.
+"""
+import numpy as np
+import pandas as pd
+
+from motor import simular_financiamento, simular_cenario_combinado, simular_cenario_associativo
+from motor_vetorizado import (
+    FASE_ENTRADA,
+    FASE_PRE,
+    FASE_POS,
+    CENARIOS,
+    como_lista,
+    data_do_mes_absoluto,
+    simular_cenarios_lote,
+)
+
+# Rota de financiamento da unidade -> cenário do motor
+ROTAS = {
+    'Construtora': 'construtora',
+    'Sequencial': 'sequencial',
+    'Associativo': 'associativo',
+}
+
+FASES_RECEBIVEIS = ('Entrada', 'Pré', 'Pós', 'Repasse Banco')
+_REPASSE = 3
+
+# Código de fase do motor vetorizado -> posição em FASES_RECEBIVEIS
+_INDICE_FASE = np.zeros(FASE_POS + 1, dtype=np.int64)
+_INDICE_FASE[[FASE_ENTRADA, FASE_PRE, FASE_POS]] = [0, 1, 2]
+
+# Usado apenas para preencher unidades da rota Construtora quando há rotas bancárias no lote
+_BANCO_NEUTRO = {'taxa_juros_anual': 0.0, 'metodo_calculo_juros': 'Linear'}
+
+
+class ResultadoCarteira:
+    """Resultado de `simular_carteira`: recebíveis agregados, resumo por unidade e detalhe sob demanda."""
+
+    def __init__(self, unidades, params_banco, valores_reais, resultados, recebiveis, diagnosticos):
+        self.unidades = unidades
+        self._params_banco = params_banco
+        self._valores_reais = valores_reais
+        self._resultados = resultados
+        self._recebiveis = recebiveis
+        self.diagnosticos = diagnosticos
+
+    def recebiveis(self, por='rota_fase'):
+        """Recebíveis mensais da construtora; `por` em {'rota_fase', 'rota', 'fase', 'total'}."""
+        tabela = self._recebiveis
+        if por == 'rota_fase':
+            return tabela
+        if por == 'rota':
+            return tabela.T.groupby(level='rota', sort=False).sum().T
+        if por == 'fase':
+            return tabela.T.groupby(level='fase', sort=False).sum().T
+        if por == 'total':
+            return tabela.sum(axis=1).rename('Total')
+        raise ValueError(f"agrupamento desconhecido: {por}")
+
+    def resumo_unidades(self):
+        """Uma linha por unidade com os indicadores do comprador na rota escolhida."""
+        linhas = []
+        for i, unidade in enumerate(self.unidades):
+            r = self._resultados[ROTAS[unidade['rota']]]
+            linhas.append({
+                'unidade': unidade.get('unidade', i),
+                'rota': unidade['rota'],
+                'custo_total': r['custo_total'][i],
+                'maior_parcela': r['maior_parcela'][i],
+                'termino': data_do_mes_absoluto(r['termino'][i]) if r['valido'][i] else pd.NaT,
+                'cet': r['cet'][i],
+                'valido': bool(r['valido'][i]),
+            })
+        return pd.DataFrame(linhas)
+
+    def detalhar(self, indice):
+        """Tabela completa (motor de referência) da unidade na posição `indice`."""
+        unidade = self.unidades[indice]
+        params = dict(unidade['params'])
+        params_banco = self._params_banco[indice]
+        vr = self._valores_reais[indice]
+        rota = unidade['rota']
+        if rota == 'Construtora':
+            return simular_financiamento(params, vr)
+        if rota == 'Sequencial':
+            return simular_cenario_combinado(params, params_banco, vr)
+        return simular_cenario_associativo(params, params_banco, vr)
+
+
+def simular_carteira(unidades, params_banco_padrao=None, valores_reais=None, diagnosticos=None):
+    """Simula todas as unidades e agrega os recebíveis mensais da construtora por rota e fase.
+
+    `unidades` é uma lista de dicionários com 'params' (mesmo formato de
+    `simular_financiamento`), 'rota' ('Construtora', 'Sequencial' ou
+    'Associativo') e, opcionalmente, 'unidade' (identificador) e
+    'params_banco' (senão vale `params_banco_padrao`). Nas rotas bancárias, a
+    construtora recebe o repasse do banco: de uma vez nas chaves (Sequencial)
+    ou conforme a evolução da obra (Associativo).
+    """
+    n = len(unidades)
+    for unidade in unidades:
+        if unidade.get('rota') not in ROTAS:
+            raise ValueError(f"rota inválida para a unidade {unidade.get('unidade')}: {unidade.get('rota')!r}. Use {list(ROTAS)}.")
+    lista_params = [unidade['params'] for unidade in unidades]
+    lista_banco = [unidade.get('params_banco') or params_banco_padrao for unidade in unidades]
+    if any(pb is None for pb, u in zip(lista_banco, unidades) if u['rota'] != 'Construtora'):
+        raise ValueError("unidades com rota bancária exigem 'params_banco' ou params_banco_padrao")
+    lista_banco = [pb if pb is not None else _BANCO_NEUTRO for pb in lista_banco]
+    lista_vr = como_lista(valores_reais, n)
+    rotas_usadas = {ROTAS[u['rota']] for u in unidades}
+    cenarios = tuple(c for c in CENARIOS if c in rotas_usadas)
+
+    diagnosticos = diagnosticos if diagnosticos is not None else []
+    resultados = simular_cenarios_lote(lista_params, lista_banco, lista_vr, cenarios, diagnosticos)
+    recebiveis = _agregar_recebiveis(unidades, resultados)
+    return ResultadoCarteira(unidades, lista_banco, lista_vr, resultados, recebiveis, diagnosticos)
+
+
+def _agregar_recebiveis(unidades, resultados):
+    detalhe = resultados['detalhe']
+    entrada, construtora = detalhe['entrada'], detalhe['construtora']
+    n, meses = entrada['n'], entrada['meses']
+    rotas = list(ROTAS)
+    indice_rota = np.array([rotas.index(u['rota']) for u in unidades], dtype=np.int64)
+    valido = entrada['valido']
+    inicio = entrada['mes_assinatura']
+    carencia = entrada['carencia']
+
+    destinos, valores = [], []
+
+    def acumular(rota, fase, mes_abs, valor, mascara):
+        destinos.append(np.stack(np.broadcast_arrays(rota, fase, mes_abs))[:, mascara])
+        valores.append(valor[mascara])
+
+    # Pagamento no ato da assinatura
+    acumular(indice_rota, np.zeros(n, dtype=np.int64), inicio, entrada['pagamento_assinatura'], valido & (entrada['pagamento_assinatura'] != 0))
+
+    # Parcelas pagas à construtora: tudo na rota Construtora, só pré-chaves nas rotas bancárias
+    mes = np.arange(1, meses + 1)[None, :]
+    direto = (indice_rota == rotas.index('Construtora'))[:, None]
+    paga_construtora = valido[:, None] & (entrada['fase'] > 0) & (direto | (mes <= entrada['n_pre_total'][:, None]))
+    fase_idx = _INDICE_FASE[entrada['fase']]
+    mes_abs = inicio[:, None] + carencia[:, None] + mes - 1
+    acumular(np.broadcast_to(indice_rota[:, None], (n, meses)), fase_idx, mes_abs, construtora['parcela'], paga_construtora)
+
+    # Repasse do banco à construtora
+    if 'amortizacao' in detalhe:
+        saldo_pre = detalhe['banco']['valor_financiado']
+        sequencial = valido & (indice_rota == rotas.index('Sequencial'))
+        associativo = valido & (indice_rota == rotas.index('Associativo'))
+        mes_chaves = inicio + carencia + entrada['n_pre_total']
+        obra = detalhe.get('obra')
+        com_obra = associativo & (obra['meses'] > 0) if obra is not None else np.zeros(n, dtype=bool)
+        acumular(indice_rota, np.full(n, _REPASSE), mes_chaves, saldo_pre, (sequencial | (associativo & ~com_obra)) & (saldo_pre != 0))
+        if obra is not None and obra['percentual'].shape[1]:
+            liberado = np.diff(obra['percentual'], axis=1, prepend=0.0) * saldo_pre[:, None]
+            ativo = np.arange(obra['percentual'].shape[1])[None, :] < obra['meses'][:, None]
+            mes_obra = inicio[:, None] + np.arange(obra['percentual'].shape[1])[None, :]
+            acumular(np.broadcast_to(indice_rota[:, None], liberado.shape), np.full(liberado.shape, _REPASSE), mes_obra, liberado, com_obra[:, None] & ativo)
+
+    destino = np.concatenate(destinos, axis=1) if destinos else np.zeros((3, 0), dtype=np.int64)
+    valor = np.concatenate(valores) if valores else np.zeros(0)
+    colunas = pd.MultiIndex.from_product([rotas, FASES_RECEBIVEIS], names=['rota', 'fase'])
+    if valor.size == 0:
+        return pd.DataFrame(columns=colunas, dtype=float)
+
+    primeiro, ultimo = int(destino[2].min()), int(destino[2].max())
+    tabela = np.zeros((len(rotas), len(FASES_RECEBIVEIS), ultimo - primeiro + 1))
+    np.add.at(tabela, (destino[0], destino[1], destino[2] - primeiro), valor)
+    indice = pd.DatetimeIndex([data_do_mes_absoluto(m) for m in range(primeiro, ultimo + 1)], name='Mês')
+    return pd.DataFrame(tabela.reshape(-1, tabela.shape[2]).T, index=indice, columns=colunas)
@@ -0,0 +1,302 @@
+"""Conferência entre o motor vetorizado e o motor de referência (`motor.py`).
+
+Gera contratos aleatórios cobrindo carência, entrada parcelada ou no ato,
+parcelas extras, `limite_correcao`, cobertura parcial de índices reais, todos os
+indexadores e sistemas de amortização e os métodos de juros de obra; avalia
+todos de uma vez no motor vetorizado e compara, linha a linha, com as tabelas
+do motor de referência (mês, parcela, saldo, correção, juros, encargos e CET).
+
+O mesmo comparador é usado pelo modo sombra de `motor_vetorizado`: com
+`SIMULADOR_SOMBRA=N` (ou `configurar_sombra(N)`), cada lote também roda N
+contratos sorteados no motor de referência e registra as divergências.
+
+Uso:
+    python conferencia.py --contratos 500 --semente 1 --tolerancia 0.01
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from motor import (
+    calcular_cet_cenario,
+    registrar_diagnostico,
+    simular_cenario_associativo,
+    simular_cenario_combinado,
+    simular_financiamento,
+)
+from motor_vetorizado import CENARIOS, como_lista, mes_absoluto, simular_cenarios_lote
+
+logger = logging.getLogger(__name__)
+
+# Tolerância padrão (R$) por valor comparado, e (pontos percentuais) para o CET
+TOLERANCIA_VALOR = 0.01
+TOLERANCIA_CET = 1e-4
+
+INDEXADORES = ('TR', 'IPCA', 'Poupança', 'Fixa')
+SISTEMAS = ('PRICE', 'SAC')
+METODOS_OBRA = ('Progressiva (S-Curve)', 'Linear', 'Manual')
+
+# Colunas comparadas por tipo de linha: referência -> matriz do motor vetorizado
+_COLUNAS_CONSTRUTORA = {
+    'Saldo Devedor': 'saldo',
+    'Amortização Base (R$)': 'amortizacao',
+    'Correção Monetária Paga (R$)': 'correcao_paga',
+    'Juros (R$)': 'juros',
+    'Correção Monetária Gerada (R$)': 'correcao_gerada',
+}
+_COLUNAS_BANCO = {
+    'Saldo Devedor': 'saldo',
+    'Amortização Base (R$)': 'amortizacao',
+    'Juros (R$)': 'juros',
+    'Encargos (R$)': 'encargos',
+    'Correção Monetária Gerada (R$)': 'ajuste_index',
+}
+
+# ============================================
+# CONTRATOS ALEATÓRIOS
+# ============================================
+
+def gerar_contrato(rng):
+    """Sorteia (params, params_banco, valores_reais) cobrindo os ramos do motor de referência."""
+    assinatura = datetime(int(rng.integers(2015, 2030)), int(rng.integers(1, 13)), 1)
+    carencia = int(rng.choice([0, 0, 1, 2, 5]))
+    meses_pre = int(rng.choice([0, 1, 6, 12, 24, 36]))
+    meses_pos = int(rng.choice([0, 1, 12, 60, 120]))
+    valor_total = float(rng.uniform(150_000, 1_500_000))
+    valor_entrada = round(valor_total * float(rng.uniform(0.05, 0.3)), 2)
+
+    parcelada = rng.random() < 0.6
+    num_entrada = int(rng.integers(1, 7)) if parcelada else 0
+    extras_sem = {m: round(float(rng.uniform(1_000, 20_000)), 2) for m in range(6, meses_pre + 1, 6) if rng.random() < 0.7}
+    extras_anu = {m: round(float(rng.uniform(5_000, 60_000)), 2) for m in range(12, meses_pre + 1, 12) if rng.random() < 0.5}
+    if meses_pre and rng.random() < 0.2:
+        # Mês fora do intervalo pré-chaves: ignorado pelos dois motores
+        extras_anu[meses_pre + 3] = 10_000.0
+    total_meses = num_entrada + meses_pre + meses_pos
+    # Parcelas pré-chaves nulas ou negativas: a referência só gera a linha quando o mês (com extras) é positivo
+    sorteio = rng.random()
+    if sorteio < 0.1:
+        parcela_pre = 0.0
+    elif sorteio < 0.2:
+        parcela_pre = round(float(rng.uniform(-8_000, 0)), 2)
+    else:
+        parcela_pre = round(float(rng.uniform(0, 8_000)), 2)
+
+    params = {
+        'data_inicio_obra': (assinatura - relativedelta(months=int(rng.integers(-3, 18)))).date(),
+        'mes_assinatura': assinatura.strftime("%m/%Y"),
+        'mes_primeira_parcela': (assinatura + relativedelta(months=carencia)).strftime("%m/%Y"),
+        'valor_total_imovel': valor_total,
+        'valor_entrada': valor_entrada,
+        'tipo_pagamento_entrada': 'Parcelada' if parcelada else 'Paga no ato',
+        'num_parcelas_entrada': num_entrada,
+        'entrada_mensal': valor_entrada / num_entrada if num_entrada else 0,
+        'inicio_correcao': int(rng.choice([0, 1, 1, 3])),
+        'incc_medio': float(rng.uniform(0, 0.01)),
+        'ipca_medio': float(rng.uniform(0, 0.008)),
+        'meses_pre': meses_pre,
+        'meses_pos': meses_pos,
+        'parcelas_mensais_pre': parcela_pre,
+        'valor_amortizacao_pos': round(float(rng.uniform(0, 6_000)), 2),
+        'parcelas_semestrais': extras_sem,
+        'parcelas_anuais': extras_anu,
+        'percentual_minimo_quitacao': 0.3,
+        'limite_correcao': int(rng.integers(0, total_meses + 1)) if total_meses and rng.random() < 0.3 else None,
+    }
+
+    metodo = str(rng.choice(METODOS_OBRA))
+    params_banco = {
+        'taxa_juros_anual': float(rng.choice([0.0, rng.uniform(6, 14)])),
+        'indexador': str(rng.choice(INDEXADORES)),
+        'sistema_amortizacao': str(rng.choice(SISTEMAS)),
+        'taxa_admin_mensal': float(rng.choice([0.0, 25.0])),
+        'seguro_total_primeira_parcela': float(rng.uniform(0, 300)),
+        'percentual_dfi_estimado': float(rng.uniform(10, 50)),
+        'tr_medio': float(rng.uniform(0, 0.002)),
+        'ipca_medio': float(rng.uniform(0, 0.008)),
+        'poupanca_medio': float(rng.uniform(0, 0.006)),
+        'metodo_calculo_juros': metodo,
+        'marcos_liberacao': '3:10, 9:45, 15:80' if metodo == 'Manual' else '',
+    }
+
+    # Índices reais só nos primeiros meses (como na API do BC), com algumas falhas
+    valores_reais = None
+    if total_meses and rng.random() < 0.7:
+        cobertura = int(rng.integers(0, total_meses + 1))
+        valores_reais = {}
+        for mes in range(1, total_meses + 1):
+            if mes <= cobertura:
+                valores_reais[mes] = {chave: (float(rng.uniform(-0.001, 0.012)) if rng.random() > 0.1 else None)
+                                      for chave in ('incc', 'ipca', 'tr', 'poupanca')}
+            else:
+                valores_reais[mes] = {'incc': None, 'ipca': None, 'tr': None, 'poupanca': None}
+    return params, params_banco, valores_reais
+
+
+def valores_reais_de_series(series_reais, indice, largura):
+    """Reconstrói o dicionário mês -> índices de um contrato a partir das matrizes `series_reais`."""
+    valores_reais = {}
+    for mes in range(1, largura + 1):
+        valores = {}
+        for chave in ('incc', 'ipca', 'tr', 'poupanca'):
+            matriz = series_reais.get(chave)
+            linha = None if matriz is None else (matriz[indice] if np.ndim(matriz) == 2 else matriz)
+            valor = linha[mes - 1] if linha is not None and mes <= len(linha) else np.nan
+            valores[chave] = None if np.isnan(valor) else float(valor)
+        valores_reais[mes] = valores
+    return valores_reais
+
+# ============================================
+# COMPARAÇÃO
+# ============================================
+
+def simular_referencia(cenario, params, params_banco, valores_reais=None, diagnosticos=None):
+    """Tabela do motor de referência para um cenário."""
+    if cenario == 'construtora':
+        return simular_financiamento(dict(params), valores_reais, diagnosticos)
+    if cenario == 'sequencial':
+        return simular_cenario_combinado(dict(params), params_banco, valores_reais, diagnosticos)
+    return simular_cenario_associativo(dict(params), params_banco, valores_reais, diagnosticos)
+
+
+def _divergencia(contrato, cenario, linha, campo, referencia, rapido):
+    return {'contrato': contrato, 'cenario': cenario, 'linha': linha, 'campo': campo,
+            'referencia': referencia, 'rapido': rapido}
+
+
+def comparar_contrato(indice, params, params_banco, valores_reais, resultados, cenarios=CENARIOS, tolerancia=TOLERANCIA_VALOR):
+    """Compara as tabelas de referência do contrato `indice` com o resultado em lote; devolve a lista de divergências."""
+    divergencias = []
+    detalhe = resultados['detalhe']
+    construtora = detalhe['construtora']
+    amortizacao = detalhe.get('amortizacao')
+    mes_assinatura = int(detalhe['entrada']['mes_assinatura'][indice])
+
+    for cenario in cenarios:
+        r = resultados[cenario]
+        df = simular_referencia(cenario, params, params_banco, valores_reais, diagnosticos=[])
+        linhas = int(r['linhas'][indice]) if r['valido'][indice] else 0
+        if len(df) != linhas:
+            divergencias.append(_divergencia(indice, cenario, None, 'linhas', len(df), linhas))
+            continue
+        if df.empty:
+            continue
+
+        pagamentos = df['Parcela Total (R$)'].to_numpy(dtype=float)
+        meses = np.array([mes_absoluto(d) for d in df['DataObj']]) - mes_assinatura
+        rapido_pag = r['pagamentos'][indice, :linhas]
+        rapido_mes = r['deslocamento'][indice, :linhas]
+        for j in np.flatnonzero(np.abs(pagamentos - rapido_pag) > tolerancia):
+            divergencias.append(_divergencia(indice, cenario, int(j), 'Parcela Total (R$)', pagamentos[j], rapido_pag[j]))
+        for j in np.flatnonzero(meses != rapido_mes):
+            divergencias.append(_divergencia(indice, cenario, int(j), 'Mês', int(meses[j]), int(rapido_mes[j])))
+
+        # Componentes das linhas que existem isoladas nos dois motores
+        fases = df['Fase'].astype(str)
+        if cenario != 'associativo':
+            posicoes = np.flatnonzero(fases.isin(['Entrada', 'Pré', 'Pós']).to_numpy())
+            for j, m in zip(posicoes, range(len(posicoes))):
+                for coluna, chave in _COLUNAS_CONSTRUTORA.items():
+                    ref, rap = float(df[coluna].iloc[j]), float(construtora[chave][indice, m])
+                    if abs(ref - rap) > tolerancia:
+                        divergencias.append(_divergencia(indice, cenario, int(j), coluna, ref, rap))
+        if amortizacao is not None and cenario != 'construtora':
+            posicoes = np.flatnonzero(fases.str.startswith('Amortização').to_numpy())
+            for j, m in zip(posicoes, range(len(posicoes))):
+                for coluna, chave in _COLUNAS_BANCO.items():
+                    ref, rap = float(df[coluna].iloc[j]), float(amortizacao[chave][indice, m])
+                    if abs(ref - rap) > tolerancia:
+                        divergencias.append(_divergencia(indice, cenario, int(j), coluna, ref, rap))
+
+        cet_ref = calcular_cet_cenario(df, params['valor_total_imovel'])
+        cet_rap = float(r['cet'][indice])
+        if not (np.isnan(cet_ref) and np.isnan(cet_rap)) and not abs(cet_ref - cet_rap) <= TOLERANCIA_CET:
+            divergencias.append(_divergencia(indice, cenario, None, 'CET (%)', cet_ref, cet_rap))
+
+    return divergencias
+
+
+def conferir_lote(lista_params, lista_params_banco, lista_valores_reais, cenarios=CENARIOS, tolerancia=TOLERANCIA_VALOR):
+    """Roda o lote no motor vetorizado e compara cada contrato com o motor de referência."""
+    n = len(lista_params)
+    lista_pb = como_lista(lista_params_banco, n)
+    lista_vr = como_lista(lista_valores_reais, n)
+    resultados = simular_cenarios_lote(lista_params, lista_pb, lista_vr, cenarios, diagnosticos=[], sombra=0)
+    divergencias = []
+    for i in range(n):
+        divergencias.extend(comparar_contrato(i, lista_params[i], lista_pb[i], lista_vr[i], resultados, cenarios, tolerancia))
+    return pd.DataFrame(divergencias, columns=['contrato', 'cenario', 'linha', 'campo', 'referencia', 'rapido'])
+
+
+def executar_conferencia(quantidade=200, semente=0, cenarios=CENARIOS, tolerancia=TOLERANCIA_VALOR):
+    """Gera `quantidade` contratos aleatórios e devolve (contratos, divergências)."""
+    rng = np.random.default_rng(semente)
+    contratos = [gerar_contrato(rng) for _ in range(quantidade)]
+    lista_params, lista_pb, lista_vr = (list(coluna) for coluna in zip(*contratos))
+    return contratos, conferir_lote(lista_params, lista_pb, lista_vr, cenarios, tolerancia)
+
+# ============================================
+# MODO SOMBRA
+# ============================================
+
+def conferir_em_sombra(lista_params, lista_params_banco, valores_reais, series_reais, resultados, cenarios, amostra, diagnosticos=None, tolerancia=TOLERANCIA_VALOR, rng=None):
+    """Compara `amostra` contratos sorteados do lote já calculado com o motor de referência.
+
+    O sorteio usa `rng` (um `np.random.Generator`; sem ele, um gerador novo),
+    o que permite reproduzir a mesma amostra. Cada divergência é registrada como diagnóstico 'divergencia_motores' (ou no
+    log, sem coletor). Falhas da própria conferência nunca interrompem o lote.
+    """
+    n = len(lista_params)
+    validos = np.flatnonzero(resultados['detalhe']['entrada']['valido'])
+    if n == 0 or len(validos) == 0:
+        return []
+    escolhidos = (rng if rng is not None else np.random.default_rng()).choice(validos, size=min(amostra, len(validos)), replace=False)
+    lista_pb = como_lista(lista_params_banco, n) if lista_params_banco is not None else [None] * n
+    lista_vr = como_lista(valores_reais, n)
+    largura = resultados['detalhe']['entrada']['meses']
+
+    divergencias = []
+    for i in escolhidos:
+        i = int(i)
+        vr = valores_reais_de_series(series_reais, i, largura) if series_reais is not None else lista_vr[i]
+        try:
+            encontradas = comparar_contrato(i, lista_params[i], lista_pb[i], vr, resultados, cenarios, tolerancia)
+        except Exception as e:
+            logger.exception("Falha na conferência em sombra do contrato %s", i)
+            registrar_diagnostico(diagnosticos, 'aviso', 'conferencia_sombra_falhou', f"Conferência em sombra falhou: {e}", unidade=i)
+            continue
+        for d in encontradas:
+            registrar_diagnostico(diagnosticos, 'aviso', 'divergencia_motores',
+                                   f"Motor vetorizado diverge do motor de referência ({d['cenario']}, {d['campo']}).", unidade=i, **{k: v for k, v in d.items() if k != 'contrato'})
+        divergencias.extend(encontradas)
+    return divergencias
+
+# ============================================
+# LINHA DE COMANDO
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Conferência entre o motor vetorizado e o motor de referência")
+    parser.add_argument('--contratos', type=int, default=200)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_VALOR)
+    args = parser.parse_args()
+
+    contratos, divergencias = executar_conferencia(args.contratos, args.semente, tolerancia=args.tolerancia)
+    print(f"{len(contratos)} contratos conferidos (semente {args.semente}, tolerância R$ {args.tolerancia})")
+    if divergencias.empty:
+        print("Nenhuma divergência.")
+        sys.exit(0)
+    print(f"{divergencias['contrato'].nunique()} contratos com divergência:")
+    print(divergencias.groupby(['cenario', 'campo'], dropna=False).size().to_string())
+    print(divergencias.head(20).to_string())
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Teste de estresse: como os cenários reagem a choques de INCC, juros e prazo.
+
+Uma grade de choques em torno do contrato atual (INCC médio + x pp ao mês,
+juros do banco ± y pp ao ano, prazo pós-chaves ± z meses) é simulada numa única
+chamada do motor vetorizado, um "contrato" por ponto da grade. Custo total,
+maior parcela e CET de cada cenário ficam guardados como uma superfície; cada
+posição dos controles é respondida por interpolação trilinear entre os pontos
+vizinhos, sem simular. Nos pontos da grade a resposta é exata; fora deles,
+`exato` recalcula a posição pedida.
+
+O choque de INCC altera a média usada nos meses sem índice real.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from itertools import product
+
+import numpy as np
+
+from meta import METRICAS, aplicar_variavel
+from motor_vetorizado import CENARIOS, simular_cenarios_lote
+
+# Choque -> rótulo e grade padrão (início, fim, pontos)
+CHOQUES = {
+    'incc': {'rotulo': 'INCC (pp ao mês)', 'grade': (-0.5, 1.0, 7)},
+    'juros': {'rotulo': 'Juros do banco (pp ao ano)', 'grade': (-3.0, 3.0, 7)},
+    'prazo': {'rotulo': 'Prazo pós-chaves (meses)', 'grade': (-60, 60, 7)},
+}
+
+
+def aplicar_choque(params, params_banco, incc=0.0, juros=0.0, prazo=0):
+    """Cópias de `params` e `params_banco` com os choques aplicados.
+
+    O prazo alterado redistribui o mesmo saldo pós-chaves (como na busca de
+    meta) e nunca fica abaixo de um mês; os juros não ficam negativos.
+    """
+    novo = dict(params)
+    if prazo and params['meses_pos'] > 0:
+        novo = aplicar_variavel(params, 'meses_pos', max(1, params['meses_pos'] + int(round(prazo))))
+    novo['incc_medio'] = params.get('incc_medio', 0.0) + incc / 100
+    novo_banco = None
+    if params_banco is not None:
+        novo_banco = dict(params_banco)
+        novo_banco['taxa_juros_anual'] = max(0.0, params_banco['taxa_juros_anual'] + juros)
+    return novo, novo_banco
+
+
+def _eixo(grade):
+    inicio, fim, pontos = grade
+    return np.linspace(inicio, fim, int(pontos))
+
+
+def _vizinhos(eixo, valor):
+    """Índices dos dois pontos do eixo em torno de `valor` (limitado ao eixo) e o peso do segundo."""
+    if len(eixo) == 1:
+        return 0, 0, 0.0
+    valor = min(max(valor, eixo[0]), eixo[-1])
+    j = int(np.clip(np.searchsorted(eixo, valor, side='right') - 1, 0, len(eixo) - 2))
+    return j, j + 1, (valor - eixo[j]) / (eixo[j + 1] - eixo[j])
+
+
+class SuperficieEstresse:
+    """Superfície de resultados dos cenários sobre uma grade de choques, com interpolação e recálculo exato."""
+
+    def __init__(self, params, params_banco, valores_reais=None, grade=None, cenarios=CENARIOS, diagnosticos=None):
+        self.params = params
+        self.params_banco = params_banco
+        self.valores_reais = valores_reais
+        self.cenarios = tuple(cenarios)
+        grade = {**{c: CHOQUES[c]['grade'] for c in CHOQUES}, **(grade or {})}
+        self.eixos = {c: _eixo(grade[c]) for c in CHOQUES}
+        self._exatos = {}
+
+        pontos = list(product(*self.eixos.values()))
+        r = self._simular(pontos, diagnosticos)
+        forma = tuple(len(e) for e in self.eixos.values())
+        self.valores = {
+            cenario: {m: np.where(r[cenario]['valido'], r[cenario][m], np.nan).reshape(forma) for m in METRICAS}
+            for cenario in self.cenarios
+        }
+        self.pontos = len(pontos)
+
+    def _simular(self, pontos, diagnosticos=None):
+        choques = [aplicar_choque(self.params, self.params_banco, *p) for p in pontos]
+        lista_banco = [b for _, b in choques] if self.params_banco is not None else None
+        return simular_cenarios_lote([p for p, _ in choques], lista_banco, self.valores_reais, self.cenarios,
+                                     [] if diagnosticos is None else diagnosticos, sombra=0)
+
+    def interpolar(self, incc=0.0, juros=0.0, prazo=0):
+        """Métricas de cada cenário na posição pedida, por interpolação trilinear na grade.
+
+        Posições fora da grade são trazidas para a borda. Uma métrica fica NaN
+        quando algum ponto vizinho usado não tem simulação válida.
+        """
+        vizinhos = [_vizinhos(self.eixos[c], v) for c, v in zip(CHOQUES, (incc, juros, prazo))]
+        cantos = []
+        for escolha in product((0, 1), repeat=3):
+            peso = 1.0
+            indice = []
+            for (a, b, t), lado in zip(vizinhos, escolha):
+                peso *= t if lado else 1 - t
+                indice.append(b if lado else a)
+            if peso > 0:
+                cantos.append((tuple(indice), peso))
+        return {
+            cenario: {m: float(sum(peso * self.valores[cenario][m][i] for i, peso in cantos)) for m in METRICAS}
+            for cenario in self.cenarios
+        }
+
+    def exato(self, incc=0.0, juros=0.0, prazo=0, diagnosticos=None):
+        """Métricas de cada cenário simuladas exatamente na posição pedida (guardadas para novas consultas)."""
+        chave = (round(incc, 6), round(juros, 6), int(round(prazo)))
+        if chave not in self._exatos:
+            r = self._simular([chave], diagnosticos)
+            self._exatos[chave] = {
+                cenario: {m: float(r[cenario][m][0]) if r[cenario]['valido'][0] else float('nan') for m in METRICAS}
+                for cenario in self.cenarios
+            }
+        return self._exatos[chave]
+
+# ============================================
+# SUPERFÍCIES REAPROVEITADAS
+# ============================================
+
+# Chave das entradas -> Future da superfície: quem chega durante o cálculo espera o mesmo resultado
+_SUPERFICIES = OrderedDict()
+_LOCK_SUPERFICIES = threading.Lock()
+SUPERFICIES_GUARDADAS = 16
+
+
+def superficie_estresse(params, params_banco, valores_reais=None, grade=None, diagnosticos=None):
+    """Superfície do contrato, calculada uma vez e reaproveitada enquanto as entradas não mudam.
+
+    O cálculo roda fora da trava global: contratos diferentes são simulados ao
+    mesmo tempo e pedidos repetidos do mesmo contrato aguardam o primeiro.
+    """
+    chave = hashlib.sha1(json.dumps([params, params_banco, valores_reais, grade], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    with _LOCK_SUPERFICIES:
+        futuro = _SUPERFICIES.pop(chave, None)
+        calcular = futuro is None
+        if calcular:
+            futuro = Future()
+        _SUPERFICIES[chave] = futuro
+        while len(_SUPERFICIES) > SUPERFICIES_GUARDADAS:
+            _SUPERFICIES.popitem(last=False)
+
+    if calcular:
+        try:
+            futuro.set_result(SuperficieEstresse(params, params_banco, valores_reais, grade, diagnosticos=diagnosticos))
+        except Exception as e:
+            # Falhas não ficam guardadas: o próximo pedido tenta de novo
+            with _LOCK_SUPERFICIES:
+                if _SUPERFICIES.get(chave) is futuro:
+                    del _SUPERFICIES[chave]
+            futuro.set_exception(e)
+    return futuro.result()
@@ -0,0 +1,259 @@
+"""Processamento em fluxo para carteiras e backtests muito grandes.
+
+Os contratos chegam por um iterável (lista, gerador, leitura de arquivo) e são
+simulados em blocos de tamanho fixo pelo motor vetorizado. Cada bloco vira um
+resumo compacto por cenário (indicadores por contrato e as parcelas com o mês
+do calendário), consumido por redutores que mantêm apenas agregados: totais,
+maior parcela, soma mensal e o fluxo de caixa para o CET da carteira. A memória
+depende do tamanho do bloco e do horizonte em meses, não do número de contratos.
+
+Para percorrer a tabela de um único contrato sem montar DataFrames, use os
+geradores de `motor`: `gerar_linhas_financiamento`, `gerar_linhas_juros_obra` e
+`gerar_linhas_amortizacao`.
+
+Uso:
+    python fluxo.py --contratos 100000 --bloco 2000
+
+A carteira da linha de comando é sintética: unidades geradas a partir do
+contrato de exemplo do `servico.py` (ver `carteira_exemplo`).
+"""
+import argparse
+import itertools
+import logging
+import resource
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from motor_vetorizado import CENARIOS, data_do_mes_absoluto, simular_cenarios_lote
+
+# ============================================
+# BLOCOS
+# ============================================
+
+def gerar_blocos(contratos, tamanho_bloco=1000, cenarios=CENARIOS, params_banco_padrao=None, diagnosticos=None, centavos=False):
+    """Simula `contratos` em blocos e gera um resumo por bloco e cenário.
+
+    Cada contrato é um dicionário com 'params' e, opcionalmente,
+    'params_banco' e 'valores_reais'. Cada item gerado tem: 'cenario',
+    'primeiro' (posição do primeiro contrato do bloco no fluxo), 'valido',
+    'custo_total', 'maior_parcela', 'cet', 'mes_assinatura', 'valor_total' (por
+    contrato) e as parcelas ocupadas em 'contrato', 'mes' (mês absoluto) e 'parcela'.
+    """
+    iterador = iter(contratos)
+    primeiro = 0
+    while True:
+        bloco = list(itertools.islice(iterador, tamanho_bloco))
+        if not bloco:
+            return
+        lista_params = [c['params'] for c in bloco]
+        lista_pb = [c.get('params_banco') or params_banco_padrao for c in bloco]
+        lista_vr = [c.get('valores_reais') for c in bloco]
+        if any(c != 'construtora' for c in cenarios) and any(pb is None for pb in lista_pb):
+            raise ValueError("cenários bancários exigem 'params_banco' em cada contrato ou params_banco_padrao")
+        resultados = simular_cenarios_lote(lista_params, lista_pb, lista_vr, cenarios, diagnosticos, centavos=centavos)
+        entrada = resultados['detalhe']['entrada']
+        for cenario in cenarios:
+            r = resultados[cenario]
+            ocupada = np.arange(r['pagamentos'].shape[1])[None, :] < r['linhas'][:, None]
+            contrato, coluna = np.nonzero(ocupada)
+            yield {
+                'cenario': cenario,
+                'primeiro': primeiro,
+                'valido': r['valido'],
+                'custo_total': r['custo_total'],
+                'maior_parcela': r['maior_parcela'],
+                'cet': r['cet'],
+                'mes_assinatura': entrada['mes_assinatura'],
+                'valor_total': entrada['valor_total'] / 100 if centavos else entrada['valor_total'],
+                'contrato': contrato,
+                'mes': entrada['mes_assinatura'][contrato] + r['deslocamento'][contrato, coluna],
+                'parcela': r['pagamentos'][contrato, coluna],
+            }
+        primeiro += len(bloco)
+
+# ============================================
+# REDUTORES
+# ============================================
+
+class Totais:
+    """Quantidade de contratos válidos, custo total somado e médias por cenário (CET médio só entre os CETs calculáveis)."""
+
+    def __init__(self):
+        self._acumulado = {}
+
+    def consumir(self, bloco):
+        valido = bloco['valido']
+        soma = self._acumulado.setdefault(bloco['cenario'], {'contratos': 0, 'custo_total': 0.0, 'soma_cet': 0.0, 'contratos_cet': 0})
+        soma['contratos'] += int(valido.sum())
+        soma['custo_total'] += float(bloco['custo_total'][valido].sum())
+        # Contratos sem CET calculável (NaN) não entram na média
+        cet = bloco['cet'][valido]
+        cet = cet[np.isfinite(cet)]
+        soma['soma_cet'] += float(cet.sum())
+        soma['contratos_cet'] += len(cet)
+
+    def resultado(self):
+        linhas = []
+        for cenario, soma in self._acumulado.items():
+            n, n_cet = soma['contratos'], soma['contratos_cet']
+            linhas.append({'cenario': cenario, 'contratos': n, 'custo_total': soma['custo_total'],
+                           'custo_medio': soma['custo_total'] / n if n else 0.0,
+                           'cet_medio': soma['soma_cet'] / n_cet if n_cet else float('nan')})
+        return pd.DataFrame(linhas, columns=['cenario', 'contratos', 'custo_total', 'custo_medio', 'cet_medio'])
+
+
+class MaiorParcela:
+    """Maior parcela de cada cenário e a posição do contrato no fluxo."""
+
+    def __init__(self):
+        self._maior = {}
+
+    def consumir(self, bloco):
+        valores = np.where(bloco['valido'], bloco['maior_parcela'], -np.inf)
+        if len(valores) == 0:
+            return
+        i = int(np.argmax(valores))
+        atual = self._maior.get(bloco['cenario'])
+        if np.isfinite(valores[i]) and (atual is None or valores[i] > atual['maior_parcela']):
+            self._maior[bloco['cenario']] = {'maior_parcela': float(valores[i]), 'contrato': bloco['primeiro'] + i}
+
+    def resultado(self):
+        return {cenario: dict(valor) for cenario, valor in self._maior.items()}
+
+
+class AgregadoMensal:
+    """Soma das parcelas de todos os contratos em cada mês do calendário, por cenário."""
+
+    def __init__(self):
+        self._base = None
+        self._somas = {}
+
+    def _garantir(self, cenario, minimo, maximo):
+        if self._base is None:
+            self._base = minimo
+        soma = self._somas.setdefault(cenario, np.zeros(0))
+        if minimo < self._base:
+            deslocamento = self._base - minimo
+            self._somas = {c: np.concatenate([np.zeros(deslocamento), s]) for c, s in self._somas.items()}
+            self._base = minimo
+            soma = self._somas[cenario]
+        tamanho = maximo - self._base + 1
+        if len(soma) < tamanho:
+            soma = np.concatenate([soma, np.zeros(tamanho - len(soma))])
+            self._somas[cenario] = soma
+        return soma
+
+    def consumir(self, bloco):
+        if len(bloco['mes']) == 0:
+            return
+        soma = self._garantir(bloco['cenario'], int(bloco['mes'].min()), int(bloco['mes'].max()))
+        soma += np.bincount(bloco['mes'] - self._base, weights=bloco['parcela'], minlength=len(soma))[:len(soma)]
+
+    def resultado(self):
+        if self._base is None:
+            return pd.DataFrame()
+        tamanho = max(len(s) for s in self._somas.values())
+        indice = pd.DatetimeIndex([data_do_mes_absoluto(self._base + m) for m in range(tamanho)], name='Mês')
+        return pd.DataFrame({c: np.pad(s, (0, tamanho - len(s))) for c, s in self._somas.items()}, index=indice)
+
+
+class FluxoCET:
+    """Fluxo de caixa agregado da carteira (valor dos imóveis na assinatura, parcelas depois) e seu CET."""
+
+    def __init__(self):
+        self._financiado = AgregadoMensal()
+        self._pago = AgregadoMensal()
+
+    def consumir(self, bloco):
+        valido = bloco['valido']
+        self._financiado.consumir({'cenario': bloco['cenario'], 'mes': bloco['mes_assinatura'][valido], 'parcela': bloco['valor_total'][valido]})
+        linhas_validas = valido[bloco['contrato']]
+        self._pago.consumir({'cenario': bloco['cenario'], 'mes': bloco['mes'][linhas_validas], 'parcela': bloco['parcela'][linhas_validas]})
+
+    def fluxos(self):
+        """DataFrame (meses x cenários) do fluxo líquido do comprador: parcelas pagas menos valor financiado."""
+        return self._pago.resultado().sub(self._financiado.resultado(), fill_value=0.0).sort_index()
+
+    def resultado(self):
+        import numpy_financial as npf
+        cets = {}
+        for cenario, fluxo in self.fluxos().items():
+            valores = np.trim_zeros(fluxo.to_numpy(), 'b')
+            taxa = npf.irr(valores) if len(valores) > 1 else np.nan
+            cets[cenario] = ((1 + taxa) ** 12 - 1) * 100 if pd.notna(taxa) else 0.0
+        return cets
+
+
+def reduzir(blocos, redutores):
+    """Passa cada bloco por todos os redutores e devolve {nome: resultado}."""
+    for bloco in blocos:
+        for redutor in redutores.values():
+            redutor.consumir(bloco)
+    return {nome: redutor.resultado() for nome, redutor in redutores.items()}
+
+# ============================================
+# LINHA DE COMANDO
+# ============================================
+
+# Valores do contrato que acompanham o preço da unidade
+_CAMPOS_VALOR = ('valor_total_imovel', 'valor_entrada', 'entrada_mensal', 'parcelas_mensais_pre', 'valor_amortizacao_pos')
+
+
+def _deslocar_mes(mes_ano, meses):
+    return (datetime.strptime(mes_ano, "%m/%Y") + relativedelta(months=meses)).strftime("%m/%Y")
+
+
+def carteira_exemplo(params, params_banco, quantidade, rng):
+    """Gera `quantidade` unidades de um mesmo empreendimento a partir de um contrato.
+
+    O preço (e, na mesma proporção, entrada, parcelas e extras) varia ±30% e a
+    assinatura se espalha pelos 12 meses seguintes; prazos e início da obra
+    são os do contrato.
+    """
+    for _ in range(quantidade):
+        fator = float(rng.uniform(0.7, 1.3))
+        atraso = int(rng.integers(0, 12))
+        unidade = dict(params)
+        for campo in _CAMPOS_VALOR:
+            unidade[campo] = round(params.get(campo, 0) * fator, 2)
+        unidade['parcelas_semestrais'] = {m: round(v * fator, 2) for m, v in params['parcelas_semestrais'].items()}
+        unidade['parcelas_anuais'] = {m: round(v * fator, 2) for m, v in params['parcelas_anuais'].items()}
+        unidade['mes_assinatura'] = _deslocar_mes(params['mes_assinatura'], atraso)
+        unidade['mes_primeira_parcela'] = _deslocar_mes(params['mes_primeira_parcela'], atraso)
+        yield {'params': unidade, 'params_banco': params_banco}
+
+
+def main():
+    import servico
+
+    parser = argparse.ArgumentParser(description="Carteira sintética processada em fluxo, com memória limitada pelo tamanho do bloco")
+    parser.add_argument('--contratos', type=int, default=20000)
+    parser.add_argument('--bloco', type=int, default=1000)
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+    # Sem coletor, os avisos de cada contrato iriam para o log; aqui só interessam os erros
+    logging.getLogger('motor').setLevel(logging.ERROR)
+
+    params, params_banco, _, _ = servico.validar_requisicao(servico.PAYLOAD_EXEMPLO)
+    contratos = carteira_exemplo(params, params_banco, args.contratos, np.random.default_rng(args.semente))
+    inicio = time.perf_counter()
+    resultado = reduzir(gerar_blocos(contratos, args.bloco, diagnosticos=None), {
+        'totais': Totais(), 'maior_parcela': MaiorParcela(), 'mensal': AgregadoMensal(), 'cet': FluxoCET(),
+    })
+    duracao = time.perf_counter() - inicio
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"Carteira sintética (contrato de exemplo do servico.py, preço ±30%, semente {args.semente})")
+    print(f"{args.contratos} contratos em blocos de {args.bloco}: {duracao:.1f} s, pico de memória {pico_mb:.0f} MB")
+    print(resultado['totais'].to_string(index=False))
+    print("Maior parcela:", resultado['maior_parcela'])
+    print("CET da carteira (% a.a.):", {c: round(v, 2) for c, v in resultado['cet'].items()})
+    print(f"Agregado mensal: {len(resultado['mensal'])} meses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""Armazém de índices do BC compartilhado pelo processo.
+
+As séries de INCC, IPCA, TR e Poupança são as mesmas para todos os usuários,
+então são buscadas uma única vez (desde o Plano Real) e mantidas em memória.
+Uma thread em segundo plano faz a primeira busca assim que o armazém é criado
+(na partida do serviço HTTP; no Streamlit, no primeiro carregamento de página
+do processo) e o renova periodicamente (o BC publica os índices uma vez por mês). As consultas nunca
+esperam pela rede quando já existe uma cópia: com a cópia vencida, a renovação
+é disparada em segundo plano e a cópia atual é devolvida.
+
+Com `arquivo`, cada renovação grava um instantâneo que outros processos (por
+exemplo, os do pool do serviço HTTP) leem sem acessar a API do BC.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+from motor import buscar_indices_bc, buscar_series_bc
+
+logger = logging.getLogger(__name__)
+
+# Primeiro mês guardado (Plano Real), o mesmo usado pelo backtest
+INICIO_SERIES = datetime(1994, 7, 1)
+
+# Renovação a cada 6 horas; a cópia é considerada fresca por 24 horas
+INTERVALO_PADRAO = 6 * 3600
+VALIDADE_PADRAO = 24 * 3600
+# Espera entre tentativas quando a renovação falha
+RETENTATIVA_PADRAO = 300
+
+
+class ArmazemIndices:
+    """Cópia em memória das séries do BC, renovada em segundo plano, com métricas de atualidade."""
+
+    def __init__(self, arquivo=None, intervalo=INTERVALO_PADRAO, validade=VALIDADE_PADRAO, retentativa=RETENTATIVA_PADRAO, buscar=None):
+        self.arquivo = arquivo
+        self.intervalo = intervalo
+        self.validade = validade
+        self.retentativa = retentativa
+        self._buscar = buscar or buscar_series_bc
+        self._df = None
+        self._atualizado_em = None
+        self._mtime_arquivo = None
+        self._lock = threading.Lock()
+        self._atualizando = threading.Lock()
+        self._primeira_tentativa = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._contadores = {'consultas': 0, 'esperas': 0, 'atualizacoes': 0, 'falhas': 0, 'leituras_arquivo': 0}
+        self._ultimo_erro = None
+        self._ultima_tentativa = None
+        self._duracao_ultima = None
+
+    # ---- ciclo de vida ----
+
+    def iniciar(self):
+        """Inicia a thread de renovação (a primeira busca acontece imediatamente)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name='armazem-indices', daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self, timeout=5):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def aguardar(self, timeout=None):
+        """Espera a primeira busca da thread terminar; retorna True se há cópia."""
+        self._primeira_tentativa.wait(timeout)
+        return self._df is not None
+
+    @property
+    def em_segundo_plano(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _laco(self):
+        while not self._parar.is_set():
+            self._carregar_arquivo()
+            idade = self.idade()
+            ok = True
+            if idade is None or idade >= self.intervalo:
+                ok = self.atualizar()
+            self._primeira_tentativa.set()
+            idade = self.idade()
+            espera = self.intervalo - idade if ok and idade is not None else self.retentativa
+            self._parar.wait(max(espera, 1))
+
+    # ---- renovação ----
+
+    def atualizar(self, somente_se_vazio=False):
+        """Busca as séries no BC e substitui a cópia; em caso de falha mantém a anterior. Retorna True se há cópia nova."""
+        with self._atualizando:
+            if somente_se_vazio and self._df is not None:
+                return True
+            inicio = time.perf_counter()
+            self._ultima_tentativa = time.time()
+            try:
+                df = self._buscar(INICIO_SERIES, datetime.now())
+                if df.empty:
+                    raise ValueError("o SGS não devolveu dados")
+            except Exception as e:
+                with self._lock:
+                    self._contadores['falhas'] += 1
+                    self._ultimo_erro = str(e)
+                logger.warning("Falha ao renovar os índices do BC: %s", e)
+                return False
+            finally:
+                self._duracao_ultima = time.perf_counter() - inicio
+            with self._lock:
+                self._df = df
+                self._atualizado_em = time.time()
+                self._contadores['atualizacoes'] += 1
+                self._ultimo_erro = None
+            self._salvar_arquivo()
+            return True
+
+    def _salvar_arquivo(self):
+        if not self.arquivo:
+            return
+        temporario = f"{self.arquivo}.{os.getpid()}.tmp"
+        try:
+            with open(temporario, 'wb') as f:
+                pickle.dump({'df': self._df, 'atualizado_em': self._atualizado_em}, f)
+            os.replace(temporario, self.arquivo)
+            self._mtime_arquivo = os.path.getmtime(self.arquivo)
+        except OSError as e:
+            logger.warning("Não foi possível gravar o instantâneo dos índices em %s: %s", self.arquivo, e)
+
+    def _carregar_arquivo(self):
+        """Adota o instantâneo gravado por outro processo, se for mais recente que a cópia em memória."""
+        if not self.arquivo:
+            return
+        try:
+            mtime = os.path.getmtime(self.arquivo)
+        except OSError:
+            return
+        if mtime == self._mtime_arquivo:
+            return
+        try:
+            with open(self.arquivo, 'rb') as f:
+                dados = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning("Instantâneo dos índices ilegível em %s: %s", self.arquivo, e)
+            return
+        with self._lock:
+            self._mtime_arquivo = mtime
+            if self._atualizado_em is None or dados['atualizado_em'] > self._atualizado_em:
+                self._df = dados['df']
+                self._atualizado_em = dados['atualizado_em']
+                self._contadores['leituras_arquivo'] += 1
+
+    # ---- consultas ----
+
+    def idade(self):
+        """Segundos desde a última renovação da cópia (None se ainda não há cópia)."""
+        return None if self._atualizado_em is None else time.time() - self._atualizado_em
+
+    def fresco(self):
+        idade = self.idade()
+        return idade is not None and idade < self.validade
+
+    def series(self, data_inicio, data_fim, espera=60):
+        """Séries entre duas datas, no formato de `motor.buscar_series_bc`.
+
+        Só acessa a rede (ou espera pela thread) quando ainda não há cópia; uma
+        cópia vencida é devolvida e a renovação segue em segundo plano.
+        """
+        with self._lock:
+            self._contadores['consultas'] += 1
+        self._carregar_arquivo()
+        if self._df is None:
+            with self._lock:
+                self._contadores['esperas'] += 1
+            if self.em_segundo_plano:
+                self._primeira_tentativa.wait(espera)
+            if self._df is None:
+                self.atualizar(somente_se_vazio=True)
+            if self._df is None:
+                raise RuntimeError(self._ultimo_erro or "índices do BC indisponíveis")
+        elif not self.fresco() and not self.em_segundo_plano and not self._atualizando.locked():
+            threading.Thread(target=self.atualizar, name='renovacao-indices', daemon=True).start()
+        return self._df.loc[data_inicio:data_fim]
+
+    def metricas(self):
+        """Atualidade da cópia, último mês publicado de cada série e contadores de uso."""
+        with self._lock:
+            df = self._df
+            idade = self.idade()
+            ultimo_publicado = {}
+            if df is not None:
+                for serie in df.columns:
+                    validos = df[serie].dropna()
+                    ultimo_publicado[serie] = validos.index[-1].strftime("%m/%Y") if len(validos) else None
+            return {
+                'carregado': df is not None,
+                'fresco': self.fresco(),
+                'idade_segundos': idade,
+                'atualizado_em': datetime.fromtimestamp(self._atualizado_em).isoformat(timespec='seconds') if self._atualizado_em else None,
+                'ultimo_mes_publicado': ultimo_publicado,
+                'meses': 0 if df is None else len(df),
+                'em_segundo_plano': self.em_segundo_plano,
+                'ultima_tentativa': datetime.fromtimestamp(self._ultima_tentativa).isoformat(timespec='seconds') if self._ultima_tentativa else None,
+                'duracao_ultima_busca_s': self._duracao_ultima,
+                'ultimo_erro': self._ultimo_erro,
+                **self._contadores,
+            }
+
+# ============================================
+# ARMAZÉM DO PROCESSO
+# ============================================
+
+_ARMAZEM = None
+_LOCK_ARMAZEM = threading.Lock()
+
+
+def _criar_armazem(arquivo, segundo_plano, opcoes):
+    """Troca o armazém do processo; chamada com `_LOCK_ARMAZEM` adquirido."""
+    global _ARMAZEM
+    if _ARMAZEM is not None:
+        _ARMAZEM.parar(timeout=0)
+    _ARMAZEM = ArmazemIndices(arquivo=arquivo, **opcoes)
+    if segundo_plano:
+        _ARMAZEM.iniciar()
+    return _ARMAZEM
+
+
+def configurar_armazem(arquivo=None, segundo_plano=True, **opcoes):
+    """Substitui o armazém do processo (a thread do anterior é encerrada)."""
+    with _LOCK_ARMAZEM:
+        return _criar_armazem(arquivo, segundo_plano, opcoes)
+
+
+def armazem_padrao():
+    """Armazém compartilhado do processo, criado (com a primeira busca em segundo plano) no primeiro uso.
+
+    Verificação e criação acontecem sob a mesma trava: sessões simultâneas
+    nunca criam dois armazéns. `SIMULADOR_INDICES_ARQUIVO` define o
+    instantâneo compartilhado entre processos.
+    """
+    with _LOCK_ARMAZEM:
+        if _ARMAZEM is None:
+            return _criar_armazem(os.environ.get('SIMULADOR_INDICES_ARQUIVO') or None, True, {})
+        return _ARMAZEM
+
+
+def buscar_indices(mes_inicial, meses_total, diagnosticos=None, armazem=None):
+    """Como `motor.buscar_indices_bc`, mas lendo do armazém compartilhado."""
+    armazem = armazem or armazem_padrao()
+    return buscar_indices_bc(mes_inicial, meses_total, diagnosticos, buscar_series=armazem.series)
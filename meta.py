@@ -0,0 +1,280 @@
+"""Busca de meta: qual valor de uma entrada atinge um resultado desejado.
+
+Responde perguntas como "qual entrada mantém a maior parcela abaixo de
+R$ 5.000?" ou "qual prazo pós-chaves deixa o CET abaixo de 11% a.a.?". A
+variável escolhida (entrada, prazo pós-chaves ou total da fase pré-chaves) é
+tratada como inteira (centavos ou meses) e procurada por intervalos: a cada
+rodada, um lote de candidatos é avaliado numa única chamada do motor
+vetorizado, metade espalhada no intervalo atual e metade concentrada na
+estimativa da secante. O intervalo que contém a fronteira encolhe até dois
+valores vizinhos.
+
+O `ResolvedorMeta` guarda todas as avaliações do contrato e a última solução:
+buscas seguintes (outro alvo, outra métrica) partem do que já foi calculado
+e costumam terminar em uma ou duas rodadas.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from motor_vetorizado import CENARIOS, simular_cenarios_lote
+
+# Métrica -> rótulo exibido (todas vêm do resumo do cenário no motor vetorizado)
+METRICAS = {
+    'maior_parcela': 'Maior Parcela (R$)',
+    'custo_total': 'Custo Total (R$)',
+    'cet': 'CET (% a.a.)',
+}
+
+# Variável -> rótulo e unidade da busca (valores em reais são procurados em centavos)
+VARIAVEIS = {
+    'valor_entrada': {'rotulo': 'Valor total da entrada (R$)', 'escala': 100},
+    'meses_pos': {'rotulo': 'Nº de meses na fase pós-chaves', 'escala': 1},
+    'valor_pre': {'rotulo': 'Valor total pago na fase pré-chaves (R$)', 'escala': 100},
+}
+
+# Prazo máximo de amortização considerado quando não há limites explícitos
+PRAZO_MAXIMO = 420
+
+# Candidatos avaliados por rodada (o lote custa quase o mesmo que um contrato)
+CANDIDATOS_POR_RODADA = 16
+RODADAS_MAXIMAS = 20
+
+
+def _totais_fases(params):
+    extras = sum(params.get('parcelas_semestrais', {}).values()) + sum(params.get('parcelas_anuais', {}).values())
+    total_pre = params['parcelas_mensais_pre'] * params['meses_pre'] + extras
+    total_pos = params['valor_amortizacao_pos'] * params['meses_pos']
+    return extras, total_pre, total_pos
+
+
+def valor_atual(params, variavel):
+    """Valor da variável no contrato, na mesma unidade de `aplicar_variavel`."""
+    if variavel == 'valor_pre':
+        return _totais_fases(params)[1]
+    return params[variavel]
+
+
+def aplicar_variavel(params, variavel, valor):
+    """Cópia de `params` com a variável alterada, recalculando as parcelas base como a interface.
+
+    A diferença de entrada ou de total pré-chaves sai (ou entra) do saldo
+    pós-chaves; mudar o prazo pós-chaves redistribui o mesmo saldo.
+    """
+    extras, total_pre, total_pos = _totais_fases(params)
+    novo = dict(params)
+    if variavel == 'valor_entrada':
+        n_entrada = params.get('num_parcelas_entrada', 0)
+        novo['valor_entrada'] = valor
+        novo['entrada_mensal'] = valor / n_entrada if n_entrada > 0 else 0
+        total_pos -= valor - params['valor_entrada']
+    elif variavel == 'meses_pos':
+        novo['meses_pos'] = int(valor)
+    elif variavel == 'valor_pre':
+        novo['parcelas_mensais_pre'] = round((valor - extras) / params['meses_pre'], 2) if params['meses_pre'] > 0 else 0
+        total_pos -= valor - total_pre
+    else:
+        raise ValueError(f"variável deve ser uma de {list(VARIAVEIS)}")
+    novo['valor_amortizacao_pos'] = total_pos / novo['meses_pos'] if novo['meses_pos'] > 0 else 0
+    return novo
+
+
+def limites_padrao(params, variavel):
+    """Faixa de busca: da menor entrada/total possível até zerar o saldo pós-chaves; prazo de 1 a 420 meses."""
+    extras, total_pre, total_pos = _totais_fases(params)
+    if variavel == 'valor_entrada':
+        return 0.0, params['valor_entrada'] + total_pos
+    if variavel == 'meses_pos':
+        return 1, max(PRAZO_MAXIMO, params['meses_pos'])
+    return extras, total_pre + total_pos
+
+
+class ResolvedorMeta:
+    """Busca de meta para um contrato, cenário e variável, com memória das avaliações anteriores."""
+
+    def __init__(self, params, params_banco=None, valores_reais=None, cenario='sequencial', variavel='valor_entrada', diagnosticos=None):
+        if cenario not in CENARIOS:
+            raise ValueError(f"cenário deve ser um de {list(CENARIOS)}")
+        if variavel not in VARIAVEIS:
+            raise ValueError(f"variável deve ser uma de {list(VARIAVEIS)}")
+        self.params = params
+        self.params_banco = params_banco
+        self.valores_reais = valores_reais
+        self.cenario = cenario
+        self.variavel = variavel
+        self.escala = VARIAVEIS[variavel]['escala']
+        self._avaliados = {}
+        self._ultima_solucao = None
+        self.avaliacoes = 0
+        # Uma busca por vez neste resolvedor; resolvedores diferentes buscam em paralelo
+        self._lock = threading.Lock()
+        # O valor atual é avaliado à parte para que seus avisos cheguem ao coletor do chamador
+        self.atual = self._para_unidade(valor_atual(params, variavel))
+        self._avaliar([self.atual], diagnosticos)
+
+    def _para_unidade(self, valor):
+        return int(round(valor * self.escala))
+
+    def _de_unidade(self, unidade):
+        return unidade / self.escala if self.escala != 1 else int(unidade)
+
+    def _avaliar(self, unidades, diagnosticos=None):
+        novos = sorted({int(u) for u in unidades} - self._avaliados.keys())
+        if not novos:
+            return
+        lista = [aplicar_variavel(self.params, self.variavel, self._de_unidade(u)) for u in novos]
+        r = simular_cenarios_lote(lista, self.params_banco, self.valores_reais, (self.cenario,), [] if diagnosticos is None else diagnosticos, sombra=0)[self.cenario]
+        for i, u in enumerate(novos):
+            self._avaliados[u] = {'valido': bool(r['valido'][i]), **{m: float(r[m][i]) for m in METRICAS}}
+        self.avaliacoes += len(novos)
+
+    def metricas(self, valor):
+        """Métricas do cenário com a variável no `valor` dado (avaliando se necessário)."""
+        u = self._para_unidade(valor)
+        with self._lock:
+            self._avaliar([u])
+            return dict(self._avaliados[u])
+
+    def resolver(self, metrica, alvo, sentido='maximo', preferir='menor', limites=None):
+        """Menor (ou maior) valor da variável, dentro dos `limites`, com a métrica abaixo (ou acima) do alvo.
+
+        `sentido='maximo'` pede métrica <= alvo; `'minimo'`, métrica >= alvo.
+        Retorna um dicionário com 'valor' (None se o alvo é inatingível na
+        faixa), 'metricas' nesse valor, 'params' com o valor aplicado,
+        'atingivel', 'rodadas' e 'avaliacoes' (simulações feitas nesta busca).
+        A busca supõe uma única fronteira na faixa; com várias, encontra a
+        primeira na resolução da varredura inicial. Se nenhum ponto da
+        varredura atende, a busca se aproxima do melhor ponto avaliado (a
+        métrica pode ter um vale estreito, como a maior parcela com entrada
+        parcelada) antes de declarar o alvo inatingível.
+        """
+        if metrica not in METRICAS:
+            raise ValueError(f"métrica deve ser uma de {list(METRICAS)}")
+        if sentido not in ('maximo', 'minimo') or preferir not in ('menor', 'maior'):
+            raise ValueError("sentido deve ser 'maximo' ou 'minimo' e preferir, 'menor' ou 'maior'")
+        inferior, superior = limites or limites_padrao(self.params, self.variavel)
+        lo, hi = self._para_unidade(inferior), self._para_unidade(superior)
+        if lo > hi:
+            raise ValueError("limite inferior maior que o superior")
+        with self._lock:
+            avaliacoes_antes = self.avaliacoes
+
+            def atende(u):
+                v = self._avaliados[u]
+                if not v['valido']:
+                    return False
+                return v[metrica] <= alvo if sentido == 'maximo' else v[metrica] >= alvo
+
+            # Varredura inicial: faixa toda, mais um agrupamento em torno da última solução
+            k = CANDIDATOS_POR_RODADA
+            candidatos = list(np.linspace(lo, hi, k).round())
+            if self._ultima_solucao is not None and lo <= self._ultima_solucao <= hi:
+                passo = max(1, (hi - lo) // (k * k))
+                candidatos += [self._ultima_solucao + passo * d for d in range(-k // 4, k // 4 + 1)]
+            self._avaliar([c for c in candidatos if lo <= c <= hi])
+
+            rodadas = 1
+            a, b = self._fronteira(lo, hi, atende, preferir)
+            while a is None and b is None and rodadas < RODADAS_MAXIMAS:
+                candidatos = self._candidatos_melhor(lo, hi, metrica, sentido)
+                if not candidatos:
+                    break
+                self._avaliar(candidatos)
+                a, b = self._fronteira(lo, hi, atende, preferir)
+                rodadas += 1
+            while a is not None and b - a > 1 and rodadas < RODADAS_MAXIMAS:
+                self._avaliar(self._candidatos_refino(a, b, metrica, alvo))
+                a, b = self._fronteira(a, b, atende, preferir)
+                rodadas += 1
+
+            if a is None:
+                solucao = b
+            else:
+                solucao = b if preferir == 'menor' else a
+            resultado = {'atingivel': solucao is not None, 'valor': None, 'metricas': None, 'params': None,
+                         'rodadas': rodadas, 'avaliacoes': self.avaliacoes - avaliacoes_antes}
+            if solucao is not None:
+                self._ultima_solucao = solucao
+                valor = self._de_unidade(solucao)
+                resultado.update(valor=valor, metricas=dict(self._avaliados[solucao]),
+                                 params=aplicar_variavel(self.params, self.variavel, valor))
+            return resultado
+
+    def _fronteira(self, lo, hi, atende, preferir):
+        """Par vizinho (não atende, atende) entre os pontos já avaliados em [lo, hi].
+
+        Retorna (None, u) quando o extremo preferido já atende e (None, None)
+        quando nenhum ponto atende.
+        """
+        pontos = sorted(u for u in self._avaliados if lo <= u <= hi)
+        if preferir == 'maior':
+            pontos = pontos[::-1]
+        anterior = None
+        for u in pontos:
+            if atende(u):
+                if anterior is None:
+                    return None, u
+                return (anterior, u) if preferir == 'menor' else (u, anterior)
+            anterior = u
+        return None, None
+
+    def _candidatos_melhor(self, lo, hi, metrica, sentido):
+        """Candidatos ainda não avaliados entre os vizinhos do melhor ponto já avaliado em [lo, hi].
+
+        O melhor ponto é o de menor métrica (sentido 'maximo') ou maior
+        ('minimo'); lista vazia quando não há ponto válido ou o intervalo se esgotou.
+        """
+        pontos = sorted(u for u in self._avaliados if lo <= u <= hi)
+        validos = [j for j, u in enumerate(pontos) if self._avaliados[u]['valido']]
+        if not validos:
+            return []
+        sinal = 1 if sentido == 'maximo' else -1
+        j = min(validos, key=lambda j: sinal * self._avaliados[pontos[j]][metrica])
+        a, b = pontos[max(j - 1, 0)], pontos[min(j + 1, len(pontos) - 1)]
+        candidatos = np.linspace(a, b, CANDIDATOS_POR_RODADA + 2)[1:-1].round()
+        return sorted({int(c) for c in candidatos} - self._avaliados.keys())
+
+    def _candidatos_refino(self, a, b, metrica, alvo):
+        """Metade dos candidatos espalhada em (a, b) e metade em torno da estimativa da secante.
+
+        Os pontos da secante ficam a distâncias geométricas (1/16, 1/256... do
+        intervalo, até uma unidade), cobrindo tanto uma estimativa grosseira quanto uma quase exata.
+        """
+        k = CANDIDATOS_POR_RODADA
+        candidatos = list(np.linspace(a, b, k // 2 + 2)[1:-1].round())
+        va, vb = self._avaliados[a], self._avaliados[b]
+        if va['valido'] and vb['valido'] and va[metrica] != vb[metrica]:
+            secante = a + (b - a) * (alvo - va[metrica]) / (vb[metrica] - va[metrica])
+            if a < secante < b:
+                distancias = {max(1, round((b - a) / 16 ** i)) for i in range(1, 5)} | {1}
+                candidatos += [round(secante)] + [round(secante + sinal * d) for d in distancias for sinal in (-1, 1)]
+        return [c for c in candidatos if a < c < b]
+
+# ============================================
+# RESOLVEDORES REAPROVEITADOS
+# ============================================
+
+_RESOLVEDORES = OrderedDict()
+_LOCK_RESOLVEDORES = threading.Lock()
+RESOLVEDORES_GUARDADOS = 32
+
+
+def buscar_meta(params, params_banco, variavel, metrica, alvo, cenario='sequencial', valores_reais=None, sentido='maximo', preferir='menor', limites=None, diagnosticos=None):
+    """Atalho de `ResolvedorMeta.resolver` que reaproveita o resolvedor do mesmo contrato entre chamadas."""
+    chave = hashlib.sha1(json.dumps([params, params_banco, valores_reais, cenario, variavel], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    with _LOCK_RESOLVEDORES:
+        resolvedor = _RESOLVEDORES.pop(chave, None)
+        if resolvedor is not None:
+            _RESOLVEDORES[chave] = resolvedor
+    if resolvedor is None:
+        # Criado fora da trava global; se outra chamada guardou o mesmo contrato antes, vale o dela
+        novo = ResolvedorMeta(params, params_banco, valores_reais, cenario, variavel, diagnosticos)
+        with _LOCK_RESOLVEDORES:
+            resolvedor = _RESOLVEDORES.pop(chave, novo)
+            _RESOLVEDORES[chave] = resolvedor
+            while len(_RESOLVEDORES) > RESOLVEDORES_GUARDADOS:
+                _RESOLVEDORES.popitem(last=False)
+    return resolvedor.resolver(metrica, alvo, sentido, preferir, limites)
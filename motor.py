@@ -0,0 +1,937 @@
+"""Motor de simulação de financiamento, independente do Streamlit.
+
+Pode ser importado por processos de trabalho, pelo serviço HTTP e por scripts
+de linha de comando sem pagar o custo de importação da interface. Módulos
+pesados ou de rede (`sgs`, `numpy_financial`) são importados apenas quando
+usados. Avisos e erros não são exibidos pelo motor: são devolvidos como
+objetos `Diagnostico` numa lista coletora, que a interface renderiza e os
+processamentos em lote agregam.
+"""
+import logging
+import threading
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# DIAGNÓSTICOS
+# ============================================
+
+@dataclass
+class Diagnostico:
+    """Aviso ou erro produzido por uma simulação."""
+    nivel: str  # 'aviso' ou 'erro'
+    codigo: str
+    mensagem: str
+    contexto: dict = field(default_factory=dict)
+
+    def para_dict(self):
+        return asdict(self)
+
+def registrar_diagnostico(diagnosticos, nivel, codigo, mensagem, **contexto):
+    """Adiciona um diagnóstico à lista coletora; sem coletora, registra no log."""
+    diagnostico = Diagnostico(nivel, codigo, mensagem, contexto)
+    if diagnosticos is not None:
+        diagnosticos.append(diagnostico)
+    elif nivel == 'erro':
+        logger.error(mensagem)
+    else:
+        logger.warning(mensagem)
+    return diagnostico
+
+def agregar_diagnosticos(diagnosticos):
+    """Agrupa diagnósticos repetidos (ex.: de vários cenários ou contratos) por nível, código e mensagem."""
+    contagem = {}
+    for d in diagnosticos:
+        chave = (d.nivel, d.codigo, d.mensagem)
+        contagem[chave] = contagem.get(chave, 0) + 1
+    return pd.DataFrame(
+        [{'nivel': n, 'codigo': c, 'mensagem': m, 'ocorrencias': q} for (n, c, m), q in contagem.items()],
+        columns=['nivel', 'codigo', 'mensagem', 'ocorrencias']
+    )
+
+# ============================================
+# UTILITÁRIAS
+# ============================================
+
+def format_currency(value):
+    """Formata valores no padrão brasileiro R$"""
+    if pd.isna(value) or not isinstance(value, (int, float)):
+        return "R$ 0,00"
+    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def converter_juros_anual_para_mensal(taxa_anual):
+    """Converte taxa anual (ex: 0.12) para taxa efetiva mensal."""
+    if taxa_anual <= -1:
+        return -1
+    return (1 + taxa_anual)**(1/12) - 1
+
+def calcular_cet(valor_financiado, pagamentos):
+    """Calcula o Custo Efetivo Total (CET) anual a partir de um fluxo de caixa."""
+    if valor_financiado <= 0 or not any(p > 0 for p in pagamentos):
+        return 0.0
+    fluxo_de_caixa = [valor_financiado] + [-p for p in pagamentos]
+    import numpy_financial as npf
+    try:
+        taxa_mensal = npf.irr(fluxo_de_caixa)
+        if np.isnan(taxa_mensal) or np.isinf(taxa_mensal):
+            return 0.0
+        taxa_anual = (1 + taxa_mensal)**12 - 1
+        return taxa_anual * 100
+    except Exception:
+        return 0.0
+
+def calcular_cet_cenario(df, valor_total_imovel):
+    """Calcula o CET de um cenário simulado, tratando a parcela da assinatura como pagamento em t0."""
+    if df.empty:
+        return 0.0
+    pagamento_t0 = df['Parcela Total (R$)'].iloc[0] if not df[df['Fase'] == 'Assinatura'].empty else 0
+    valor_financiado_liquido = valor_total_imovel - pagamento_t0
+    pagamentos_futuros = df['Parcela Total (R$)'][df['Fase'] != 'Assinatura'].tolist()
+    return calcular_cet(valor_financiado_liquido, pagamentos_futuros)
+
+# ============================================
+# LÓGICA DA CONSTRUTORA
+# ============================================
+
+def construir_parcelas_futuras(params):
+    parcelas = []
+    num_parcelas_entrada = params['num_parcelas_entrada'] if params['tipo_pagamento_entrada'] == 'Parcelada' else 0
+    
+    for mes in range(1, num_parcelas_entrada + 1):
+        parcelas.append({'mes': mes, 'valor_original': params['entrada_mensal'], 'correcao_acumulada': 0.0, 'tipo': 'entrada'})
+    
+    for mes in range(num_parcelas_entrada + 1, num_parcelas_entrada + 1 + params['meses_pre']):
+        valor_parcela = params['parcelas_mensais_pre']
+        mes_local = mes - num_parcelas_entrada
+        
+        for sem_mes in params['parcelas_semestrais']:
+            if mes_local == sem_mes:
+                valor_parcela += params['parcelas_semestrais'][sem_mes]
+        
+        for anu_mes in params['parcelas_anuais']:
+            if mes_local == anu_mes:
+                valor_parcela += params['parcelas_anuais'][anu_mes]
+        
+        if valor_parcela > 0:
+            parcelas.append({'mes': mes, 'valor_original': valor_parcela, 'correcao_acumulada': 0.0, 'tipo': 'pre'})
+            
+    for mes in range(num_parcelas_entrada + 1 + params['meses_pre'], num_parcelas_entrada + 1 + params['meses_pre'] + params['meses_pos']):
+        parcelas.append({'mes': mes, 'valor_original': params['valor_amortizacao_pos'], 'correcao_acumulada': 0.0, 'tipo': 'pos'})
+        
+    return parcelas
+
+def calcular_correcao(saldo, mes, fase, params, valores_reais):
+    if fase not in ['Assinatura', 'Carência']:
+        inicio_correcao = params.get('inicio_correcao', 1)
+        if inicio_correcao == 0:
+            inicio_correcao = 1
+        if mes < inicio_correcao:
+            return 0, 'N/A'
+            
+        limite = params.get('limite_correcao')
+        if limite is not None and mes > limite:
+            return 0, 'N/A'
+            
+        if valores_reais is not None and mes in valores_reais:
+            idx = valores_reais[mes]
+            if fase in ['Entrada','Pré', 'Carência'] and idx.get('incc') is not None and pd.notna(idx.get('incc')):
+                return saldo * idx['incc'], 'INCC'
+            elif fase == 'Pós' and idx.get('ipca') is not None and pd.notna(idx.get('ipca')):
+                return saldo * idx['ipca'], 'IPCA'
+                
+        if fase in ['Entrada','Pré', 'Carência']:
+            return saldo * params.get('incc_medio', 0), 'INCC (Médio)'
+        elif fase == 'Pós':
+            return saldo * params.get('ipca_medio', 0), 'IPCA (Médio)'
+            
+    return 0, 'N/A'
+
+def processar_parcelas_vencidas(parcelas_futuras, mes_atual):
+    vencidas = [p for p in parcelas_futuras if p['mes'] == mes_atual]
+    pagamento_total, amortizacao_total, correcao_paga_total = 0, 0, 0
+    
+    for parcela in vencidas:
+        pagamento_parcela = parcela['valor_original'] + parcela['correcao_acumulada']
+        pagamento_total += pagamento_parcela
+        amortizacao_total += parcela['valor_original']
+        correcao_paga_total += parcela['correcao_acumulada']
+        parcelas_futuras.remove(parcela)
+        
+    return pagamento_total, amortizacao_total, correcao_paga_total
+
+def verificar_quitacao_pre(params, total_amortizado_acumulado, diagnosticos=None):
+    percentual = total_amortizado_acumulado / params['valor_total_imovel']
+    if percentual < params['percentual_minimo_quitacao']:
+        valor_fmt = format_currency(total_amortizado_acumulado)
+        registrar_diagnostico(diagnosticos, 'aviso', 'quitacao_pre_abaixo_minimo', f"Atenção: valor quitado na pré ({valor_fmt}) equivale a {percentual*100:.2f}% do valor do imóvel, abaixo de {params['percentual_minimo_quitacao']*100:.0f}%.",
+                               valor_quitado=total_amortizado_acumulado, percentual=percentual, percentual_minimo=params['percentual_minimo_quitacao'])
+
+def simular_financiamento(params, valores_reais=None, diagnosticos=None):
+    return pd.DataFrame(list(gerar_linhas_financiamento(params, valores_reais, diagnosticos)))
+
+def gerar_linhas_financiamento(params, valores_reais=None, diagnosticos=None):
+    """Gera, uma a uma, as linhas da tabela de `simular_financiamento` (assinatura, carência e parcelas)."""
+    try:
+        data_assinatura = datetime.strptime(params['mes_assinatura'], "%m/%Y")
+        data_primeira_parcela = datetime.strptime(params['mes_primeira_parcela'], "%m/%Y")
+        if data_primeira_parcela < data_assinatura:
+            registrar_diagnostico(diagnosticos, 'erro', 'primeira_parcela_antes_assinatura', "O mês da primeira parcela não pode ser anterior ao mês de assinatura!",
+                                   mes_assinatura=params['mes_assinatura'], mes_primeira_parcela=params['mes_primeira_parcela'])
+            return
+    except:
+        registrar_diagnostico(diagnosticos, 'erro', 'datas_invalidas', "Datas inválidas! Use o formato MM/AAAA.",
+                               mes_assinatura=params.get('mes_assinatura'), mes_primeira_parcela=params.get('mes_primeira_parcela'))
+        return
+
+    saldo_devedor = params['valor_total_imovel']
+    amortizacao_total_acumulada = 0
+    amortizacao_assinatura = 0
+    
+    if params['tipo_pagamento_entrada'] == 'Paga no ato':
+        amortizacao_assinatura = params['valor_entrada']
+        
+    saldo_devedor -= amortizacao_assinatura
+    amortizacao_total_acumulada += amortizacao_assinatura
+    
+    yield {
+        'DataObj': data_assinatura,
+        'Mês/Data': f"Assinatura [{data_assinatura.strftime('%m/%Y')}]",
+        'Fase': 'Assinatura',
+        'Saldo Devedor': saldo_devedor,
+        'Parcela Total (R$)': amortizacao_assinatura,
+        'Amortização Base (R$)': amortizacao_assinatura,
+        'Correção Monetária Paga (R$)': 0,
+        'Taxa de Juros (%)': 0,
+        'Juros (R$)': 0,
+        'Correção Monetária Gerada (R$)': 0,
+        'Índice Correção': 'N/A',
+        'Encargos (R$)': 0
+    }
+    
+    meses_carencia = (data_primeira_parcela.year - data_assinatura.year) * 12 + (data_primeira_parcela.month - data_assinatura.month)
+    data_corrente_carencia = data_assinatura
+    saldo_temp_carencia = saldo_devedor
+    total_correcao_carencia = 0
+    
+    for i in range(meses_carencia):
+        data_corrente_carencia += relativedelta(months=1)
+        correcao_mes_carencia, indice_carencia = calcular_correcao(saldo_temp_carencia, 0, 'Carência', params, valores_reais)
+        total_correcao_carencia += correcao_mes_carencia
+        saldo_temp_carencia += correcao_mes_carencia
+        yield {
+            'DataObj': data_corrente_carencia,
+            'Mês/Data': f"Gerou Correção [{data_corrente_carencia.strftime('%m/%Y')}]",
+            'Fase': 'Carência',
+            'Saldo Devedor': saldo_devedor,
+            'Parcela Total (R$)': 0,
+            'Amortização Base (R$)': 0,
+            'Correção Monetária Paga (R$)': 0,
+            'Taxa de Juros (%)': 0,
+            'Juros (R$)': 0,
+            'Correção Monetária Gerada (R$)': correcao_mes_carencia,
+            'Índice Correção': indice_carencia,
+            'Encargos (R$)': 0
+        }
+        
+    parcelas_futuras = construir_parcelas_futuras(params)
+    
+    if total_correcao_carencia > 0 and parcelas_futuras:
+        total_original = sum(p['valor_original'] for p in parcelas_futuras)
+        if total_original > 0:
+            for p in parcelas_futuras:
+                p['correcao_acumulada'] += total_correcao_carencia * (p['valor_original'] / total_original)
+
+    num_parcelas_entrada = params.get('num_parcelas_entrada', 0)
+    total_meses_pagamento = num_parcelas_entrada + params['meses_pre'] + params['meses_pos']
+    mes_pos_chaves_contador = 0
+    
+    for mes_atual in range(1, total_meses_pagamento + 1):
+        data_mes = data_primeira_parcela + relativedelta(months=mes_atual-1)
+        
+        fase = 'Pós'
+        if mes_atual <= num_parcelas_entrada:
+            fase = 'Entrada'
+        elif mes_atual <= num_parcelas_entrada + params['meses_pre']:
+            fase = 'Pré'
+            
+        pagamento, amortizacao, correcao_paga = processar_parcelas_vencidas(parcelas_futuras, mes_atual)
+        amortizacao_total_acumulada += amortizacao
+        saldo_devedor -= (amortizacao + correcao_paga)
+        
+        correcao_mes, indice_mes = calcular_correcao(saldo_devedor, mes_atual, fase, params, valores_reais)
+        saldo_devedor += correcao_mes
+        
+        if parcelas_futuras and correcao_mes != 0:
+            total_original = sum(p['valor_original'] for p in parcelas_futuras)
+            if total_original > 0:
+                for p in parcelas_futuras:
+                    p['correcao_acumulada'] += correcao_mes * (p['valor_original'] / total_original)
+                    
+        taxa_juros_mes, juros_mes = 0.0, 0.0
+        if fase == 'Pós':
+            mes_pos_chaves_contador += 1
+            taxa_juros_mes = mes_pos_chaves_contador / 100.0
+            juros_mes = (amortizacao + correcao_paga) * taxa_juros_mes
+            
+        saldo_devedor = max(saldo_devedor, 0)
+        
+        yield {
+            'DataObj': data_mes,
+            'Mês/Data': f"{mes_atual} - [{data_mes.strftime('%m/%Y')}]",
+            'Fase': fase,
+            'Saldo Devedor': saldo_devedor,
+            'Parcela Total (R$)': pagamento + juros_mes,
+            'Amortização Base (R$)': amortizacao,
+            'Correção Monetária Paga (R$)': correcao_paga,
+            'Taxa de Juros (%)': taxa_juros_mes * 100 if fase == 'Pós' else 0,
+            'Juros (R$)': juros_mes,
+            'Correção Monetária Gerada (R$)': correcao_mes,
+            'Índice Correção': indice_mes,
+            'Encargos (R$)': 0
+        }
+        
+        if fase == 'Pré' and mes_atual == num_parcelas_entrada + params['meses_pre']:
+            verificar_quitacao_pre(params, amortizacao_total_acumulada, diagnosticos)
+
+# ============================================
+# BUSCAR ÍNDICES BC
+# ============================================
+
+# Códigos das séries mensais no SGS do Banco Central
+CODIGOS_SGS = {192: 'incc', 433: 'ipca', 226: 'tr', 4390: 'poupanca'}
+
+# Defasagem (meses) entre o mês da parcela e o índice publicado usado na correção
+DEFASAGEM_INDICES = 2
+
+def buscar_series_bc(data_inicio, data_fim):
+    """Busca no SGS as séries de INCC, IPCA, TR e Poupança entre duas datas, já em decimal."""
+    import sgs
+    start_str = data_inicio.strftime("%d/%m/%Y")
+    end_str = data_fim.strftime("%d/%m/%Y")
+    
+    df = sgs.dataframe(list(CODIGOS_SGS), start=start_str, end=end_str)
+    if df.empty:
+        return pd.DataFrame()
+        
+    df = df.rename(columns=CODIGOS_SGS)
+    for coluna in CODIGOS_SGS.values():
+        df[coluna] /= 100
+    return df
+
+def mapear_indices_por_mes(df, mes_inicial, meses_total):
+    """Associa a cada parcela (1..meses_total) os índices publicados DEFASAGEM_INDICES meses antes."""
+    data_inicio_simulacao = datetime.strptime(mes_inicial, "%m/%Y").replace(day=1)
+    indices = {}
+    ultimo_mes_com_dado = 0
+    dados_por_data = {idx.strftime("%Y-%m-%d"): row.to_dict() for idx, row in df.iterrows()}
+    current_date_simulacao = data_inicio_simulacao
+    
+    for mes in range(1, meses_total + 1):
+        data_referencia_str = (current_date_simulacao - relativedelta(months=DEFASAGEM_INDICES)).strftime("%Y-%m-%d")
+        if data_referencia_str in dados_por_data:
+            valores = dados_por_data[data_referencia_str]
+            if pd.notna(valores.get('incc')) or pd.notna(valores.get('ipca')) or pd.notna(valores.get('tr')) or pd.notna(valores.get('poupanca')):
+                ultimo_mes_com_dado = mes
+            indices[mes] = valores
+        else:
+            indices[mes] = {'incc': None, 'ipca': None, 'tr': None, 'poupanca': None}
+        current_date_simulacao += relativedelta(months=1)
+        
+    return indices, ultimo_mes_com_dado
+
+def buscar_indices_bc(mes_inicial, meses_total, diagnosticos=None, buscar_series=None):
+    """Índices reais por parcela; `buscar_series` substitui a busca direta no SGS (ex.: `indices.ArmazemIndices.series`)."""
+    try:
+        data_inicio_simulacao = datetime.strptime(mes_inicial, "%m/%Y").replace(day=1)
+        data_inicio_busca = data_inicio_simulacao - relativedelta(months=DEFASAGEM_INDICES)
+        data_fim_busca = data_inicio_simulacao + relativedelta(months=meses_total)
+        
+        df = (buscar_series or buscar_series_bc)(data_inicio_busca, data_fim_busca)
+        if df.empty:
+            return {}, 0, pd.DataFrame()
+            
+        indices, ultimo_mes_com_dado = mapear_indices_por_mes(df, mes_inicial, meses_total)
+        return indices, ultimo_mes_com_dado, df
+    except Exception as e:
+        registrar_diagnostico(diagnosticos, 'erro', 'falha_indices_bc', f"Erro ao acessar dados do BC: {str(e)}", mes_inicial=mes_inicial)
+        return {}, 0, pd.DataFrame()
+
+# ============================================
+# LÓGICA DE JUROS DE OBRA
+# ============================================
+
+def _obter_percentual_obra(mes_obra_atual, prazo_obra_total, metodo, marcos={}):
+    """Calcula o percentual de conclusão da obra para um determinado mês."""
+    if mes_obra_atual <= 0:
+        return 0.0
+    if mes_obra_atual >= prazo_obra_total:
+        return 1.0
+        
+    percentual = 0.0
+    if metodo == 'Linear':
+        percentual = mes_obra_atual / prazo_obra_total
+    elif metodo == 'Progressiva (S-Curve)':
+        t = mes_obra_atual / prazo_obra_total
+        percentual = (3 * t**2) - (2 * t**3)
+    elif metodo == 'Manual':
+        if not marcos:
+            return 0.0
+        meses_ordenados = sorted(marcos.keys())
+        if mes_obra_atual < meses_ordenados[0]:
+            fator = mes_obra_atual / meses_ordenados[0]
+            percentual = marcos[meses_ordenados[0]] * fator
+        else:
+            mes_anterior, perc_anterior = 0, 0
+            encontrou_intervalo = False
+            for mes_marco in meses_ordenados:
+                if mes_obra_atual >= mes_marco:
+                    mes_anterior, perc_anterior = mes_marco, marcos[mes_marco]
+                else:
+                    mes_seguinte, perc_seguinte = mes_marco, marcos[mes_marco]
+                    if (mes_seguinte - mes_anterior) > 0:
+                        fator = (mes_obra_atual - mes_anterior) / (mes_seguinte - mes_anterior)
+                        percentual = perc_anterior + fator * (perc_seguinte - perc_anterior)
+                    else:
+                        percentual = perc_anterior
+                    encontrou_intervalo = True
+                    break
+            if not encontrou_intervalo:
+                mes_seguinte, perc_seguinte = prazo_obra_total, 100
+                if (mes_seguinte - mes_anterior) > 0:
+                    fator = (mes_obra_atual - mes_anterior) / (mes_seguinte - mes_anterior)
+                    percentual = perc_anterior + fator * (perc_seguinte - perc_anterior)
+                else:
+                    percentual = perc_anterior
+        percentual /= 100.0
+        
+    return min(1.0, max(0.0, percentual))
+
+
+def calcular_juros_obra_detalhado(params_gerais, params_banco, params_construtora, valor_financiado, diagnosticos=None):
+    return pd.DataFrame(list(gerar_linhas_juros_obra(params_gerais, params_banco, params_construtora, valor_financiado, diagnosticos)))
+
+def gerar_linhas_juros_obra(params_gerais, params_banco, params_construtora, valor_financiado, diagnosticos=None):
+    """Gera, mês a mês, as linhas de juros de obra e encargos cobrados pelo banco durante a construção."""
+    data_assinatura_banco = datetime.strptime(params_gerais['mes_assinatura'], "%m/%Y")
+    data_inicio_obra = datetime.combine(params_construtora['data_inicio_obra'], datetime.min.time())
+
+    meses_obra_ate_contrato = (data_assinatura_banco.year - data_inicio_obra.year) * 12 + (data_assinatura_banco.month - data_inicio_obra.month)
+    prazo_restante_obra_usuario = params_construtora.get('num_parcelas_entrada', 0) + params_construtora['meses_pre']
+    prazo_obra_total_meses = meses_obra_ate_contrato + prazo_restante_obra_usuario
+    metodo_calculo = params_banco['metodo_calculo_juros']
+
+    if prazo_obra_total_meses <= 0:
+        return
+        
+    marcos = {}
+    if metodo_calculo == 'Manual':
+        try:
+            items = params_banco['marcos_liberacao'].replace(" ", "").split(',')
+            for item in items:
+                mes, perc = item.split(':')
+                marcos[int(mes)] = float(perc)
+        except Exception:
+            registrar_diagnostico(diagnosticos, 'erro', 'marcos_liberacao_invalidos', "Formato dos marcos de liberação inválido. Use: 'mes:percentual, mes:percentual'. Ex: '6:20, 12:50'",
+                                   marcos_liberacao=params_banco['marcos_liberacao'])
+            return
+            
+    meses_restantes_obra = prazo_obra_total_meses - meses_obra_ate_contrato
+    if meses_restantes_obra <= 0:
+        return
+        
+    taxa_juros_mensal = (params_banco['taxa_juros_anual'] / 100) / 12
+    taxa_admin_mensal_valor = params_banco.get('taxa_admin_mensal', 0)
+    seguro_total_inicial = params_banco.get('seguro_total_primeira_parcela', 0)
+    percentual_dfi = params_banco.get('percentual_dfi_estimado', 30.0) / 100
+    valor_seguro_dfi = seguro_total_inicial * percentual_dfi
+    valor_seguro_mip_inicial = seguro_total_inicial - valor_seguro_dfi
+    taxa_mip = valor_seguro_mip_inicial / valor_financiado if valor_financiado > 0 else 0
+    
+    for i in range(meses_restantes_obra):
+        data_corrente = data_assinatura_banco + relativedelta(months=i)
+        mes_total_obra_atual = meses_obra_ate_contrato + i + 1
+        
+        percentual_conclusao_acumulado = _obter_percentual_obra(
+            mes_obra_atual=mes_total_obra_atual,
+            prazo_obra_total=prazo_obra_total_meses,
+            metodo=metodo_calculo,
+            marcos=marcos
+        )
+        
+        perc_obra_inicio_contrato = _obter_percentual_obra(
+            mes_obra_atual=meses_obra_ate_contrato,
+            prazo_obra_total=prazo_obra_total_meses,
+            metodo=metodo_calculo,
+            marcos=marcos
+        )
+        
+        percentual_conclusao_acumulado = max(perc_obra_inicio_contrato, percentual_conclusao_acumulado)
+        
+        saldo_liberado_obra = valor_financiado * percentual_conclusao_acumulado
+        juros_obra = saldo_liberado_obra * taxa_juros_mensal
+        
+        seguro_mip_obra = taxa_mip * saldo_liberado_obra
+        seguro_obra = seguro_mip_obra + valor_seguro_dfi
+        
+        encargos_obra = taxa_admin_mensal_valor + seguro_obra
+        parcela_obra = juros_obra + encargos_obra
+        
+        yield {
+            'DataObj': data_corrente,
+            'Mês/Data': f"Obra {i+1} - [{data_corrente.strftime('%m/%Y')}]",
+            'Fase': 'Juros de Obra',
+            'Saldo Devedor': valor_financiado,
+            'Amortização Base (R$)': 0,
+            'Juros (R$)': juros_obra,
+            'Correção Monetária Paga (R$)': 0,
+            'Encargos (R$)': encargos_obra,
+            'Parcela Total (R$)': parcela_obra,
+            'Correção Monetária Gerada (R$)': 0,
+            'Índice Correção': f'{percentual_conclusao_acumulado:.2%} concluído',
+            'Taxa de Juros (%)': taxa_juros_mensal * 100
+        }
+
+# ============================================
+# SIMULAÇÃO BANCÁRIA
+# ============================================
+
+def simular_financiamento_bancario_completo(params_gerais, params_banco, params_construtora, valores_reais=None, offset_mes=0, include_obra=True, valor_financiado_override=None, prazo_amort_override=None, diagnosticos=None):
+    historico_df = pd.DataFrame()
+    valor_financiado = valor_financiado_override if valor_financiado_override is not None else (params_gerais['valor_total_imovel'] - params_gerais['valor_entrada'])
+    
+    if include_obra:
+        df_juros_obra = calcular_juros_obra_detalhado(params_gerais, params_banco, params_construtora, valor_financiado, diagnosticos)
+        if not df_juros_obra.empty:
+            historico_df = pd.concat([historico_df, df_juros_obra], ignore_index=True)
+            
+    prazo_amort = prazo_amort_override if prazo_amort_override is not None else params_construtora['meses_pos']
+    
+    if prazo_amort <= 0:
+        return historico_df
+        
+    data_inicio_amortizacao = datetime.strptime(params_gerais['mes_assinatura'], "%m/%Y")
+    if not historico_df.empty:
+        data_inicio_amortizacao = historico_df['DataObj'].max() + relativedelta(months=1)
+        
+    df_amort = pd.DataFrame(list(gerar_linhas_amortizacao(params_banco, valor_financiado, prazo_amort, data_inicio_amortizacao, valores_reais, offset_mes, diagnosticos)))
+    if df_amort.empty:
+        # Sistema de amortização desconhecido (diagnóstico já registrado)
+        return pd.DataFrame()
+    return pd.concat([historico_df, df_amort], ignore_index=True)
+
+def gerar_linhas_amortizacao(params_banco, valor_financiado, prazo_amort, data_inicio_amortizacao, valores_reais=None, offset_mes=0, diagnosticos=None):
+    """Gera, mês a mês, as parcelas PRICE/SAC do banco com seguros, taxa de administração e indexador."""
+    taxa_juros_mensal = (params_banco['taxa_juros_anual'] / 100) / 12
+    taxa_admin_mensal_valor = params_banco.get('taxa_admin_mensal', 0)
+    
+    seguro_total_inicial = params_banco.get('seguro_total_primeira_parcela', 0)
+    percentual_dfi = params_banco.get('percentual_dfi_estimado', 30.0) / 100
+    valor_seguro_dfi = seguro_total_inicial * percentual_dfi
+    valor_seguro_mip_inicial = seguro_total_inicial - valor_seguro_dfi
+    taxa_mip = valor_seguro_mip_inicial / valor_financiado if valor_financiado > 0 else 0
+
+    indexador = params_banco.get('indexador', 'TR')
+    tr_medio = params_banco.get('tr_medio', 0.0)
+    ipca_medio = params_banco.get('ipca_medio', 0.0)
+    poupanca_medio = params_banco.get('poupanca_medio', 0.0)
+    sistema = params_banco.get('sistema_amortizacao', 'PRICE')
+    saldo_devedor = valor_financiado
+    
+    for i in range(prazo_amort):
+        data_corrente = data_inicio_amortizacao + relativedelta(months=i)
+        
+        taxa_index, indice_aplicado = 0, 'Fixa'
+        if indexador in ['TR', 'IPCA', 'Poupança']:
+            chave_mes = offset_mes + i + 1
+            if valores_reais and chave_mes in valores_reais and pd.notna(valores_reais[chave_mes].get(indexador.lower())):
+                taxa_index = valores_reais[chave_mes].get(indexador.lower(), 0) or 0
+                indice_aplicado = indexador
+            else:
+                if indexador == 'TR':
+                    taxa_index = tr_medio
+                elif indexador == 'IPCA':
+                    taxa_index = ipca_medio
+                elif indexador == 'Poupança':
+                    taxa_index = poupanca_medio
+                indice_aplicado = f'{indexador} (Médio)'
+                
+        juros = saldo_devedor * taxa_juros_mensal
+        ajuste_index = saldo_devedor * taxa_index
+        
+        seguro_mip = taxa_mip * saldo_devedor
+        seguro_mensal = seguro_mip + valor_seguro_dfi
+
+        encargos = seguro_mensal + taxa_admin_mensal_valor
+        amortizacao = 0
+        
+        if sistema == 'PRICE':
+            r, n = taxa_juros_mensal, prazo_amort
+            parcela_fix = (r * valor_financiado) / (1 - (1 + r) ** (-n)) if r > 0 else valor_financiado / n
+            amortizacao = parcela_fix - juros
+        elif sistema == 'SAC':
+            amortizacao = valor_financiado / prazo_amort
+        else:
+            registrar_diagnostico(diagnosticos, 'erro', 'sistema_amortizacao_desconhecido', f'Sistema de amortização desconhecido: {sistema}. Use SAC ou PRICE.', sistema=sistema)
+            return
+            
+        parcela_total = amortizacao + juros + encargos + ajuste_index
+        saldo_devedor = max(saldo_devedor - amortizacao, 0)
+        
+        yield {
+            'DataObj': data_corrente,
+            'Mês/Data': f"{i+1} - [{data_corrente.strftime('%m/%Y')}]",
+            'Fase': f'Amortização {sistema}',
+            'Saldo Devedor': saldo_devedor,
+            'Amortização Base (R$)': amortizacao,
+            'Juros (R$)': juros,
+            'Correção Monetária Paga (R$)': 0,
+            'Encargos (R$)': encargos,
+            'Parcela Total (R$)': parcela_total,
+            'Correção Monetária Gerada (R$)': ajuste_index,
+            'Índice Correção': indice_aplicado,
+            'Taxa de Juros (%)': taxa_juros_mensal * 100
+        }
+
+# ============================================
+# COMPOSIÇÃO DE FASES
+# ============================================
+
+# Colunas dos juros de obra que ficam zeradas nos meses sem obra (as demais vêm da construtora)
+COLUNAS_SO_OBRA = ('Juros (R$)', 'Encargos (R$)')
+
+
+def _indice_mes(datas):
+    """Número sequencial do mês de cada data (ano*12 + mês-1)."""
+    datas = pd.DatetimeIndex(datas)
+    return np.asarray(datas.year * 12 + datas.month - 1, dtype=np.int64)
+
+
+def compor_pre_associativo(df_pre, df_obra, fase='Pré (Construtora + J. Obra)'):
+    """Junta as linhas pré-chaves da construtora e os juros de obra pelo índice do mês.
+
+    Cada linha da construtora recebe os juros de obra do seu mês (linhas no
+    mesmo mês recebem, todas, a parcela de obra); meses só com obra viram
+    linhas próprias. As duas tabelas já estão em ordem cronológica, então as
+    colunas de saída são preenchidas por posição, sem junção nem ordenação.
+    """
+    meses_c = _indice_mes(df_pre['DataObj'])
+    meses_o = _indice_mes(df_obra['DataObj'])
+    base = min(meses_c[0], meses_o[0])
+    largura = max(meses_c[-1], meses_o[-1]) - base + 1
+    linhas_c = np.bincount(meses_c - base, minlength=largura)
+    posicao_o = np.full(largura, -1, dtype=np.int64)
+    posicao_o[meses_o - base] = np.arange(len(meses_o))
+
+    # Linhas de saída por mês: as da construtora ou, se não houver, a da obra
+    mes_saida = np.repeat(np.arange(largura), np.where(linhas_c > 0, linhas_c, posicao_o >= 0))
+    da_construtora = linhas_c[mes_saida] > 0
+    i_c = np.where(da_construtora, np.cumsum(da_construtora) - 1, 0)
+    i_o = posicao_o[mes_saida]
+    tem_obra = i_o >= 0
+    i_o = np.maximum(i_o, 0)
+
+    colunas = {}
+    for coluna in df_pre.columns:
+        if coluna == 'Fase':
+            colunas[coluna] = np.full(len(mes_saida), fase, dtype=object)
+            continue
+        c = df_pre[coluna].to_numpy()[i_c]
+        o = df_obra[coluna].to_numpy()[i_o]
+        if coluna == 'Parcela Total (R$)':
+            colunas[coluna] = np.where(da_construtora, c, 0.0) + np.where(tem_obra, o, 0.0)
+        elif coluna in COLUNAS_SO_OBRA:
+            colunas[coluna] = np.where(tem_obra, o, 0.0)
+        else:
+            colunas[coluna] = np.where(da_construtora & ~pd.isna(c), c, o)
+    return pd.DataFrame(colunas, columns=df_pre.columns)
+
+
+def concatenar_fases(*fases):
+    """Empilha fases consecutivas (cada uma em ordem cronológica) sem reordenar as linhas."""
+    fases = [f for f in fases if not f.empty]
+    return pd.concat(fases, ignore_index=True, sort=False) if fases else pd.DataFrame()
+
+# ============================================
+# SIMULAÇÃO COMBINADA
+# ============================================
+
+def simular_cenario_combinado(params_construtora, params_banco, valores_reais=None, diagnosticos=None):
+    df_full_constructor = simular_financiamento(params_construtora, valores_reais, diagnosticos)
+    if df_full_constructor.empty:
+        return pd.DataFrame()
+        
+    df_pre = df_full_constructor[df_full_constructor['Fase'] != 'Pós'].copy()
+    if df_pre.empty:
+        return pd.DataFrame()
+        
+    valor_financiado_para_banco = df_pre['Saldo Devedor'].iloc[-1]
+    num_parcelas_entrada = params_construtora.get('num_parcelas_entrada', 0)
+    total_meses_pre_chaves = num_parcelas_entrada + params_construtora['meses_pre']
+    
+    try:
+        data_primeira_parcela = datetime.strptime(params_construtora['mes_primeira_parcela'], "%m/%Y")
+        data_inicio_banco = data_primeira_parcela + relativedelta(months=total_meses_pre_chaves)
+    except Exception:
+        data_inicio_banco = datetime.now()
+        
+    params_gerais_banco = {
+        'mes_assinatura': data_inicio_banco.strftime("%m/%Y"),
+        'valor_total_imovel': params_construtora['valor_total_imovel'],
+        'valor_entrada': params_construtora['valor_entrada']
+    }
+    
+    prazo_amort_para_banco = params_construtora['meses_pos']
+    
+    df_banco = simular_financiamento_bancario_completo(
+        params_gerais=params_gerais_banco,
+        params_banco=params_banco,
+        params_construtora=params_construtora,
+        valores_reais=valores_reais,
+        offset_mes=total_meses_pre_chaves,
+        include_obra=False,
+        valor_financiado_override=valor_financiado_para_banco,
+        prazo_amort_override=prazo_amort_para_banco,
+        diagnosticos=diagnosticos
+    )
+    
+    if df_banco.empty:
+        return df_pre
+        
+    return concatenar_fases(df_pre, df_banco)
+
+# ============================================
+# SIMULAÇÃO ASSOCIATIVA
+# ============================================
+
+def simular_cenario_associativo(params_construtora, params_banco, valores_reais=None, diagnosticos=None):
+    df_full_constructor = simular_financiamento(params_construtora, valores_reais, diagnosticos)
+    if df_full_constructor.empty:
+        return pd.DataFrame()
+        
+    df_pre_construtora = df_full_constructor[df_full_constructor['Fase'] != 'Pós'].copy()
+    if df_pre_construtora.empty:
+        return pd.DataFrame()
+        
+    valor_financiado_banco_inicial = df_pre_construtora['Saldo Devedor'].iloc[-1]
+    data_assinatura_construtora = datetime.strptime(params_construtora['mes_assinatura'], "%m/%Y")
+    params_gerais_banco = {'mes_assinatura': data_assinatura_construtora.strftime("%m/%Y")}
+    
+    df_juros_obra = calcular_juros_obra_detalhado(
+        params_gerais=params_gerais_banco,
+        params_banco=params_banco,
+        params_construtora=params_construtora,
+        valor_financiado=valor_financiado_banco_inicial,
+        diagnosticos=diagnosticos
+    )
+    
+    if not df_juros_obra.empty:
+        df_pre_final = compor_pre_associativo(df_pre_construtora, df_juros_obra)
+    else:
+        df_pre_final = df_pre_construtora
+        
+    data_inicio_amortizacao = df_pre_final['DataObj'].iloc[-1] + relativedelta(months=1)
+    params_gerais_banco_pos = {'mes_assinatura': data_inicio_amortizacao.strftime("%m/%Y")}
+    prazo_amort_para_banco = params_construtora['meses_pos']
+    total_meses_pre_chaves = params_construtora.get('num_parcelas_entrada', 0) + params_construtora['meses_pre']
+    
+    df_banco_pos = simular_financiamento_bancario_completo(
+        params_gerais=params_gerais_banco_pos,
+        params_banco=params_banco,
+        params_construtora=params_construtora,
+        valores_reais=valores_reais,
+        offset_mes=total_meses_pre_chaves,
+        include_obra=False,
+        valor_financiado_override=valor_financiado_banco_inicial,
+        prazo_amort_override=prazo_amort_para_banco,
+        diagnosticos=diagnosticos
+    )
+    
+    if df_banco_pos.empty:
+        return df_pre_final
+        
+    return concatenar_fases(df_pre_final, df_banco_pos)
+
+# ============================================
+# CENÁRIOS EM PARALELO
+# ============================================
+
+CENARIOS_COMPLETOS = ('construtora', 'combinado', 'associativo')
+
+# Segundos até reavaliar o pool: um pool descartado volta a ser medido e um mantido é medido de novo
+REAVALIACAO_POOL = 1800
+# Sessões simultâneas na calibração: a disputa pelo GIL entre sessões é o que o pool evita
+SESSOES_CALIBRACAO = 2
+# Espera (s) antes de calibrar, para não disputar CPU com o carregamento da página que a pediu
+ATRASO_CALIBRACAO = 5
+
+_EXECUTOR_CENARIOS = {'executor': None, 'medicao': None, 'calibrado': False, 'calibrando': False, 'proxima_avaliacao': 0.0}
+_LOCK_EXECUTOR = threading.Lock()
+
+
+def _processos_cenarios():
+    import os
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    return min(len(CENARIOS_COMPLETOS), int(os.environ.get('SIMULADOR_PROCESSOS_CENARIOS') or cpus))
+
+
+def _novo_pool(processos):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn'))
+    for _ in range(processos):
+        executor.submit(int)
+    return executor
+
+
+def executor_cenarios(calibracao=None):
+    """Pool de processos compartilhado para os cenários, ou None para rodá-los no próprio processo.
+
+    Os cenários do motor de referência são código Python puro e não ganham nada
+    com threads; cada um roda num processo. O contexto 'spawn' evita copiar as
+    threads do processo chamador (o servidor do Streamlit). Com um único CPU
+    disponível, ou com `SIMULADOR_PROCESSOS_CENARIOS=0`, não há pool.
+
+    Com `calibracao` = (params, params_banco, sim_params, valores_reais), o pool
+    é avaliado numa thread em segundo plano (ATRASO_CALIBRACAO segundos depois),
+    fora do caminho das requisições:
+    só passa a ser usado se `medir_cenarios` (com SESSOES_CALIBRACAO sessões
+    simultâneas) o mostrar mais rápido que o próprio processo. Até lá, e depois
+    de um descarte, a resposta é None. A avaliação se repete a cada
+    REAVALIACAO_POOL segundos; a última medição fica em `_EXECUTOR_CENARIOS['medicao']`.
+    Sem nenhuma calibração pedida no processo, o pool é criado no primeiro uso.
+    """
+    import time
+    processos = _processos_cenarios()
+    if processos < 2:
+        return None
+    with _LOCK_EXECUTOR:
+        estado = _EXECUTOR_CENARIOS
+        if calibracao is not None:
+            estado['calibrado'] = True
+            if not estado['calibrando'] and time.time() >= estado['proxima_avaliacao']:
+                estado['calibrando'] = True
+                avaliacao = threading.Timer(ATRASO_CALIBRACAO, _avaliar_pool, args=(processos, calibracao))
+                avaliacao.name, avaliacao.daemon = 'calibracao-cenarios', True
+                avaliacao.start()
+        elif estado['executor'] is None and not estado['calibrado']:
+            estado['executor'] = _novo_pool(processos)
+        return estado['executor']
+
+
+def _avaliar_pool(processos, calibracao):
+    """Mede o pool (o atual ou um novo) contra o próprio processo e o mantém só se for mais rápido."""
+    import time
+    estado = _EXECUTOR_CENARIOS
+    try:
+        executor = estado['executor'] or _novo_pool(processos)
+        medicao = medir_cenarios(*calibracao, executor=executor, sessoes=SESSOES_CALIBRACAO)
+        manter = medicao['paralelo_ms'] < medicao['sequencial_ms']
+        logger.info("Cenários com %d sessões: próprio processo %.0f ms, %d processos %.0f ms (%s)", SESSOES_CALIBRACAO,
+                    medicao['sequencial_ms'], processos, medicao['paralelo_ms'], 'pool mantido' if manter else 'pool descartado')
+        with _LOCK_EXECUTOR:
+            estado['medicao'] = medicao
+            estado['executor'] = executor if manter else None
+        if not manter:
+            # Tarefas já enviadas por outras sessões terminam normalmente
+            executor.shutdown(wait=False)
+    except Exception:
+        logger.exception("Falha ao avaliar o pool de cenários")
+    finally:
+        with _LOCK_EXECUTOR:
+            estado['calibrando'] = False
+            estado['proxima_avaliacao'] = time.time() + REAVALIACAO_POOL
+
+
+def medir_cenarios(params, params_banco, sim_params, valores_reais=None, executor=None, repeticoes=3, sessoes=1):
+    """Tempo de parede (ms, mediana de `repeticoes`) dos três cenários no próprio processo e no pool `executor`.
+
+    Cada medição roda `sessoes` simulações simultâneas (uma thread por sessão),
+    como várias sessões do Streamlit no mesmo servidor.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    executor = executor or executor_cenarios()
+    if executor is None:
+        raise ValueError("não há pool de processos para medir")
+    argumentos = (params, params_banco, sim_params, valores_reais, [])
+    # A primeira rodada importa o motor nos processos do pool e não entra na medição
+    simular_cenarios_completos(*argumentos, executor)
+    tempos = {'sequencial_ms': [], 'paralelo_ms': []}
+    with ThreadPoolExecutor(max_workers=sessoes) as threads:
+        for _ in range(repeticoes):
+            for chave, destino in (('sequencial_ms', False), ('paralelo_ms', executor)):
+                inicio = time.perf_counter()
+                list(threads.map(lambda _: simular_cenarios_completos(*argumentos, destino), range(sessoes)))
+                tempos[chave].append((time.perf_counter() - inicio) * 1000)
+    return {chave: float(np.median(valores)) for chave, valores in tempos.items()}
+
+
+def executar_cenario_completo(cenario, params, params_banco, sim_params, valores_reais=None):
+    """Simula um cenário e calcula seu CET; devolve (df, cet, diagnosticos)."""
+    diagnosticos = []
+    if cenario == 'construtora':
+        df = simular_financiamento(sim_params, valores_reais, diagnosticos)
+    elif cenario == 'combinado':
+        df = simular_cenario_combinado(dict(params), params_banco, valores_reais, diagnosticos)
+    else:
+        df = simular_cenario_associativo(dict(params), params_banco, valores_reais, diagnosticos)
+    return df, calcular_cet_cenario(df, sim_params['valor_total_imovel']), diagnosticos
+
+
+def simular_cenarios_completos(params, params_banco, sim_params, valores_reais=None, diagnosticos=None, executor=None):
+    """Simula os cenários da comparação (construtora, combinado e associativo) ao mesmo tempo.
+
+    A construtora usa `sim_params` (que pode trazer `limite_correcao`); os
+    cenários com banco usam `params`. Devolve {cenario: (df, cet)} sempre na
+    ordem de CENARIOS_COMPLETOS, com os diagnósticos anexados nessa mesma
+    ordem. A falha de um cenário vira o diagnóstico 'falha_cenario' e um
+    DataFrame vazio, sem afetar os demais. Como antes, sem resultado da
+    construtora os demais cenários são descartados. `executor=False` força a
+    execução no próprio processo.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    if executor is None:
+        executor = executor_cenarios()
+    argumentos = (params, params_banco, sim_params, valores_reais)
+    tarefas = {}
+    if executor:
+        try:
+            tarefas = {c: executor.submit(executar_cenario_completo, c, *argumentos) for c in CENARIOS_COMPLETOS}
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning("Pool de cenários indisponível, simulando no próprio processo: %s", e)
+            if executor is _EXECUTOR_CENARIOS['executor']:
+                _EXECUTOR_CENARIOS['executor'] = None
+
+    resultados = {}
+    for cenario in CENARIOS_COMPLETOS:
+        try:
+            if cenario in tarefas:
+                df, cet, diagnosticos_cenario = tarefas[cenario].result()
+            else:
+                df, cet, diagnosticos_cenario = executar_cenario_completo(cenario, *argumentos)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and executor is _EXECUTOR_CENARIOS['executor']:
+                _EXECUTOR_CENARIOS['executor'] = None
+            df, cet = pd.DataFrame(), 0.0
+            diagnosticos_cenario = []
+            registrar_diagnostico(diagnosticos_cenario, 'erro', 'falha_cenario',
+                                   f"Falha ao simular o cenário {cenario}: {e}", cenario=cenario)
+        resultados[cenario] = (df, cet, diagnosticos_cenario)
+
+    if resultados['construtora'][0].empty:
+        for cenario in CENARIOS_COMPLETOS[1:]:
+            resultados[cenario] = (pd.DataFrame(), 0.0, [])
+    for cenario in CENARIOS_COMPLETOS:
+        if diagnosticos is not None:
+            diagnosticos.extend(resultados[cenario][2])
+        elif resultados[cenario][2]:
+            for d in resultados[cenario][2]:
+                registrar_diagnostico(None, d.nivel, d.codigo, d.mensagem)
+    return {cenario: (df, cet) for cenario, (df, cet, _) in resultados.items()}
@@ -0,0 +1,208 @@
+"""Modo centavo exato para o motor vetorizado.
+
+Os valores monetários são inteiros int64 em centavos e cada passo é
+arredondado como nos extratos bancários (meio centavo para cima, afastando do
+zero): correção monetária do mês, correção repassada a cada parcela, juros
+pós-chaves, juros e ajuste do indexador, seguro MIP, parcela PRICE e
+amortização SAC. A última parcela do banco quita exatamente o saldo.
+
+A correção gerada fica num "bolsão" inteiro repartido entre as parcelas que
+ainda vencem, proporcionalmente ao valor original, de modo que nenhum centavo
+é criado ou perdido no rateio. Ativado com `simular_cenarios_lote(..., centavos=True)`.
+
+Uso:
+    python motor_centavos.py --contratos 1000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from motor import registrar_diagnostico
+from motor_vetorizado import CENARIOS, FASE_ENTRADA, FASE_PRE, FASE_POS, SISTEMA_PRICE, simular_cenarios_lote
+
+
+def arredondar_centavos(valores):
+    """Arredonda (em centavos) meio para cima, afastando do zero; devolve int64."""
+    valores = np.asarray(valores, dtype=float)
+    # Folga para valores como 22270.54 * 100 = 2227053.9999999995
+    return (np.sign(valores) * np.floor(np.abs(valores) + 0.5 + 1e-7)).astype(np.int64)
+
+
+def para_centavos(valores_reais):
+    return arredondar_centavos(np.asarray(valores_reais, dtype=float) * 100)
+
+
+def entrada_em_centavos(entrada):
+    """Cópia de `preparar_construtora` com cronograma, pagamento no ato e saldos em centavos."""
+    entrada = dict(entrada)
+    for chave in ('cronograma', 'valor_total', 'pagamento_assinatura'):
+        entrada[chave] = para_centavos(entrada[chave])
+    entrada['saldo_inicial'] = entrada['valor_total'] - entrada['pagamento_assinatura']
+    return entrada
+
+
+def banco_em_centavos(banco, valor_financiado):
+    """Cópia de `preparar_banco` com valor financiado, DFI e taxa de administração em centavos."""
+    banco = dict(banco)
+    banco['valor_financiado'] = np.asarray(valor_financiado, dtype=np.int64)
+    banco['seguro_dfi'] = para_centavos(banco['seguro_dfi'])
+    banco['taxa_admin'] = para_centavos(banco['taxa_admin'])
+    return banco
+
+# ============================================
+# CONSTRUTORA EM CENTAVOS
+# ============================================
+
+def simular_construtora_centavos(entrada, incc_real=None, ipca_real=None):
+    """Laço mensal da construtora em centavos; mesmas chaves de `simular_construtora_lote`, em int64."""
+    n, meses = entrada['n'], entrada['meses']
+    fase = entrada['fase']
+    incc = np.full((n, meses), np.nan) if incc_real is None else np.broadcast_to(incc_real[..., :meses], (n, meses))
+    ipca = np.full((n, meses), np.nan) if ipca_real is None else np.broadcast_to(ipca_real[..., :meses], (n, meses))
+    taxa_pre = np.where(np.isnan(incc), entrada['incc_medio'][:, None], incc)
+    taxa_pos = np.where(np.isnan(ipca), entrada['ipca_medio'][:, None], ipca)
+    taxa = np.where((fase == FASE_ENTRADA) | (fase == FASE_PRE), taxa_pre, np.where(fase == FASE_POS, taxa_pos, 0.0))
+    taxa = np.where(entrada['corrige'], taxa, 0.0)
+
+    cronograma = entrada['cronograma']
+    # Valor original das parcelas que vencem a partir de cada mês (inclusive) e depois dele
+    restante_inclusive = np.cumsum(cronograma[:, ::-1], axis=1)[:, ::-1]
+    restante_depois = np.concatenate([restante_inclusive[:, 1:], np.zeros((n, 1), dtype=np.int64)], axis=1)
+
+    saldo = entrada['saldo_inicial'].copy()
+    bolsao = np.zeros(n, dtype=np.int64)
+    correcao_paga = np.zeros((n, meses), dtype=np.int64)
+    correcao_gerada = np.zeros((n, meses), dtype=np.int64)
+    saldos = np.zeros((n, meses), dtype=np.int64)
+    for m in range(meses):
+        parcela = cronograma[:, m]
+        base = restante_inclusive[:, m]
+        fracao = np.divide(parcela, base, out=np.zeros(n), where=base > 0)
+        paga = arredondar_centavos(bolsao * fracao)
+        bolsao -= paga
+        saldo = saldo - (parcela + paga)
+        correcao = arredondar_centavos(saldo * taxa[:, m])
+        saldo = saldo + correcao
+        bolsao += np.where(restante_depois[:, m] > 0, correcao, 0)
+        saldo = np.maximum(saldo, 0)
+        correcao_paga[:, m] = paga
+        correcao_gerada[:, m] = correcao
+        saldos[:, m] = saldo
+
+    pagamento = cronograma + correcao_paga
+    taxa_juros = entrada['contador_pos'] / 100.0
+    juros = arredondar_centavos(pagamento * taxa_juros)
+    n_pre = entrada['n_pre_total']
+    linha_fim_pre = np.clip(n_pre - 1, 0, max(meses - 1, 0))
+    saldo_fim_pre = np.where(n_pre > 0, saldos[np.arange(n), linha_fim_pre] if meses else 0, entrada['saldo_inicial'])
+
+    return {
+        'amortizacao': cronograma, 'correcao_paga': correcao_paga, 'juros': juros,
+        'parcela': pagamento + juros, 'correcao_gerada': correcao_gerada,
+        'saldo': saldos, 'taxa_correcao': taxa, 'taxa_juros': taxa_juros,
+        'saldo_fim_pre': saldo_fim_pre.astype(np.int64),
+    }
+
+# ============================================
+# BANCO EM CENTAVOS
+# ============================================
+
+def juros_obra_em_centavos(obra):
+    """Arredonda os juros de obra e encargos mensais (já calculados sobre valores em centavos)."""
+    obra = dict(obra)
+    obra['juros'] = arredondar_centavos(obra['juros'])
+    obra['encargos'] = arredondar_centavos(obra['encargos'])
+    obra['parcela'] = obra['juros'] + obra['encargos']
+    return obra
+
+
+def simular_banco_centavos(banco, prazo, taxas_indexador=None, diagnosticos=None):
+    """Amortização PRICE/SAC em centavos; mesmas chaves de `simular_banco_lote`, em int64."""
+    valor = banco['valor_financiado']
+    n = len(valor)
+    prazo = np.asarray(prazo, dtype=np.int64)
+    invalido = (banco['sistema'] < 0) & (prazo > 0)
+    for i in np.flatnonzero(invalido):
+        sistema = banco['params_banco'][i].get('sistema_amortizacao', 'PRICE')
+        registrar_diagnostico(diagnosticos, 'erro', 'sistema_amortizacao_desconhecido', f'Sistema de amortização desconhecido: {sistema}. Use SAC ou PRICE.',
+                               unidade=int(i), sistema=sistema)
+    prazo = np.where(invalido, 0, prazo)
+    largura = int(prazo.max()) if n else 0
+    if taxas_indexador is None:
+        taxas_indexador = np.zeros((n, largura))
+
+    r = banco['taxa_juros']
+    prazo_seguro = np.maximum(prazo, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        parcela_price = arredondar_centavos(np.where(r > 0, (r * valor) / (1 - (1 + r) ** (-prazo_seguro.astype(float))), valor / prazo_seguro))
+    amortizacao_sac = arredondar_centavos(valor / prazo_seguro)
+    price = banco['sistema'] == SISTEMA_PRICE
+    fixos = banco['seguro_dfi'] + banco['taxa_admin']
+
+    saldo = valor.copy()
+    colunas = {nome: np.zeros((n, largura), dtype=np.int64) for nome in ('juros', 'amortizacao', 'encargos', 'ajuste_index', 'saldo')}
+    for m in range(largura):
+        ativo = m < prazo
+        juros = arredondar_centavos(saldo * r)
+        ajuste = arredondar_centavos(saldo * taxas_indexador[:, m])
+        encargos = arredondar_centavos(banco['taxa_mip'] * saldo) + fixos
+        amortizacao = np.minimum(np.where(price, parcela_price - juros, amortizacao_sac), saldo)
+        # A última parcela quita o saldo remanescente
+        amortizacao = np.where(m == prazo - 1, saldo, amortizacao)
+        saldo_novo = saldo - amortizacao
+        colunas['juros'][:, m] = np.where(ativo, juros, 0)
+        colunas['amortizacao'][:, m] = np.where(ativo, amortizacao, 0)
+        colunas['encargos'][:, m] = np.where(ativo, encargos, 0)
+        colunas['ajuste_index'][:, m] = np.where(ativo, ajuste, 0)
+        colunas['saldo'][:, m] = np.where(ativo, saldo_novo, 0)
+        saldo = np.where(ativo, saldo_novo, saldo)
+
+    colunas['parcela'] = colunas['amortizacao'] + colunas['juros'] + colunas['encargos'] + colunas['ajuste_index']
+    colunas['prazo'] = prazo
+    return colunas
+
+
+def resultado_em_reais(resultado):
+    """Converte os indicadores de um cenário calculado em centavos; mantém 'pagamentos_centavos' exatos."""
+    centavos = np.rint(resultado['pagamentos']).astype(np.int64)
+    resultado = dict(resultado)
+    resultado['pagamentos_centavos'] = centavos
+    resultado['pagamentos'] = centavos / 100
+    resultado['custo_total'] = centavos.sum(axis=1) / 100
+    resultado['maior_parcela'] = resultado['maior_parcela'] / 100
+    return resultado
+
+# ============================================
+# LINHA DE COMANDO
+# ============================================
+
+def main():
+    from conferencia import gerar_contrato
+
+    parser = argparse.ArgumentParser(description="Tempo e diferença do modo centavo exato em relação ao motor em ponto flutuante")
+    parser.add_argument('--contratos', type=int, default=1000)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.semente)
+    lista_params, lista_pb, lista_vr = (list(c) for c in zip(*[gerar_contrato(rng) for _ in range(args.contratos)]))
+
+    tempos, resultados = {}, {}
+    for centavos in (False, True):
+        medicoes = []
+        for _ in range(max(1, args.repeticoes)):
+            inicio = time.perf_counter()
+            resultados[centavos] = simular_cenarios_lote(lista_params, lista_pb, lista_vr, diagnosticos=[], sombra=0, centavos=centavos)
+            medicoes.append(time.perf_counter() - inicio)
+        tempos[centavos] = min(medicoes)
+
+    print(f"{args.contratos} contratos: ponto flutuante {tempos[False]*1000:.0f} ms, centavos {tempos[True]*1000:.0f} ms ({tempos[True]/tempos[False]:.2f}x)")
+    for cenario in CENARIOS:
+        diferenca = np.abs(resultados[True][cenario]['custo_total'] - resultados[False][cenario]['custo_total'])
+        print(f"  {cenario}: diferença no custo total  média R$ {diferenca.mean():.2f}  máxima R$ {diferenca.max():.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,675 @@
+"""Motor de simulação vetorizado para lotes de contratos.
+
+Reproduz a lógica de `motor.py` (construtora, juros de obra, amortização
+bancária e os cenários Sequencial e Associativo), mas avalia muitos contratos
+de uma vez: cada grandeza é uma matriz (contratos x meses) e o laço mensal
+opera sobre todos os contratos simultaneamente. É a base dos modos em lote
+(carteira de unidades, backtest, comparação de ofertas).
+
+As linhas geradas seguem a mesma ordem das tabelas do motor de referência,
+de modo que totais, maior parcela e CET coincidem com os de `motor.py`.
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from motor import calcular_cet, format_currency, registrar_diagnostico
+
+FASE_ENTRADA, FASE_PRE, FASE_POS = 1, 2, 3
+NOMES_FASES = {FASE_ENTRADA: 'Entrada', FASE_PRE: 'Pré', FASE_POS: 'Pós'}
+
+SISTEMA_PRICE, SISTEMA_SAC = 0, 1
+
+CENARIOS = ('construtora', 'sequencial', 'associativo')
+
+# Conferência em sombra: quantos contratos de cada lote também rodam no motor de
+# referência (ver conferencia.py). 0 desliga; ajustável por SIMULADOR_SOMBRA. Com
+# SIMULADOR_SOMBRA_SEMENTE, a sequência de contratos sorteados é reproduzível.
+SOMBRA = {
+    'amostra': int(os.environ.get('SIMULADOR_SOMBRA', '0') or 0),
+    'rng': np.random.default_rng(int(os.environ['SIMULADOR_SOMBRA_SEMENTE']) if os.environ.get('SIMULADOR_SOMBRA_SEMENTE') else None),
+}
+
+
+def configurar_sombra(amostra, semente=None):
+    """Liga (amostra > 0) ou desliga a conferência em sombra; `semente` fixa o sorteio dos contratos."""
+    SOMBRA['amostra'] = max(0, int(amostra))
+    SOMBRA['rng'] = np.random.default_rng(semente)
+
+# ============================================
+# UTILITÁRIAS
+# ============================================
+
+def mes_absoluto(data):
+    """Número sequencial do mês (ano*12 + mês-1), usado para alinhar contratos no calendário."""
+    return data.year * 12 + data.month - 1
+
+
+def data_do_mes_absoluto(mes):
+    return datetime(int(mes) // 12, int(mes) % 12 + 1, 1)
+
+
+def como_lista(valor, n):
+    """Aceita um único dicionário (compartilhado) ou uma lista com um por contrato."""
+    if isinstance(valor, dict) or valor is None:
+        return [valor] * n
+    if len(valor) != n:
+        raise ValueError(f"esperados {n} itens, recebidos {len(valor)}")
+    return list(valor)
+
+
+def serie_valores_reais(valores_reais, chave, tamanho):
+    """Converte valores_reais[mes][chave] em vetor (posição 0 = mês 1), com NaN onde não há dado."""
+    serie = np.full(tamanho, np.nan)
+    if valores_reais:
+        for mes, valores in valores_reais.items():
+            if 1 <= mes <= tamanho:
+                valor = valores.get(chave)
+                if valor is not None and pd.notna(valor):
+                    serie[mes - 1] = valor
+    return serie
+
+
+def _series_por_contrato(valores_reais, chave, n, tamanho):
+    """Matriz (n, tamanho) de índices reais, compartilhando a conversão quando o dicionário é o mesmo."""
+    lista = como_lista(valores_reais, n)
+    cache = {}
+    matriz = np.empty((n, tamanho))
+    for i, vr in enumerate(lista):
+        chave_cache = id(vr)
+        if chave_cache not in cache:
+            cache[chave_cache] = serie_valores_reais(vr, chave, tamanho)
+        matriz[i] = cache[chave_cache]
+    return matriz
+
+
+def _ajustar_largura(matriz, n, largura):
+    """Corta ou completa com NaN uma matriz de índices para (n, largura)."""
+    resultado = np.full((n, largura), np.nan)
+    if matriz is not None:
+        matriz = np.broadcast_to(np.atleast_2d(matriz), (n, np.shape(matriz)[-1]))
+        k = min(largura, matriz.shape[1])
+        resultado[:, :k] = matriz[:, :k]
+    return resultado
+
+
+def compor_fases(fases, n):
+    """Concatena, por contrato, fases de comprimento variável em matrizes alinhadas à esquerda.
+
+    `fases` é uma lista de trios (pagamentos (n, k), deslocamentos (n, k),
+    comprimentos (n,)). As posições de destino de cada fase são calculadas uma
+    única vez e servem às duas matrizes. Retorna (pagamentos (n, Lmax),
+    deslocamentos int64 (n, Lmax), comprimentos totais (n,)); posições além do fim ficam zeradas.
+    """
+    totais = np.zeros(n, dtype=np.int64)
+    for _, _, comprimentos in fases:
+        totais += comprimentos
+    largura = int(totais.max()) if n else 0
+    pagamentos = np.zeros((n, largura))
+    deslocamentos = np.zeros((n, largura), dtype=np.int64)
+    inicio = np.zeros(n, dtype=np.int64)
+    for i, (valores, deslocamento, comprimentos) in enumerate(fases):
+        k = valores.shape[1]
+        if k == 0:
+            continue
+        mascara = np.arange(k)[None, :] < comprimentos[:, None]
+        if i == 0:
+            # Primeira fase: já começa na coluna 0 de todos os contratos
+            pagamentos[:, :k] = np.where(mascara, valores, 0.0)
+            deslocamentos[:, :k] = np.where(mascara, deslocamento, 0)
+        else:
+            linhas, colunas = np.nonzero(mascara)
+            destino = inicio[linhas] + colunas
+            pagamentos[linhas, destino] = valores[linhas, colunas]
+            deslocamentos[linhas, destino] = deslocamento[linhas, colunas]
+        inicio += comprimentos
+    return pagamentos, deslocamentos, totais
+
+
+def calcular_cet_lote(valor_financiado, fluxos, iteracoes=60, tolerancia=1e-12):
+    """CET anual (%) de vários fluxos de uma vez, por Newton vetorizado sobre a TIR mensal.
+
+    Equivale a aplicar `calcular_cet` linha a linha; contratos que não convergem
+    caem no cálculo de referência. Zeros à direita em `fluxos` não alteram o resultado.
+    """
+    valor_financiado = np.asarray(valor_financiado, dtype=float)
+    fluxos = np.asarray(fluxos, dtype=float)
+    n = len(valor_financiado)
+    cet = np.zeros(n)
+    calculavel = (valor_financiado > 0) & (fluxos > 0).any(axis=1)
+    if not calculavel.any():
+        return cet
+
+    v = valor_financiado[calculavel]
+    f = fluxos[calculavel]
+    t = np.arange(1, f.shape[1] + 1, dtype=float)
+    taxa = np.full(len(v), 0.01)
+    convergiu = np.zeros(len(v), dtype=bool)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for _ in range(iteracoes):
+            desconto = (1 + taxa)[:, None] ** -t[None, :]
+            vpl = v - (f * desconto).sum(axis=1)
+            derivada = (f * t[None, :] * desconto).sum(axis=1) / (1 + taxa)
+            passo = vpl / derivada
+            taxa_nova = taxa - passo
+            convergiu = np.abs(passo) < tolerancia
+            taxa = np.where(np.isfinite(taxa_nova) & (taxa_nova > -1), taxa_nova, taxa / 2)
+            if convergiu.all():
+                break
+        anual = ((1 + taxa) ** 12 - 1) * 100
+
+    resultado = np.where(convergiu & np.isfinite(anual), anual, np.nan)
+    for j in np.flatnonzero(np.isnan(resultado)):
+        resultado[j] = calcular_cet(v[j], np.trim_zeros(f[j], 'b').tolist())
+    cet[calculavel] = resultado
+    return cet
+
+# ============================================
+# CONSTRUTORA EM LOTE
+# ============================================
+
+def preparar_construtora(lista_params, diagnosticos=None):
+    """Converte uma lista de `params` da construtora em matrizes (contratos x meses de pagamento)."""
+    n = len(lista_params)
+    valido = np.ones(n, dtype=bool)
+    mes_assinatura = np.zeros(n, dtype=np.int64)
+    carencia = np.zeros(n, dtype=np.int64)
+    n_entrada = np.zeros(n, dtype=np.int64)
+    n_pre_total = np.zeros(n, dtype=np.int64)
+    n_total = np.zeros(n, dtype=np.int64)
+
+    for i, params in enumerate(lista_params):
+        try:
+            data_assinatura = datetime.strptime(params['mes_assinatura'], "%m/%Y")
+            data_primeira_parcela = datetime.strptime(params['mes_primeira_parcela'], "%m/%Y")
+        except Exception:
+            registrar_diagnostico(diagnosticos, 'erro', 'datas_invalidas', "Datas inválidas! Use o formato MM/AAAA.",
+                                   unidade=i, mes_assinatura=params.get('mes_assinatura'), mes_primeira_parcela=params.get('mes_primeira_parcela'))
+            valido[i] = False
+            continue
+        if data_primeira_parcela < data_assinatura:
+            registrar_diagnostico(diagnosticos, 'erro', 'primeira_parcela_antes_assinatura', "O mês da primeira parcela não pode ser anterior ao mês de assinatura!",
+                                   unidade=i, mes_assinatura=params['mes_assinatura'], mes_primeira_parcela=params['mes_primeira_parcela'])
+            valido[i] = False
+            continue
+        mes_assinatura[i] = mes_absoluto(data_assinatura)
+        carencia[i] = mes_absoluto(data_primeira_parcela) - mes_assinatura[i]
+        n_entrada[i] = params.get('num_parcelas_entrada', 0)
+        n_pre_total[i] = n_entrada[i] + params['meses_pre']
+        n_total[i] = n_pre_total[i] + params['meses_pos']
+
+    meses = int(n_total.max()) if n else 0
+    cronograma = np.zeros((n, meses))
+    valor_total = np.zeros(n)
+    pagamento_assinatura = np.zeros(n)
+    incc_medio = np.zeros(n)
+    ipca_medio = np.zeros(n)
+    inicio_correcao = np.ones(n, dtype=np.int64)
+    limite_correcao = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+
+    for i in np.flatnonzero(valido):
+        params = lista_params[i]
+        valor_total[i] = params['valor_total_imovel']
+        if params['tipo_pagamento_entrada'] == 'Paga no ato':
+            pagamento_assinatura[i] = params['valor_entrada']
+        incc_medio[i] = params.get('incc_medio', 0)
+        ipca_medio[i] = params.get('ipca_medio', 0)
+        inicio_correcao[i] = params.get('inicio_correcao', 1) or 1
+        if params.get('limite_correcao') is not None:
+            limite_correcao[i] = params['limite_correcao']
+
+        n_ent = params['num_parcelas_entrada'] if params['tipo_pagamento_entrada'] == 'Parcelada' else 0
+        meses_pre, meses_pos = params['meses_pre'], params['meses_pos']
+        linha = cronograma[i]
+        linha[:n_ent] = params['entrada_mensal']
+        linha[n_ent:n_ent + meses_pre] = params['parcelas_mensais_pre']
+        for extras in (params['parcelas_semestrais'], params['parcelas_anuais']):
+            for mes_local, valor in extras.items():
+                if 1 <= mes_local <= meses_pre:
+                    linha[n_ent + mes_local - 1] += valor
+        # Como em `construir_parcelas_futuras`, meses pré-chaves sem valor positivo não têm parcela
+        pre = linha[n_ent:n_ent + meses_pre]
+        pre[pre <= 0] = 0.0
+        linha[n_ent + meses_pre:n_ent + meses_pre + meses_pos] = params['valor_amortizacao_pos']
+
+    mes = np.arange(1, meses + 1)[None, :]
+    fase = np.where(mes <= n_entrada[:, None], FASE_ENTRADA,
+           np.where(mes <= n_pre_total[:, None], FASE_PRE,
+           np.where(mes <= n_total[:, None], FASE_POS, 0))).astype(np.int8)
+    corrige = (mes >= inicio_correcao[:, None]) & (mes <= limite_correcao[:, None])
+    contador_pos = np.where(fase == FASE_POS, mes - n_pre_total[:, None], 0)
+
+    for i in np.flatnonzero(valido):
+        params = lista_params[i]
+        if params['meses_pre'] > 0:
+            amortizado = pagamento_assinatura[i] + cronograma[i, :n_pre_total[i]].sum()
+            percentual = amortizado / valor_total[i]
+            if percentual < params['percentual_minimo_quitacao']:
+                registrar_diagnostico(diagnosticos, 'aviso', 'quitacao_pre_abaixo_minimo',
+                                       f"Atenção: valor quitado na pré ({format_currency(amortizado)}) equivale a {percentual*100:.2f}% do valor do imóvel, abaixo de {params['percentual_minimo_quitacao']*100:.0f}%.",
+                                       unidade=int(i), valor_quitado=amortizado, percentual=percentual, percentual_minimo=params['percentual_minimo_quitacao'])
+
+    return {
+        'n': n, 'meses': meses, 'valido': valido, 'params': lista_params,
+        'mes_assinatura': mes_assinatura, 'carencia': carencia,
+        'n_entrada': n_entrada, 'n_pre_total': n_pre_total, 'n_total': n_total,
+        'valor_total': valor_total, 'pagamento_assinatura': pagamento_assinatura,
+        'saldo_inicial': valor_total - pagamento_assinatura,
+        'cronograma': cronograma, 'fase': fase, 'corrige': corrige, 'contador_pos': contador_pos,
+        'incc_medio': incc_medio, 'ipca_medio': ipca_medio,
+    }
+
+
+def simular_construtora_lote(entrada, incc_real=None, ipca_real=None):
+    """Executa o laço mensal da construtora para todos os contratos preparados.
+
+    `incc_real`/`ipca_real` são matrizes (contratos x meses) ou vetores (meses)
+    com NaN onde não há índice real; nesses meses vale a média de cada contrato.
+    """
+    n, meses = entrada['n'], entrada['meses']
+    fase = entrada['fase']
+    incc = np.full((n, meses), np.nan) if incc_real is None else np.broadcast_to(incc_real[..., :meses], (n, meses))
+    ipca = np.full((n, meses), np.nan) if ipca_real is None else np.broadcast_to(ipca_real[..., :meses], (n, meses))
+    taxa_pre = np.where(np.isnan(incc), entrada['incc_medio'][:, None], incc)
+    taxa_pos = np.where(np.isnan(ipca), entrada['ipca_medio'][:, None], ipca)
+    taxa = np.where((fase == FASE_ENTRADA) | (fase == FASE_PRE), taxa_pre, np.where(fase == FASE_POS, taxa_pos, 0.0))
+    taxa = np.where(entrada['corrige'], taxa, 0.0)
+
+    cronograma = entrada['cronograma']
+    # Soma do valor original das parcelas que ainda vencem depois de cada mês
+    restante = np.cumsum(cronograma[:, ::-1], axis=1)[:, ::-1]
+    restante = np.concatenate([restante[:, 1:], np.zeros((n, 1))], axis=1)
+
+    saldo = entrada['saldo_inicial'].copy()
+    fator = np.zeros(n)
+    correcao_paga = np.empty((n, meses))
+    correcao_gerada = np.empty((n, meses))
+    saldos = np.empty((n, meses))
+    for m in range(meses):
+        correcao_paga[:, m] = cronograma[:, m] * fator
+        saldo = saldo - (cronograma[:, m] + correcao_paga[:, m])
+        correcao = saldo * taxa[:, m]
+        saldo = saldo + correcao
+        fator = fator + np.divide(correcao, restante[:, m], out=np.zeros(n), where=restante[:, m] > 0)
+        saldos[:, m] = np.maximum(saldo, 0)
+        saldo = saldos[:, m]
+        correcao_gerada[:, m] = correcao
+
+    pagamento = cronograma + correcao_paga
+    taxa_juros = entrada['contador_pos'] / 100.0
+    juros = pagamento * taxa_juros
+    n_pre = entrada['n_pre_total']
+    linha_fim_pre = np.clip(n_pre - 1, 0, max(meses - 1, 0))
+    saldo_fim_pre = np.where(n_pre > 0, saldos[np.arange(n), linha_fim_pre] if meses else 0.0, entrada['saldo_inicial'])
+
+    return {
+        'amortizacao': cronograma, 'correcao_paga': correcao_paga, 'juros': juros,
+        'parcela': pagamento + juros, 'correcao_gerada': correcao_gerada,
+        'saldo': saldos, 'taxa_correcao': taxa, 'taxa_juros': taxa_juros,
+        'saldo_fim_pre': saldo_fim_pre,
+    }
+
+# ============================================
+# JUROS DE OBRA EM LOTE
+# ============================================
+
+def interpretar_marcos(texto):
+    """Lê marcos 'mes:percentual, ...'; levanta ValueError se o formato for inválido."""
+    marcos = {}
+    for item in texto.replace(" ", "").split(','):
+        mes, perc = item.split(':')
+        marcos[int(mes)] = float(perc)
+    return marcos
+
+
+def percentual_obra_vetor(meses, prazo_total, metodo, marcos=None):
+    """Versão vetorial de `_obter_percentual_obra` para um vetor de meses da obra."""
+    meses = np.asarray(meses, dtype=float)
+    if metodo == 'Linear':
+        percentual = meses / prazo_total
+    elif metodo == 'Progressiva (S-Curve)':
+        t = meses / prazo_total
+        percentual = 3 * t**2 - 2 * t**3
+    elif metodo == 'Manual' and marcos:
+        xs = sorted(marcos)
+        ys = [marcos[x] for x in xs]
+        if xs[0] > 0:
+            xs, ys = [0] + xs, [0.0] + ys
+        if prazo_total > xs[-1]:
+            xs, ys = xs + [prazo_total], ys + [100.0]
+        percentual = np.interp(meses, xs, ys, left=ys[0], right=ys[-1]) / 100.0
+    else:
+        percentual = np.zeros_like(meses)
+    percentual = np.clip(percentual, 0.0, 1.0)
+    percentual = np.where(meses <= 0, 0.0, percentual)
+    return np.where(meses >= prazo_total, 1.0, percentual)
+
+
+def preparar_banco(lista_params_banco, valor_financiado, diagnosticos=None):
+    """Extrai vetores de taxas, encargos e sistema de amortização de cada contrato."""
+    n = len(valor_financiado)
+    lista = como_lista(lista_params_banco, n)
+    taxa_juros = np.array([(pb['taxa_juros_anual'] / 100) / 12 for pb in lista], dtype=float)
+    taxa_admin = np.array([pb.get('taxa_admin_mensal', 0) for pb in lista], dtype=float)
+    seguro_total = np.array([pb.get('seguro_total_primeira_parcela', 0) for pb in lista], dtype=float)
+    percentual_dfi = np.array([pb.get('percentual_dfi_estimado', 30.0) / 100 for pb in lista], dtype=float)
+    seguro_dfi = seguro_total * percentual_dfi
+    seguro_mip_inicial = seguro_total - seguro_dfi
+    taxa_mip = np.divide(seguro_mip_inicial, valor_financiado, out=np.zeros(n), where=valor_financiado > 0)
+
+    sistema = np.full(n, -1, dtype=np.int8)
+    for i, pb in enumerate(lista):
+        nome = pb.get('sistema_amortizacao', 'PRICE')
+        if nome == 'PRICE':
+            sistema[i] = SISTEMA_PRICE
+        elif nome == 'SAC':
+            sistema[i] = SISTEMA_SAC
+
+    return {
+        'params_banco': lista, 'valor_financiado': np.asarray(valor_financiado, dtype=float),
+        'taxa_juros': taxa_juros, 'taxa_admin': taxa_admin, 'seguro_dfi': seguro_dfi,
+        'taxa_mip': taxa_mip, 'sistema': sistema,
+    }
+
+
+def simular_juros_obra_lote(entrada_construtora, banco, diagnosticos=None):
+    """Juros de obra do cenário Associativo para todos os contratos (assinatura = assinatura da construtora)."""
+    n = entrada_construtora['n']
+    lista_params = entrada_construtora['params']
+    meses_restantes = np.zeros(n, dtype=np.int64)
+    percentuais = []
+
+    for i in np.flatnonzero(entrada_construtora['valido']):
+        params, pb = lista_params[i], banco['params_banco'][i]
+        inicio_obra = mes_absoluto(params['data_inicio_obra'])
+        meses_ate_contrato = int(entrada_construtora['mes_assinatura'][i] - inicio_obra)
+        prazo_total = meses_ate_contrato + params.get('num_parcelas_entrada', 0) + params['meses_pre']
+        metodo = pb['metodo_calculo_juros']
+        if prazo_total <= 0:
+            continue
+        marcos = {}
+        if metodo == 'Manual':
+            try:
+                marcos = interpretar_marcos(pb['marcos_liberacao'])
+            except Exception:
+                registrar_diagnostico(diagnosticos, 'erro', 'marcos_liberacao_invalidos',
+                                       "Formato dos marcos de liberação inválido. Use: 'mes:percentual, mes:percentual'. Ex: '6:20, 12:50'",
+                                       unidade=int(i), marcos_liberacao=pb['marcos_liberacao'])
+                continue
+        restantes = prazo_total - meses_ate_contrato
+        if restantes <= 0:
+            continue
+        mes_obra = meses_ate_contrato + np.arange(1, restantes + 1)
+        perc_inicio = percentual_obra_vetor([meses_ate_contrato], prazo_total, metodo, marcos)[0]
+        percentuais.append((i, np.maximum(perc_inicio, percentual_obra_vetor(mes_obra, prazo_total, metodo, marcos))))
+        meses_restantes[i] = restantes
+
+    largura = int(meses_restantes.max()) if n else 0
+    percentual = np.zeros((n, largura))
+    for i, curva in percentuais:
+        percentual[i, :len(curva)] = curva
+    ativo = np.arange(largura)[None, :] < meses_restantes[:, None]
+
+    saldo_liberado = banco['valor_financiado'][:, None] * percentual
+    juros = saldo_liberado * banco['taxa_juros'][:, None]
+    seguro = banco['taxa_mip'][:, None] * saldo_liberado + banco['seguro_dfi'][:, None]
+    encargos = np.where(ativo, banco['taxa_admin'][:, None] + seguro, 0.0)
+    juros = np.where(ativo, juros, 0.0)
+    return {
+        'meses': meses_restantes, 'percentual': percentual, 'saldo_liberado': saldo_liberado,
+        'juros': juros, 'encargos': encargos, 'parcela': juros + encargos,
+    }
+
+# ============================================
+# AMORTIZAÇÃO BANCÁRIA EM LOTE
+# ============================================
+
+def taxas_indexador_lote(banco, valores_reais, offset_mes, prazo, series_reais=None):
+    """Matriz (contratos x meses de amortização) da taxa do indexador, real quando houver, senão a média.
+
+    Os índices reais vêm de `valores_reais` (dicionário por mês, como em
+    `buscar_indices_bc`) ou de `series_reais` ({chave: matriz contratos x meses}).
+    """
+    n = len(prazo)
+    largura = int(prazo.max()) if n else 0
+    taxas = np.zeros((n, largura))
+    if largura == 0:
+        return taxas
+    lista_vr = como_lista(valores_reais, n)
+    cache = {}
+    colunas = offset_mes[:, None] + np.arange(largura)[None, :]
+    tamanho = int(colunas.max()) + 1
+    for i, pb in enumerate(banco['params_banco']):
+        indexador = pb.get('indexador', 'TR')
+        if indexador not in ('TR', 'IPCA', 'Poupança'):
+            continue
+        medio = {'TR': pb.get('tr_medio', 0.0), 'IPCA': pb.get('ipca_medio', 0.0), 'Poupança': pb.get('poupanca_medio', 0.0)}[indexador]
+        if series_reais is not None:
+            serie_contrato = series_reais.get(indexador.lower())
+            serie = np.full(tamanho, np.nan)
+            if serie_contrato is not None:
+                linha = serie_contrato[i] if np.ndim(serie_contrato) == 2 else serie_contrato
+                serie[:min(tamanho, len(linha))] = linha[:tamanho]
+        else:
+            vr = lista_vr[i]
+            chave = (id(vr), indexador)
+            if chave not in cache:
+                cache[chave] = serie_valores_reais(vr, indexador.lower(), tamanho)
+            serie = cache[chave]
+        serie = serie[colunas[i]]
+        taxas[i] = np.where(np.isnan(serie), medio, serie)
+    return taxas
+
+
+def simular_banco_lote(banco, prazo, taxas_indexador=None, diagnosticos=None):
+    """Amortização PRICE/SAC de todos os contratos, com seguros MIP/DFI, taxa de administração e indexador."""
+    valor = banco['valor_financiado']
+    n = len(valor)
+    prazo = np.asarray(prazo, dtype=np.int64)
+    invalido = (banco['sistema'] < 0) & (prazo > 0)
+    for i in np.flatnonzero(invalido):
+        sistema = banco['params_banco'][i].get('sistema_amortizacao', 'PRICE')
+        registrar_diagnostico(diagnosticos, 'erro', 'sistema_amortizacao_desconhecido', f'Sistema de amortização desconhecido: {sistema}. Use SAC ou PRICE.',
+                               unidade=int(i), sistema=sistema)
+    prazo = np.where(invalido, 0, prazo)
+    largura = int(prazo.max()) if n else 0
+    if taxas_indexador is None:
+        taxas_indexador = np.zeros((n, largura))
+
+    r = banco['taxa_juros']
+    prazo_seguro = np.maximum(prazo, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        parcela_price = np.where(r > 0, (r * valor) / (1 - (1 + r) ** (-prazo_seguro.astype(float))), valor / prazo_seguro)
+    amortizacao_sac = valor / prazo_seguro
+    price = banco['sistema'] == SISTEMA_PRICE
+
+    saldo = valor.copy()
+    colunas = {nome: np.zeros((n, largura)) for nome in ('juros', 'amortizacao', 'encargos', 'ajuste_index', 'saldo')}
+    for m in range(largura):
+        ativo = m < prazo
+        juros = saldo * r
+        ajuste = saldo * taxas_indexador[:, m]
+        encargos = banco['taxa_mip'] * saldo + banco['seguro_dfi'] + banco['taxa_admin']
+        amortizacao = np.where(price, parcela_price - juros, amortizacao_sac)
+        saldo_novo = np.maximum(saldo - amortizacao, 0)
+        colunas['juros'][:, m] = np.where(ativo, juros, 0.0)
+        colunas['amortizacao'][:, m] = np.where(ativo, amortizacao, 0.0)
+        colunas['encargos'][:, m] = np.where(ativo, encargos, 0.0)
+        colunas['ajuste_index'][:, m] = np.where(ativo, ajuste, 0.0)
+        colunas['saldo'][:, m] = np.where(ativo, saldo_novo, 0.0)
+        saldo = np.where(ativo, saldo_novo, saldo)
+
+    colunas['parcela'] = colunas['amortizacao'] + colunas['juros'] + colunas['encargos'] + colunas['ajuste_index']
+    colunas['prazo'] = prazo
+    return colunas
+
+# ============================================
+# CENÁRIOS EM LOTE
+# ============================================
+
+def _linhas_construtora_pre(entrada, construtora, ate_mes):
+    """Fases (assinatura, carência e meses 1..ate_mes) com pagamentos e deslocamento em meses."""
+    n = entrada['n']
+    carencia = entrada['carencia']
+    largura_carencia = int(carencia.max()) if n else 0
+    largura = construtora['parcela'].shape[1]
+    um = np.ones(n, dtype=np.int64)
+    return [
+        (entrada['pagamento_assinatura'][:, None], np.zeros((n, 1), dtype=np.int64), um),
+        (np.zeros((n, largura_carencia)), np.arange(1, largura_carencia + 1)[None, :].repeat(n, 0), carencia),
+        (construtora['parcela'], carencia[:, None] + np.arange(largura)[None, :], ate_mes),
+    ]
+
+
+def simular_cenarios_lote(lista_params, lista_params_banco=None, valores_reais=None, cenarios=CENARIOS, diagnosticos=None, series_reais=None, sombra=None, centavos=False):
+    """Avalia os cenários para todos os contratos e devolve, por cenário, as linhas de pagamento e os indicadores.
+
+    Para cada cenário o resultado contém: 'pagamentos' (contratos x linhas, na
+    ordem das tabelas do motor de referência), 'deslocamento' (mês de cada linha
+    contado da assinatura), 'linhas', 'custo_total', 'maior_parcela', 'cet',
+    'termino' (mês absoluto) e 'valido'. A chave 'detalhe' guarda as matrizes
+    intermediárias (construtora, juros de obra e banco) para usos em lote.
+
+    Os índices reais podem vir de `valores_reais` (um dicionário compartilhado
+    ou um por contrato) ou, já vetorizados, de `series_reais`: {'incc', 'ipca',
+    'tr', ...} -> matriz (contratos x meses de pagamento), com NaN onde não há dado.
+
+    `sombra` (padrão: SOMBRA['amostra']) sorteia contratos do lote para rodar
+    também no motor de referência; divergências viram diagnósticos 'divergencia_motores'.
+
+    Com `centavos=True` os valores são calculados em centavos inteiros com
+    arredondamento a cada passo (ver motor_centavos.py); os indicadores saem em
+    reais, cada cenário traz também 'pagamentos_centavos' e as matrizes de
+    'detalhe' ficam em centavos. A conferência em sombra não se aplica a esse modo.
+    """
+    n = len(lista_params)
+    entrada = preparar_construtora(lista_params, diagnosticos)
+    if series_reais is not None:
+        incc_real = _ajustar_largura(series_reais.get('incc'), n, entrada['meses'])
+        ipca_real = _ajustar_largura(series_reais.get('ipca'), n, entrada['meses'])
+    else:
+        incc_real = _series_por_contrato(valores_reais, 'incc', n, entrada['meses'])
+        ipca_real = _series_por_contrato(valores_reais, 'ipca', n, entrada['meses'])
+    if centavos:
+        import motor_centavos
+        entrada = motor_centavos.entrada_em_centavos(entrada)
+        construtora = motor_centavos.simular_construtora_centavos(entrada, incc_real, ipca_real)
+    else:
+        construtora = simular_construtora_lote(entrada, incc_real, ipca_real)
+    valido = entrada['valido']
+    n_pre = entrada['n_pre_total']
+    resultados = {'detalhe': {'entrada': entrada, 'construtora': construtora}}
+
+    if 'construtora' in cenarios:
+        fases = _linhas_construtora_pre(entrada, construtora, entrada['n_total'])
+        resultados['construtora'] = _indicadores(entrada, fases, valido, com_assinatura=valido)
+
+    bancarios = [c for c in cenarios if c in ('sequencial', 'associativo')]
+    if bancarios:
+        saldo_pre = np.where(valido, construtora['saldo_fim_pre'], 0)
+        banco = preparar_banco(lista_params_banco, saldo_pre / 100 if centavos else saldo_pre, diagnosticos)
+        prazo = np.where(valido, np.array([p['meses_pos'] if v else 0 for p, v in zip(lista_params, valido)], dtype=np.int64), 0)
+        taxas = taxas_indexador_lote(banco, valores_reais, n_pre, prazo, series_reais)
+        if centavos:
+            banco = motor_centavos.banco_em_centavos(banco, saldo_pre)
+            amortizacao = motor_centavos.simular_banco_centavos(banco, prazo, taxas, diagnosticos)
+        else:
+            amortizacao = simular_banco_lote(banco, prazo, taxas, diagnosticos)
+        resultados['detalhe'].update({'banco': banco, 'amortizacao': amortizacao})
+        prazo_valido = amortizacao['prazo']
+        fases_pre = _linhas_construtora_pre(entrada, construtora, n_pre)
+
+        if 'sequencial' in cenarios:
+            deslocamento_banco = (entrada['carencia'] + n_pre)[:, None] + np.arange(amortizacao['parcela'].shape[1])[None, :]
+            fases = fases_pre + [(amortizacao['parcela'], deslocamento_banco, prazo_valido)]
+            resultados['sequencial'] = _indicadores(entrada, fases, valido, com_assinatura=valido)
+
+        if 'associativo' in cenarios:
+            obra = simular_juros_obra_lote(entrada, banco, diagnosticos)
+            if centavos:
+                obra = motor_centavos.juros_obra_em_centavos(obra)
+            resultados['detalhe']['obra'] = obra
+            resultados['associativo'] = _cenario_associativo_lote(entrada, fases_pre, obra, amortizacao, valido)
+
+    if centavos:
+        for cenario in CENARIOS:
+            if cenario in resultados:
+                resultados[cenario] = motor_centavos.resultado_em_reais(resultados[cenario])
+        return resultados
+
+    amostra = SOMBRA['amostra'] if sombra is None else sombra
+    if amostra > 0:
+        from conferencia import conferir_em_sombra
+        conferir_em_sombra(lista_params, lista_params_banco, valores_reais, series_reais, resultados, cenarios, amostra, diagnosticos, rng=SOMBRA['rng'])
+    return resultados
+
+
+def _cenario_associativo_lote(entrada, fases_pre, obra, amortizacao, valido):
+    """Combina linhas pré-chaves da construtora com os juros de obra (mesmo mês) e acrescenta a amortização."""
+    n = entrada['n']
+    pag_c, desl_c, comp_c = compor_fases(fases_pre, n)
+    meses_obra = obra['meses']
+    largura_obra = obra['parcela'].shape[1]
+
+    # Juros de obra somados a cada linha da construtora no mesmo mês
+    idx = np.minimum(desl_c, max(largura_obra - 1, 0))
+    mascara = (desl_c < meses_obra[:, None]) & (np.arange(pag_c.shape[1])[None, :] < comp_c[:, None])
+    if largura_obra:
+        pag_c = pag_c + np.where(mascara, np.take_along_axis(obra['parcela'], idx, axis=1), 0.0)
+
+    # Meses de obra posteriores à última linha da construtora viram linhas próprias
+    ultimo_c = desl_c[np.arange(n), np.maximum(comp_c - 1, 0)]
+    sobra = np.maximum(meses_obra - 1 - ultimo_c, 0)
+    largura_sobra = int(sobra.max()) if n else 0
+    cols_sobra = np.minimum(ultimo_c[:, None] + 1 + np.arange(largura_sobra)[None, :], max(largura_obra - 1, 0))
+    pag_sobra = np.take_along_axis(obra['parcela'], cols_sobra, axis=1) if largura_obra and largura_sobra else np.zeros((n, largura_sobra))
+    desl_sobra = ultimo_c[:, None] + 1 + np.arange(largura_sobra)[None, :]
+
+    fim_pre = np.maximum(ultimo_c, meses_obra - 1)
+    prazo = amortizacao['prazo']
+    largura_banco = amortizacao['parcela'].shape[1]
+    fases = [(pag_c, desl_c, comp_c), (pag_sobra, desl_sobra, sobra),
+             (amortizacao['parcela'], (fim_pre + 1)[:, None] + np.arange(largura_banco)[None, :], prazo)]
+    # Com juros de obra, as linhas pré-chaves deixam de ter a fase 'Assinatura' e o CET considera todas as linhas
+    return _indicadores(entrada, fases, valido, com_assinatura=valido & (meses_obra == 0))
+
+
+def _indicadores(entrada, fases, valido, com_assinatura):
+    n = entrada['n']
+    pagamentos, deslocamento, linhas = compor_fases(fases, n)
+    pagamentos[~valido] = 0.0
+    linhas = np.where(valido, linhas, 0)
+    colunas = np.arange(pagamentos.shape[1])[None, :]
+    ocupada = colunas < linhas[:, None]
+
+    t0 = np.where(com_assinatura, pagamentos[:, 0] if pagamentos.shape[1] else 0.0, 0.0)
+    fluxo = np.where(com_assinatura[:, None], np.concatenate([pagamentos[:, 1:], np.zeros((n, 1))], axis=1), pagamentos)
+    cet = calcular_cet_lote(np.where(valido, entrada['valor_total'] - t0, 0.0), fluxo)
+
+    ultimo = np.maximum(linhas - 1, 0)
+    termino = entrada['mes_assinatura'] + deslocamento[np.arange(n), ultimo] if pagamentos.shape[1] else entrada['mes_assinatura']
+    return {
+        'pagamentos': pagamentos, 'deslocamento': deslocamento, 'linhas': linhas,
+        'custo_total': pagamentos.sum(axis=1),
+        'maior_parcela': np.where(linhas > 0, np.where(ocupada, pagamentos, -np.inf).max(axis=1, initial=-np.inf), 0.0),
+        'cet': cet, 'termino': termino, 'valido': valido & (linhas > 0),
+    }
+
+
+def resumo_cenarios_lote(resultados, cenarios=CENARIOS):
+    """Tabela com custo total, maior parcela, término e CET de cada contrato em cada cenário."""
+    quadros = []
+    for cenario in cenarios:
+        r = resultados[cenario]
+        quadros.append(pd.DataFrame({
+            'contrato': np.arange(len(r['linhas'])),
+            'cenario': cenario,
+            'custo_total': r['custo_total'],
+            'maior_parcela': r['maior_parcela'],
+            'termino': [data_do_mes_absoluto(m) if v else pd.NaT for m, v in zip(r['termino'], r['valido'])],
+            'cet': r['cet'],
+            'valido': r['valido'],
+        }))
+    return pd.concat(quadros, ignore_index=True)
@@ -0,0 +1,85 @@
+"""Comparação de várias ofertas de banco para o mesmo contrato.
+
+Cada oferta é um `params_banco` (taxa, indexador, sistema, taxa de
+administração, seguros...) com um 'nome'. Todas as ofertas são avaliadas numa
+única passada do motor vetorizado, nas rotas Pós-Chaves (Sequencial) e
+Associativo, e o resultado é uma tabela compacta, uma linha por oferta e rota,
+com CET, custo total, maior parcela e as posições em cada critério.
+"""
+import numpy as np
+import pandas as pd
+
+from motor_vetorizado import data_do_mes_absoluto, simular_cenarios_lote
+
+# Rotas bancárias comparadas: cenário do motor -> rótulo exibido
+ROTAS_OFERTAS = {
+    'sequencial': 'Pós-Chaves (Sequencial)',
+    'associativo': 'Associativo',
+}
+
+# Critério de ordenação -> coluna da tabela (todos: menor é melhor)
+CRITERIOS = {
+    'cet': 'CET (% a.a.)',
+    'custo_total': 'Custo Total (R$)',
+    'maior_parcela': 'Maior Parcela (R$)',
+}
+
+
+def comparar_ofertas(params, ofertas, valores_reais=None, diagnosticos=None, rotas=tuple(ROTAS_OFERTAS)):
+    """Simula todas as `ofertas` para o contrato `params` e devolve a tabela de comparação.
+
+    `ofertas` é uma lista de dicionários no formato de `params_banco`, com a
+    chave opcional 'nome'. As colunas 'Posição CET', 'Posição Custo' e
+    'Posição Parcela' ordenam as ofertas dentro de cada rota (1 = melhor);
+    ofertas inválidas ficam sem posição.
+    """
+    if not ofertas:
+        raise ValueError("informe ao menos uma oferta")
+    nomes = [oferta.get('nome') or f"Oferta {i + 1}" for i, oferta in enumerate(ofertas)]
+    lista_params_banco = [{k: v for k, v in oferta.items() if k != 'nome'} for oferta in ofertas]
+    n = len(ofertas)
+
+    # O mesmo contrato repetido uma vez por oferta; os índices reais são convertidos uma única vez
+    resultados = simular_cenarios_lote([params] * n, lista_params_banco, valores_reais, rotas, diagnosticos)
+
+    quadros = []
+    for rota in rotas:
+        r = resultados[rota]
+        quadro = pd.DataFrame({
+            'Oferta': nomes,
+            'Rota': ROTAS_OFERTAS[rota],
+            'Indexador': [pb.get('indexador', 'TR') for pb in lista_params_banco],
+            'Sistema': [pb.get('sistema_amortizacao', 'PRICE') for pb in lista_params_banco],
+            'Taxa (% a.a.)': [pb['taxa_juros_anual'] for pb in lista_params_banco],
+            CRITERIOS['cet']: np.where(r['valido'], r['cet'], np.nan),
+            CRITERIOS['custo_total']: np.where(r['valido'], r['custo_total'], np.nan),
+            CRITERIOS['maior_parcela']: np.where(r['valido'], r['maior_parcela'], np.nan),
+            'Término': [data_do_mes_absoluto(m) if v else pd.NaT for m, v in zip(r['termino'], r['valido'])],
+        })
+        for coluna, rotulo in ((CRITERIOS['cet'], 'Posição CET'), (CRITERIOS['custo_total'], 'Posição Custo'), (CRITERIOS['maior_parcela'], 'Posição Parcela')):
+            quadro[rotulo] = quadro[coluna].rank(method='min').astype('Int64')
+        quadros.append(quadro)
+    return pd.concat(quadros, ignore_index=True)
+
+
+def ranking_ofertas(tabela, criterio='cet'):
+    """Ordena a tabela de `comparar_ofertas` por rota e pelo critério escolhido."""
+    if criterio not in CRITERIOS:
+        raise ValueError(f"critério deve ser um de {list(CRITERIOS)}")
+    ordem_rotas = {rotulo: i for i, rotulo in enumerate(ROTAS_OFERTAS.values())}
+    return (tabela.assign(_rota=tabela['Rota'].map(ordem_rotas))
+                  .sort_values(['_rota', CRITERIOS[criterio]], na_position='last', kind='stable')
+                  .drop(columns='_rota')
+                  .reset_index(drop=True))
+
+
+def melhores_ofertas(tabela):
+    """Nome da melhor oferta de cada rota em cada critério."""
+    linhas = []
+    for rota, grupo in tabela.groupby('Rota', sort=False):
+        linha = {'Rota': rota}
+        for criterio, coluna in CRITERIOS.items():
+            valores = grupo[coluna]
+            linha[coluna] = grupo.loc[valores.idxmin(), 'Oferta'] if valores.notna().any() else None
+        linhas.append(linha)
+    return pd.DataFrame(linhas)
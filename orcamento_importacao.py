@@ -0,0 +1,62 @@
+"""Verifica o orçamento de tempo de importação do motor de simulação.
+
+Importa `motor` num interpretador novo com `-X importtime`, mede o tempo
+acumulado (melhor de N execuções) e confere que nenhum módulo pesado ou de
+rede foi carregado junto. Sai com código 1 se o orçamento for estourado.
+
+Uso:
+    python orcamento_importacao.py --orcamento-ms 1000 --repeticoes 3
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# Módulos que não podem ser carregados apenas por `import motor`
+MODULOS_PROIBIDOS = ('streamlit', 'sgs', 'numpy_financial', 'matplotlib', 'openpyxl', 'xlsxwriter')
+
+_SCRIPT = (
+    "import sys, json, {modulo}; "
+    "print(json.dumps([m for m in {proibidos!r} if m in sys.modules]))"
+)
+
+
+def medir_importacao(modulo='motor'):
+    """Retorna (tempo_ms, modulos_proibidos_carregados) de uma importação a frio de `modulo`."""
+    script = _SCRIPT.format(modulo=modulo, proibidos=MODULOS_PROIBIDOS)
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], capture_output=True, text=True, check=True)
+    tempo_us = 0
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:'):
+            continue
+        partes = [p.strip() for p in linha[len('import time:'):].split('|')]
+        if len(partes) == 3 and partes[2] == modulo:
+            tempo_us = int(partes[1])
+    carregados = json.loads(processo.stdout.strip().splitlines()[-1])
+    return tempo_us / 1000, carregados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de tempo de importação do motor")
+    parser.add_argument('--modulo', default='motor')
+    parser.add_argument('--orcamento-ms', type=float, default=1000.0)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    medicoes = [medir_importacao(args.modulo) for _ in range(max(1, args.repeticoes))]
+    melhor_ms = min(tempo for tempo, _ in medicoes)
+    carregados = sorted({m for _, lista in medicoes for m in lista})
+
+    print(f"import {args.modulo}: {melhor_ms:.1f} ms (orçamento {args.orcamento_ms:.0f} ms)")
+    falhou = False
+    if melhor_ms > args.orcamento_ms:
+        print("ERRO: orçamento de importação excedido")
+        falhou = True
+    if carregados:
+        print(f"ERRO: módulos pesados carregados na importação: {', '.join(carregados)}")
+        falhou = True
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == '__main__':
+    main()
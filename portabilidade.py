@@ -0,0 +1,94 @@
+"""Portabilidade do financiamento: quando compensa levar o saldo para outro banco.
+
+Para cada mês k da amortização pós-chaves, o saldo devedor remanescente do
+contrato atual é levado a uma nova oferta, com o prazo que resta. Todas as
+trocas possíveis são simuladas de uma vez pelo motor vetorizado (um "contrato"
+por mês de troca, com valor = saldo após k parcelas), reaproveitando o vetor de
+saldos do cronograma original. O resultado é a curva de economia por mês de
+troca, o melhor mês para trocar e o mês em que a economia paga os custos da troca.
+"""
+import numpy as np
+import pandas as pd
+
+from motor_vetorizado import (
+    data_do_mes_absoluto,
+    preparar_banco,
+    simular_banco_lote,
+    simular_cenarios_lote,
+    taxas_indexador_lote,
+)
+
+
+def analisar_portabilidade(params, params_banco_atual, params_banco_novo, valores_reais=None, custos_troca=0.0, diagnosticos=None):
+    """Simula a troca de banco em cada mês da amortização e devolve a curva de economia.
+
+    `custos_troca` reúne tarifas, avaliação e cartório pagos na troca. O seguro
+    da nova oferta é cotado sobre o valor financiado original, como o da oferta
+    atual: o MIP acompanha o saldo portado e o DFI permanece fixo. Retorna
+    um dicionário com 'curva' (DataFrame, uma linha por mês de troca: saldo
+    portado, parcelas restantes no banco atual, custo na nova oferta, economia
+    e meses para recuperar os custos), 'melhor_mes' (linha da curva com maior
+    economia), 'ultimo_mes_vantajoso' (último mês de troca com economia
+    positiva) e 'equilibrio' (data em que a troca no melhor mês se paga).
+    """
+    vazio = {'curva': pd.DataFrame(), 'melhor_mes': None, 'ultimo_mes_vantajoso': None, 'equilibrio': None}
+    # A amortização bancária é a mesma nas rotas sequencial e associativa
+    detalhe = simular_cenarios_lote([params], params_banco_atual, valores_reais, ('sequencial',), diagnosticos)['detalhe']
+    entrada, amortizacao = detalhe['entrada'], detalhe['amortizacao']
+    prazo = int(amortizacao['prazo'][0])
+    if not entrada['valido'][0] or prazo == 0:
+        return vazio
+    parcela_atual = amortizacao['parcela'][0, :prazo]
+    saldo_apos = amortizacao['saldo'][0, :prazo]
+    valor_financiado = detalhe['banco']['valor_financiado'][0]
+
+    # Troca antes da parcela k+1 (k = 0..prazo-1): porta o saldo após k parcelas pelo prazo restante
+    k = np.arange(prazo)
+    saldo_portado = np.concatenate([[valor_financiado], saldo_apos[:-1]])
+    prazo_restante = prazo - k
+    banco_novo = preparar_banco(params_banco_novo, np.full(prazo, valor_financiado), diagnosticos)
+    banco_novo['valor_financiado'] = saldo_portado
+    n_pre = int(entrada['n_pre_total'][0])
+    taxas = taxas_indexador_lote(banco_novo, valores_reais, n_pre + k, prazo_restante)
+    novo = simular_banco_lote(banco_novo, prazo_restante, taxas, diagnosticos)
+    parcela_nova = novo['parcela']
+
+    # Parcela atual alinhada ao mesmo mês de cada contrato novo (linha k, coluna j = mês k+j)
+    colunas = k[:, None] + np.arange(prazo)[None, :]
+    ativo = np.arange(prazo)[None, :] < prazo_restante[:, None]
+    parcela_atual_alinhada = np.where(ativo, parcela_atual[np.minimum(colunas, prazo - 1)], 0.0)
+
+    restante_atual = parcela_atual_alinhada.sum(axis=1)
+    custo_novo = parcela_nova.sum(axis=1)
+    economia = restante_atual - custo_novo - custos_troca
+
+    # Meses após a troca até a economia acumulada cobrir os custos
+    acumulada = np.cumsum(parcela_atual_alinhada - parcela_nova, axis=1)
+    recupera = (acumulada >= custos_troca) & ativo
+    meses_recuperacao = np.where(recupera.any(axis=1), recupera.argmax(axis=1) + 1, -1)
+
+    # Primeira parcela do banco: assinatura + carência + meses pré-chaves
+    mes_inicio = int(entrada['mes_assinatura'][0] + entrada['carencia'][0] + n_pre)
+    curva = pd.DataFrame({
+        'Parcela da Troca': k + 1,
+        'Mês da Troca': [data_do_mes_absoluto(mes_inicio + i) for i in k],
+        'Saldo Portado (R$)': saldo_portado,
+        'Prazo Restante': prazo_restante,
+        'Restante no Banco Atual (R$)': restante_atual,
+        'Custo na Nova Oferta (R$)': custo_novo,
+        'Economia (R$)': economia,
+        'Nova Parcela (R$)': parcela_nova[:, 0],
+        'Meses para Recuperar': pd.array(np.where(meses_recuperacao > 0, meses_recuperacao, pd.NA), dtype='Int64'),
+    })
+
+    melhor = int(np.argmax(economia))
+    vantajosos = np.flatnonzero(economia > 0)
+    equilibrio = None
+    if economia[melhor] > 0 and meses_recuperacao[melhor] > 0:
+        equilibrio = data_do_mes_absoluto(mes_inicio + melhor + meses_recuperacao[melhor] - 1)
+    return {
+        'curva': curva,
+        'melhor_mes': curva.iloc[melhor] if economia[melhor] > 0 else None,
+        'ultimo_mes_vantajoso': curva.iloc[vantajosos[-1]] if len(vantajosos) else None,
+        'equilibrio': equilibrio,
+    }
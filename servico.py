@@ -0,0 +1,538 @@
+"""Serviço HTTP/JSON local para simulações de financiamento.
+
+Expõe os três cenários do simulador (construtora, pós-chaves sequencial e
+associativo) e o cálculo de CET para integração com sistemas externos (CRM),
+sem depender da interface Streamlit. O trabalho é despachado para um pool de
+processos com fila limitada: quando a fila enche, o serviço responde 503 com
+`Retry-After` em vez de acumular requisições.
+
+Uso:
+    python servico.py servir --porta 8600 --processos 4 --fila 16 --sgs-local
+    python servico.py carga --url http://127.0.0.1:8600 --requisicoes 500 --concorrencia 16
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================================
+# VALIDAÇÃO DE REQUISIÇÕES
+# ============================================
+
+OBRIGATORIO = object()
+
+# Campos montados em `main()` do streamlit_app.py: nome -> (tipo, valor padrão)
+CAMPOS_CONSTRUTORA = {
+    'data_inicio_obra': ('data', OBRIGATORIO),
+    'mes_assinatura': ('mes_ano', OBRIGATORIO),
+    'mes_primeira_parcela': ('mes_ano', OBRIGATORIO),
+    'valor_total_imovel': ('numero', OBRIGATORIO),
+    'valor_entrada': ('numero', OBRIGATORIO),
+    'tipo_pagamento_entrada': (('Parcelada', 'Paga no ato'), 'Parcelada'),
+    'num_parcelas_entrada': ('inteiro', 0),
+    'entrada_mensal': ('numero', None),
+    'inicio_correcao': ('inteiro', 1),
+    'incc_medio': ('numero', 0.0),
+    'ipca_medio': ('numero', 0.0),
+    'meses_pre': ('inteiro', OBRIGATORIO),
+    'meses_pos': ('inteiro', OBRIGATORIO),
+    'parcelas_mensais_pre': ('numero', OBRIGATORIO),
+    'valor_amortizacao_pos': ('numero', OBRIGATORIO),
+    'parcelas_semestrais': ('extras', {}),
+    'parcelas_anuais': ('extras', {}),
+    'percentual_minimo_quitacao': ('numero', 0.3),
+    'limite_correcao': ('inteiro_opcional', None),
+}
+
+CAMPOS_BANCO = {
+    'taxa_juros_anual': ('numero', 0.0),
+    'indexador': (('TR', 'IPCA', 'Poupança', 'Fixa'), 'TR'),
+    'sistema_amortizacao': (('PRICE', 'SAC'), 'PRICE'),
+    'taxa_admin_mensal': ('numero', 0.0),
+    'seguro_total_primeira_parcela': ('numero', 0.0),
+    'percentual_dfi_estimado': ('numero', 30.0),
+    'tr_medio': ('numero', 0.0),
+    'ipca_medio': ('numero', 0.0),
+    'poupanca_medio': ('numero', 0.0),
+    'metodo_calculo_juros': (('Progressiva (S-Curve)', 'Linear', 'Manual'), 'Progressiva (S-Curve)'),
+    'marcos_liberacao': ('texto', ''),
+}
+
+# Equivalentes aos botões 1, 2 e 3 da interface
+MODOS_INDICES = ('medias', 'hibrido', 'bc')
+
+CENARIOS = ('construtora', 'sequencial', 'associativo')
+
+
+def _converter_campo(nome, tipo, valor):
+    if isinstance(tipo, tuple):
+        if valor not in tipo:
+            raise ValueError(f"deve ser um de {list(tipo)}")
+        return valor
+    if tipo == 'numero':
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            raise ValueError("deve ser numérico")
+        return float(valor)
+    if tipo in ('inteiro', 'inteiro_opcional'):
+        if valor is None and tipo == 'inteiro_opcional':
+            return None
+        if isinstance(valor, bool) or not isinstance(valor, int) or valor < 0:
+            raise ValueError("deve ser um inteiro não negativo")
+        return valor
+    if tipo == 'texto':
+        if not isinstance(valor, str):
+            raise ValueError("deve ser texto")
+        return valor
+    if tipo == 'mes_ano':
+        datetime.strptime(valor, "%m/%Y")
+        return valor
+    if tipo == 'data':
+        return date.fromisoformat(valor)
+    if tipo == 'extras':
+        if not isinstance(valor, dict):
+            raise ValueError("deve ser um objeto {mes: valor}")
+        extras = {}
+        for mes, v in valor.items():
+            mes_int = int(mes)
+            if mes_int <= 0 or isinstance(v, bool) or not isinstance(v, (int, float)) or v < 0:
+                raise ValueError("meses devem ser positivos e valores numéricos não negativos")
+            extras[mes_int] = float(v)
+        return extras
+    raise ValueError(f"tipo de campo desconhecido: {tipo}")
+
+
+def _validar_campos(dados, campos, prefixo):
+    if not isinstance(dados, dict):
+        return {}, [f"{prefixo}: deve ser um objeto JSON"]
+    resultado, erros = {}, []
+    for nome, (tipo, padrao) in campos.items():
+        if nome not in dados:
+            if padrao is OBRIGATORIO:
+                erros.append(f"{prefixo}.{nome}: campo obrigatório")
+            else:
+                resultado[nome] = padrao.copy() if isinstance(padrao, dict) else padrao
+            continue
+        try:
+            resultado[nome] = _converter_campo(nome, tipo, dados[nome])
+        except (TypeError, ValueError) as e:
+            erros.append(f"{prefixo}.{nome}: {e}")
+    desconhecidos = sorted(set(dados) - set(campos))
+    erros.extend(f"{prefixo}.{nome}: campo desconhecido" for nome in desconhecidos)
+    return resultado, erros
+
+
+def validar_requisicao(corpo, exigir_banco=True):
+    """Valida o corpo de uma requisição de cenário e devolve (params, params_banco, opcoes, erros)."""
+    if not isinstance(corpo, dict):
+        return None, None, None, ["corpo da requisição deve ser um objeto JSON"]
+
+    params, erros = _validar_campos(corpo.get('params'), CAMPOS_CONSTRUTORA, 'params')
+    params_banco, erros_banco = ({}, [])
+    if exigir_banco or 'params_banco' in corpo:
+        params_banco, erros_banco = _validar_campos(corpo.get('params_banco', {}), CAMPOS_BANCO, 'params_banco')
+    erros.extend(erros_banco)
+
+    if not erros:
+        if params['tipo_pagamento_entrada'] == 'Paga no ato':
+            params['num_parcelas_entrada'] = 0
+        elif params['num_parcelas_entrada'] < 1:
+            erros.append("params.num_parcelas_entrada: entrada parcelada exige ao menos 1 parcela")
+        if params['entrada_mensal'] is None:
+            n = params['num_parcelas_entrada']
+            params['entrada_mensal'] = params['valor_entrada'] / n if n > 0 else 0
+        if params['valor_total_imovel'] <= 0:
+            erros.append("params.valor_total_imovel: deve ser positivo")
+
+    modo = corpo.get('indices', 'medias')
+    if modo not in MODOS_INDICES:
+        erros.append(f"indices: deve ser um de {list(MODOS_INDICES)}")
+
+    return params, params_banco, {'indices': modo}, erros
+
+
+def validar_requisicao_cet(corpo):
+    """Valida o corpo de uma requisição de CET avulso."""
+    erros = []
+    if not isinstance(corpo, dict):
+        return None, None, ["corpo da requisição deve ser um objeto JSON"]
+    valor = corpo.get('valor_financiado')
+    pagamentos = corpo.get('pagamentos')
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        erros.append("valor_financiado: deve ser numérico")
+    if not isinstance(pagamentos, list) or not all(isinstance(p, (int, float)) and not isinstance(p, bool) for p in pagamentos):
+        erros.append("pagamentos: deve ser uma lista de números")
+    return valor, pagamentos, erros
+
+# ============================================
+# EXECUÇÃO NOS PROCESSOS DO POOL
+# ============================================
+
+def _inicializar_processo(sgs_local, arquivo_indices=None):
+    """Prepara o processo do pool, trocando o `sgs` pelo substituto local se pedido.
+
+    Com `arquivo_indices`, o processo lê os índices do instantâneo mantido pelo
+    processo principal, sem thread de renovação própria.
+    """
+    if sgs_local:
+        import sgs_local as substituto
+        sys.modules['sgs'] = substituto
+    import motor  # noqa: F401
+    if arquivo_indices:
+        import indices
+        indices.configurar_armazem(arquivo=arquivo_indices, segundo_plano=False)
+
+
+def _df_para_registros(df):
+    if df.empty:
+        return []
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+def executar_cenario(cenario, params, params_banco, opcoes):
+    """Executa um cenário no processo atual e devolve um resultado serializável em JSON."""
+    import indices
+    import motor
+
+    diagnosticos = []
+    valores_reais, ultimo_mes = None, 0
+    if opcoes['indices'] != 'medias':
+        total_meses = params.get('num_parcelas_entrada', 0) + params['meses_pre'] + params['meses_pos']
+        valores_reais, ultimo_mes, _ = indices.buscar_indices(params['mes_primeira_parcela'], total_meses, diagnosticos)
+        if opcoes['indices'] == 'bc':
+            if ultimo_mes == 0:
+                return {'erro': "Nenhum dado histórico encontrado para essa data.",
+                        'diagnosticos': [d.para_dict() for d in diagnosticos]}
+            # Como na interface, o limite de correção vale só para o cenário da construtora
+            if cenario == 'construtora':
+                params = dict(params, limite_correcao=ultimo_mes)
+
+    if cenario == 'construtora':
+        df = motor.simular_financiamento(params, valores_reais, diagnosticos)
+    elif cenario == 'sequencial':
+        df = motor.simular_cenario_combinado(params, params_banco, valores_reais, diagnosticos)
+    else:
+        df = motor.simular_cenario_associativo(params, params_banco, valores_reais, diagnosticos)
+
+    resumo = {
+        'custo_total': float(df['Parcela Total (R$)'].sum()) if not df.empty else 0.0,
+        'maior_parcela': float(df['Parcela Total (R$)'].max()) if not df.empty else 0.0,
+        'termino': df['DataObj'].iloc[-1].strftime("%m/%Y") if not df.empty else None,
+        'cet': motor.calcular_cet_cenario(df, params['valor_total_imovel']),
+        'ultimo_mes_indices_reais': ultimo_mes,
+    }
+    return {'cenario': cenario, 'resumo': resumo, 'parcelas': _df_para_registros(df),
+            'diagnosticos': [d.para_dict() for d in diagnosticos]}
+
+
+def executar_cet(valor_financiado, pagamentos):
+    """Calcula o CET avulso no processo atual."""
+    import motor
+    return {'cet': motor.calcular_cet(valor_financiado, pagamentos)}
+
+# ============================================
+# MÉTRICAS DE LATÊNCIA
+# ============================================
+
+class RegistroLatencia:
+    """Guarda as latências recentes por rota e calcula percentis."""
+
+    def __init__(self, janela=5000):
+        self._janela = janela
+        self._amostras = {}
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, rota, segundos, status):
+        with self._lock:
+            self._amostras.setdefault(rota, deque(maxlen=self._janela)).append(segundos)
+            chave = (rota, status)
+            self._contadores[chave] = self._contadores.get(chave, 0) + 1
+
+    def resumo(self):
+        with self._lock:
+            rotas = {}
+            for rota, amostras in self._amostras.items():
+                ordenadas = sorted(amostras)
+                rotas[rota] = {
+                    'amostras': len(ordenadas),
+                    **{f'p{p}_ms': percentil(ordenadas, p) * 1000 for p in (50, 90, 95, 99)},
+                    'max_ms': ordenadas[-1] * 1000,
+                }
+            for (rota, status), total in self._contadores.items():
+                rotas.setdefault(rota, {}).setdefault('status', {})[str(status)] = total
+            return rotas
+
+
+def percentil(ordenadas, p):
+    """Percentil pelo método do posto mais próximo sobre uma lista já ordenada."""
+    if not ordenadas:
+        return 0.0
+    posicao = max(0, min(len(ordenadas) - 1, math.ceil(p * len(ordenadas) / 100) - 1))
+    return ordenadas[posicao]
+
+# ============================================
+# SERVIDOR HTTP
+# ============================================
+
+class FilaCheia(Exception):
+    pass
+
+
+class Despachante:
+    """Pool de processos com fila limitada: rejeita trabalho quando a capacidade se esgota.
+
+    O processo principal mantém o armazém de índices do BC (renovado em
+    segundo plano) e os processos do pool leem o instantâneo que ele grava.
+    """
+
+    def __init__(self, processos=2, fila=8, sgs_local=False, timeout=60):
+        self.processos = processos
+        self.capacidade = processos + fila
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(self.capacidade)
+        self._em_andamento = 0
+        self._lock = threading.Lock()
+        _inicializar_processo(sgs_local)
+        import indices
+        self._pasta_indices = tempfile.mkdtemp(prefix='simulador_indices_')
+        arquivo_indices = os.path.join(self._pasta_indices, 'indices.pkl')
+        self.indices = indices.configurar_armazem(arquivo=arquivo_indices)
+        self._pool = ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_processo, initargs=(sgs_local, arquivo_indices))
+
+    @property
+    def em_andamento(self):
+        return self._em_andamento
+
+    def executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            raise FilaCheia()
+        with self._lock:
+            self._em_andamento += 1
+        try:
+            futuro = self._pool.submit(funcao, *args)
+        except Exception:
+            self._liberar()
+            raise
+        # A vaga só volta quando a tarefa termina de fato, mesmo que o cliente desista antes
+        futuro.add_done_callback(self._liberar)
+        try:
+            return futuro.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            futuro.cancel()
+            raise
+
+    def _liberar(self, futuro=None):
+        with self._lock:
+            self._em_andamento -= 1
+        self._vagas.release()
+
+    def aquecer(self):
+        """Força a criação e a importação do simulador em todos os processos e a primeira carga dos índices."""
+        futuros = [self._pool.submit(executar_cet, 0, []) for _ in range(self.processos)]
+        for f in futuros:
+            f.result()
+        self.indices.aguardar(self.timeout)
+
+    def encerrar(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self.indices.parar()
+        shutil.rmtree(self._pasta_indices, ignore_errors=True)
+
+
+class ManipuladorSimulacao(BaseHTTPRequestHandler):
+    despachante = None
+    latencias = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, status, corpo, cabecalhos=None):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        if self.path == '/saude':
+            self._responder(200, {'status': 'ok', 'em_andamento': self.despachante.em_andamento, 'capacidade': self.despachante.capacidade})
+        elif self.path == '/metricas':
+            self._responder(200, {'latencias': self.latencias.resumo(), 'em_andamento': self.despachante.em_andamento, 'capacidade': self.despachante.capacidade,
+                                  'indices': self.despachante.indices.metricas()})
+        else:
+            self._responder(404, {'erro': 'rota não encontrada'})
+
+    def do_POST(self):
+        inicio = time.perf_counter()
+        rota = self.path
+        status = 500
+        try:
+            status = self._tratar_post(rota)
+        finally:
+            self.latencias.registrar(rota, time.perf_counter() - inicio, status)
+
+    def _tratar_post(self, rota):
+        try:
+            tamanho = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            tamanho = -1
+        if tamanho < 0:
+            self.close_connection = True
+            self._responder(400, {'erros': ['Content-Length inválido']})
+            return 400
+        try:
+            corpo = json.loads(self.rfile.read(tamanho) or b'null')
+        except json.JSONDecodeError:
+            self._responder(400, {'erros': ['JSON inválido']})
+            return 400
+
+        if rota == '/cet':
+            valor, pagamentos, erros = validar_requisicao_cet(corpo)
+            funcao, args = executar_cet, (valor, pagamentos)
+        elif rota.startswith('/simular/') and rota[len('/simular/'):] in CENARIOS:
+            cenario = rota[len('/simular/'):]
+            params, params_banco, opcoes, erros = validar_requisicao(corpo, exigir_banco=cenario != 'construtora')
+            funcao, args = executar_cenario, (cenario, params, params_banco, opcoes)
+        else:
+            self._responder(404, {'erro': 'rota não encontrada'})
+            return 404
+
+        if erros:
+            self._responder(422, {'erros': erros})
+            return 422
+
+        try:
+            resultado = self.despachante.executar(funcao, *args)
+        except FilaCheia:
+            self._responder(503, {'erro': 'servidor ocupado, tente novamente'}, {'Retry-After': '1'})
+            return 503
+        except FuturesTimeoutError:
+            self._responder(504, {'erro': 'tempo limite de simulação excedido'})
+            return 504
+        except Exception as e:
+            self._responder(500, {'erro': f'falha na simulação: {e}'})
+            return 500
+
+        status = 422 if 'erro' in resultado else 200
+        self._responder(status, resultado)
+        return status
+
+
+def criar_servidor(host='127.0.0.1', porta=8600, processos=2, fila=8, sgs_local=False, timeout=60):
+    """Cria o servidor HTTP e o despachante associado (ainda sem atender requisições)."""
+    despachante = Despachante(processos=processos, fila=fila, sgs_local=sgs_local, timeout=timeout)
+    manipulador = type('Manipulador', (ManipuladorSimulacao,), {'despachante': despachante, 'latencias': RegistroLatencia()})
+    servidor = ThreadingHTTPServer((host, porta), manipulador)
+    servidor.daemon_threads = True
+    return servidor, despachante
+
+# ============================================
+# TESTE DE CARGA LOCAL
+# ============================================
+
+PAYLOAD_EXEMPLO = {
+    'params': {
+        'data_inicio_obra': '2025-10-01',
+        'mes_assinatura': '04/2026',
+        'mes_primeira_parcela': '05/2026',
+        'valor_total_imovel': 455750.0,
+        'valor_entrada': 22270.54,
+        'tipo_pagamento_entrada': 'Parcelada',
+        'num_parcelas_entrada': 3,
+        'incc_medio': 0.005446,
+        'ipca_medio': 0.004669,
+        'meses_pre': 17,
+        'meses_pos': 100,
+        'parcelas_mensais_pre': 3858.68,
+        'valor_amortizacao_pos': 3102.62,
+        'parcelas_semestrais': {'6': 6000.0, '12': 6000.0},
+        'parcelas_anuais': {'17': 43300.0},
+    },
+    'params_banco': {
+        'taxa_juros_anual': 10.0,
+        'taxa_admin_mensal': 25.0,
+        'seguro_total_primeira_parcela': 94.92,
+        'ipca_medio': 0.004669,
+        'poupanca_medio': 0.005,
+    },
+    'indices': 'hibrido',
+}
+
+
+def executar_carga(url, requisicoes=200, concorrencia=8, rotas=None):
+    """Dispara requisições concorrentes contra o serviço e devolve o resumo de latências do cliente."""
+    rotas = rotas or [f'/simular/{c}' for c in CENARIOS]
+    corpo = json.dumps(PAYLOAD_EXEMPLO).encode('utf-8')
+    latencias = RegistroLatencia(janela=requisicoes)
+
+    def disparar(i):
+        rota = rotas[i % len(rotas)]
+        pedido = urllib.request.Request(url.rstrip('/') + rota, data=corpo, headers={'Content-Type': 'application/json'})
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(pedido, timeout=120) as resposta:
+                resposta.read()
+                status = resposta.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except urllib.error.URLError:
+            status = 0
+        latencias.registrar(rota, time.perf_counter() - inicio, status)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(disparar, range(requisicoes)))
+    duracao = time.perf_counter() - inicio
+    return {'duracao_s': duracao, 'vazao_rps': requisicoes / duracao if duracao > 0 else 0.0, 'latencias': latencias.resumo()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP de simulação de financiamento")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_servir = sub.add_parser('servir', help="inicia o serviço HTTP")
+    p_servir.add_argument('--host', default='127.0.0.1')
+    p_servir.add_argument('--porta', type=int, default=8600)
+    p_servir.add_argument('--processos', type=int, default=2)
+    p_servir.add_argument('--fila', type=int, default=8, help="requisições aguardando além das em execução")
+    p_servir.add_argument('--timeout', type=float, default=60)
+    p_servir.add_argument('--sgs-local', action='store_true', help="usa séries sintéticas locais no lugar da API do BC")
+
+    p_carga = sub.add_parser('carga', help="executa um teste de carga contra o serviço")
+    p_carga.add_argument('--url', default='http://127.0.0.1:8600')
+    p_carga.add_argument('--requisicoes', type=int, default=200)
+    p_carga.add_argument('--concorrencia', type=int, default=8)
+
+    args = parser.parse_args()
+    if args.comando == 'servir':
+        servidor, despachante = criar_servidor(args.host, args.porta, args.processos, args.fila, args.sgs_local, args.timeout)
+        despachante.aquecer()
+        print(f"Servindo em http://{args.host}:{args.porta} ({args.processos} processos, capacidade {despachante.capacidade})")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+            despachante.encerrar()
+    else:
+        print(json.dumps(executar_carga(args.url, args.requisicoes, args.concorrencia), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
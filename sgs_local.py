@@ -0,0 +1,48 @@
+"""Substituto local do pacote `sgs` para testes de carga e execução offline.
+
+Expõe a mesma função `dataframe(ts_codes, start, end)` usada pelo simulador,
+devolvendo séries mensais sintéticas e determinísticas para os códigos do BC
+(192 INCC, 433 IPCA, 226 TR, 4390 Poupança). Nenhum acesso à rede é feito.
+"""
+import math
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+# Média mensal (%) e amplitude da oscilação sazonal de cada série
+SERIES_SINTETICAS = {
+    192: (0.55, 0.25),
+    433: (0.45, 0.20),
+    226: (0.08, 0.05),
+    4390: (0.55, 0.10),
+}
+
+# Atraso artificial (segundos) para imitar a latência da API do BC
+ATRASO_PADRAO = float(os.environ.get("SGS_LOCAL_ATRASO", "0"))
+
+
+def _valor_sintetico(codigo, data):
+    media, amplitude = SERIES_SINTETICAS.get(codigo, (0.0, 0.0))
+    fase = (data.year * 12 + data.month) / 12.0
+    return round(media + amplitude * math.sin(2 * math.pi * fase), 4)
+
+
+def dataframe(ts_codes, start, end, atraso=None):
+    """Retorna um DataFrame no formato de `sgs.dataframe` com valores sintéticos."""
+    atraso = ATRASO_PADRAO if atraso is None else atraso
+    if atraso > 0:
+        time.sleep(atraso)
+
+    if isinstance(ts_codes, int):
+        ts_codes = [ts_codes]
+    inicio = datetime.strptime(start, "%d/%m/%Y")
+    # Como na API real, não há dados publicados para meses futuros
+    fim = min(datetime.strptime(end, "%d/%m/%Y"), datetime.now())
+    datas = pd.date_range(inicio.replace(day=1), fim, freq="MS")
+    if len(datas) == 0:
+        return pd.DataFrame()
+
+    dados = {codigo: [_valor_sintetico(codigo, d) for d in datas] for codigo in ts_codes}
+    return pd.DataFrame(dados, index=datas)
@@ -1,633 +1,46 @@
+import hashlib
+import json
 import streamlit as st
 import pandas as pd
-import numpy as np
-import numpy_financial as npf
-from datetime import datetime, date
-from dateutil.relativedelta import relativedelta
-import sgs
+from datetime import date
+
+from motor import (
+    format_currency,
+    executor_cenarios,
+    simular_cenarios_completos,
+    agregar_diagnosticos,
+)
+from ofertas import CRITERIOS, comparar_ofertas, ranking_ofertas, melhores_ofertas
+from portabilidade import analisar_portabilidade
+from indices import armazem_padrao, buscar_indices
+from meta import METRICAS, VARIAVEIS, buscar_meta
+from estresse import CHOQUES, superficie_estresse
+from tabela_vendas import importar_tabela_vendas
+from carteira import ROTAS
+from servico import PAYLOAD_EXEMPLO, validar_requisicao
 
 # ============================================
-# UTILITÁRIAS (Sem alterações)
-# ============================================
-
-def format_currency(value):
-    """Formata valores no padrão brasileiro R$"""
-    if pd.isna(value) or not isinstance(value, (int, float)):
-        return "R$ 0,00"
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-def converter_juros_anual_para_mensal(taxa_anual):
-    """Converte taxa anual (ex: 0.12) para taxa efetiva mensal."""
-    if taxa_anual <= -1:
-        return -1
-    return (1 + taxa_anual)**(1/12) - 1
-
-def calcular_cet(valor_financiado, pagamentos):
-    """Calcula o Custo Efetivo Total (CET) anual a partir de um fluxo de caixa."""
-    if valor_financiado <= 0 or not any(p > 0 for p in pagamentos):
-        return 0.0
-    fluxo_de_caixa = [valor_financiado] + [-p for p in pagamentos]
-    try:
-        taxa_mensal = npf.irr(fluxo_de_caixa)
-        if np.isnan(taxa_mensal) or np.isinf(taxa_mensal):
-            return 0.0
-        taxa_anual = (1 + taxa_mensal)**12 - 1
-        return taxa_anual * 100
-    except Exception:
-        return 0.0
-
-# ============================================
-# LÓGICA DA CONSTRUTORA (Sem alterações)
-# ============================================
-
-def construir_parcelas_futuras(params):
-    parcelas = []
-    num_parcelas_entrada = params['num_parcelas_entrada'] if params['tipo_pagamento_entrada'] == 'Parcelada' else 0
-    
-    for mes in range(1, num_parcelas_entrada + 1):
-        parcelas.append({'mes': mes, 'valor_original': params['entrada_mensal'], 'correcao_acumulada': 0.0, 'tipo': 'entrada'})
-    
-    for mes in range(num_parcelas_entrada + 1, num_parcelas_entrada + 1 + params['meses_pre']):
-        valor_parcela = params['parcelas_mensais_pre']
-        mes_local = mes - num_parcelas_entrada
-        
-        for sem_mes in params['parcelas_semestrais']:
-            if mes_local == sem_mes:
-                valor_parcela += params['parcelas_semestrais'][sem_mes]
-        
-        for anu_mes in params['parcelas_anuais']:
-            if mes_local == anu_mes:
-                valor_parcela += params['parcelas_anuais'][anu_mes]
-        
-        if valor_parcela > 0:
-            parcelas.append({'mes': mes, 'valor_original': valor_parcela, 'correcao_acumulada': 0.0, 'tipo': 'pre'})
-            
-    for mes in range(num_parcelas_entrada + 1 + params['meses_pre'], num_parcelas_entrada + 1 + params['meses_pre'] + params['meses_pos']):
-        parcelas.append({'mes': mes, 'valor_original': params['valor_amortizacao_pos'], 'correcao_acumulada': 0.0, 'tipo': 'pos'})
-        
-    return parcelas
-
-def calcular_correcao(saldo, mes, fase, params, valores_reais):
-    if fase not in ['Assinatura', 'Carência']:
-        inicio_correcao = params.get('inicio_correcao', 1)
-        if inicio_correcao == 0:
-            inicio_correcao = 1
-        if mes < inicio_correcao:
-            return 0, 'N/A'
-            
-        limite = params.get('limite_correcao')
-        if limite is not None and mes > limite:
-            return 0, 'N/A'
-            
-        if valores_reais is not None and mes in valores_reais:
-            idx = valores_reais[mes]
-            if fase in ['Entrada','Pré', 'Carência'] and idx.get('incc') is not None and pd.notna(idx.get('incc')):
-                return saldo * idx['incc'], 'INCC'
-            elif fase == 'Pós' and idx.get('ipca') is not None and pd.notna(idx.get('ipca')):
-                return saldo * idx['ipca'], 'IPCA'
-                
-        if fase in ['Entrada','Pré', 'Carência']:
-            return saldo * params.get('incc_medio', 0), 'INCC (Médio)'
-        elif fase == 'Pós':
-            return saldo * params.get('ipca_medio', 0), 'IPCA (Médio)'
-            
-    return 0, 'N/A'
-
-def processar_parcelas_vencidas(parcelas_futuras, mes_atual):
-    vencidas = [p for p in parcelas_futuras if p['mes'] == mes_atual]
-    pagamento_total, amortizacao_total, correcao_paga_total = 0, 0, 0
-    
-    for parcela in vencidas:
-        pagamento_parcela = parcela['valor_original'] + parcela['correcao_acumulada']
-        pagamento_total += pagamento_parcela
-        amortizacao_total += parcela['valor_original']
-        correcao_paga_total += parcela['correcao_acumulada']
-        parcelas_futuras.remove(parcela)
-        
-    return pagamento_total, amortizacao_total, correcao_paga_total
-
-def verificar_quitacao_pre(params, total_amortizado_acumulado):
-    percentual = total_amortizado_acumulado / params['valor_total_imovel']
-    if percentual < params['percentual_minimo_quitacao']:
-        valor_fmt = format_currency(total_amortizado_acumulado)
-        st.warning(f"Atenção: valor quitado na pré ({valor_fmt}) equivale a {percentual*100:.2f}% do valor do imóvel, abaixo de {params['percentual_minimo_quitacao']*100:.0f}%.")
-
-def simular_financiamento(params, valores_reais=None):
-    historico = []
-    
-    try:
-        data_assinatura = datetime.strptime(params['mes_assinatura'], "%m/%Y")
-        data_primeira_parcela = datetime.strptime(params['mes_primeira_parcela'], "%m/%Y")
-        if data_primeira_parcela < data_assinatura:
-            st.error("O mês da primeira parcela não pode ser anterior ao mês de assinatura!")
-            return pd.DataFrame()
-    except:
-        st.error("Datas inválidas! Use o formato MM/AAAA.")
-        return pd.DataFrame()
-
-    saldo_devedor = params['valor_total_imovel']
-    amortizacao_total_acumulada = 0
-    amortizacao_assinatura = 0
-    
-    if params['tipo_pagamento_entrada'] == 'Paga no ato':
-        amortizacao_assinatura = params['valor_entrada']
-        
-    saldo_devedor -= amortizacao_assinatura
-    amortizacao_total_acumulada += amortizacao_assinatura
-    
-    historico.append({
-        'DataObj': data_assinatura,
-        'Mês/Data': f"Assinatura [{data_assinatura.strftime('%m/%Y')}]",
-        'Fase': 'Assinatura',
-        'Saldo Devedor': saldo_devedor,
-        'Parcela Total (R$)': amortizacao_assinatura,
-        'Amortização Base (R$)': amortizacao_assinatura,
-        'Correção Monetária Paga (R$)': 0,
-        'Taxa de Juros (%)': 0,
-        'Juros (R$)': 0,
-        'Correção Monetária Gerada (R$)': 0,
-        'Índice Correção': 'N/A',
-        'Encargos (R$)': 0
-    })
-    
-    meses_carencia = (data_primeira_parcela.year - data_assinatura.year) * 12 + (data_primeira_parcela.month - data_assinatura.month)
-    data_corrente_carencia = data_assinatura
-    saldo_temp_carencia = saldo_devedor
-    total_correcao_carencia = 0
-    
-    for i in range(meses_carencia):
-        data_corrente_carencia += relativedelta(months=1)
-        correcao_mes_carencia, indice_carencia = calcular_correcao(saldo_temp_carencia, 0, 'Carência', params, valores_reais)
-        total_correcao_carencia += correcao_mes_carencia
-        saldo_temp_carencia += correcao_mes_carencia
-        historico.append({
-            'DataObj': data_corrente_carencia,
-            'Mês/Data': f"Gerou Correção [{data_corrente_carencia.strftime('%m/%Y')}]",
-            'Fase': 'Carência',
-            'Saldo Devedor': saldo_devedor,
-            'Parcela Total (R$)': 0,
-            'Amortização Base (R$)': 0,
-            'Correção Monetária Paga (R$)': 0,
-            'Taxa de Juros (%)': 0,
-            'Juros (R$)': 0,
-            'Correção Monetária Gerada (R$)': correcao_mes_carencia,
-            'Índice Correção': indice_carencia,
-            'Encargos (R$)': 0
-        })
-        
-    parcelas_futuras = construir_parcelas_futuras(params)
-    
-    if total_correcao_carencia > 0 and parcelas_futuras:
-        total_original = sum(p['valor_original'] for p in parcelas_futuras)
-        if total_original > 0:
-            for p in parcelas_futuras:
-                p['correcao_acumulada'] += total_correcao_carencia * (p['valor_original'] / total_original)
-
-    num_parcelas_entrada = params.get('num_parcelas_entrada', 0)
-    total_meses_pagamento = num_parcelas_entrada + params['meses_pre'] + params['meses_pos']
-    mes_pos_chaves_contador = 0
-    
-    for mes_atual in range(1, total_meses_pagamento + 1):
-        data_mes = data_primeira_parcela + relativedelta(months=mes_atual-1)
-        
-        fase = 'Pós'
-        if mes_atual <= num_parcelas_entrada:
-            fase = 'Entrada'
-        elif mes_atual <= num_parcelas_entrada + params['meses_pre']:
-            fase = 'Pré'
-            
-        pagamento, amortizacao, correcao_paga = processar_parcelas_vencidas(parcelas_futuras, mes_atual)
-        amortizacao_total_acumulada += amortizacao
-        saldo_devedor -= (amortizacao + correcao_paga)
-        
-        correcao_mes, indice_mes = calcular_correcao(saldo_devedor, mes_atual, fase, params, valores_reais)
-        saldo_devedor += correcao_mes
-        
-        if parcelas_futuras and correcao_mes != 0:
-            total_original = sum(p['valor_original'] for p in parcelas_futuras)
-            if total_original > 0:
-                for p in parcelas_futuras:
-                    p['correcao_acumulada'] += correcao_mes * (p['valor_original'] / total_original)
-                    
-        taxa_juros_mes, juros_mes = 0.0, 0.0
-        if fase == 'Pós':
-            mes_pos_chaves_contador += 1
-            taxa_juros_mes = mes_pos_chaves_contador / 100.0
-            juros_mes = (amortizacao + correcao_paga) * taxa_juros_mes
-            
-        saldo_devedor = max(saldo_devedor, 0)
-        
-        historico.append({
-            'DataObj': data_mes,
-            'Mês/Data': f"{mes_atual} - [{data_mes.strftime('%m/%Y')}]",
-            'Fase': fase,
-            'Saldo Devedor': saldo_devedor,
-            'Parcela Total (R$)': pagamento + juros_mes,
-            'Amortização Base (R$)': amortizacao,
-            'Correção Monetária Paga (R$)': correcao_paga,
-            'Taxa de Juros (%)': taxa_juros_mes * 100 if fase == 'Pós' else 0,
-            'Juros (R$)': juros_mes,
-            'Correção Monetária Gerada (R$)': correcao_mes,
-            'Índice Correção': indice_mes,
-            'Encargos (R$)': 0
-        })
-        
-        if fase == 'Pré' and mes_atual == num_parcelas_entrada + params['meses_pre']:
-            verificar_quitacao_pre(params, amortizacao_total_acumulada)
-            
-    return pd.DataFrame(historico)
-
-# ============================================
-# BUSCAR ÍNDICES BC (Sem alterações)
-# ============================================
-
-def buscar_indices_bc(mes_inicial, meses_total):
-    try:
-        data_inicio_simulacao = datetime.strptime(mes_inicial, "%m/%Y").replace(day=1)
-        data_inicio_busca = data_inicio_simulacao - relativedelta(months=2)
-        data_fim_busca = data_inicio_simulacao + relativedelta(months=meses_total)
-        start_str = data_inicio_busca.strftime("%d/%m/%Y")
-        end_str = data_fim_busca.strftime("%d/%m/%Y")
-        
-        df = sgs.dataframe([192, 433, 226, 4390], start=start_str, end=end_str)
-        if df.empty:
-            return {}, 0, pd.DataFrame()
-            
-        df = df.rename(columns={192: 'incc', 433: 'ipca', 226: 'tr', 4390: 'poupanca'})
-        df['incc'] /= 100
-        df['ipca'] /= 100
-        df['tr'] /= 100
-        df['poupanca'] /= 100
-        
-        indices = {}
-        ultimo_mes_com_dado = 0
-        dados_por_data = {idx.strftime("%Y-%m-%d"): row.to_dict() for idx, row in df.iterrows()}
-        current_date_simulacao = data_inicio_simulacao
-        
-        for mes in range(1, meses_total + 1):
-            data_referencia_str = (current_date_simulacao - relativedelta(months=2)).strftime("%Y-%m-%d")
-            if data_referencia_str in dados_por_data:
-                valores = dados_por_data[data_referencia_str]
-                if pd.notna(valores.get('incc')) or pd.notna(valores.get('ipca')) or pd.notna(valores.get('tr')) or pd.notna(valores.get('poupanca')):
-                    ultimo_mes_com_dado = mes
-                indices[mes] = valores
-            else:
-                indices[mes] = {'incc': None, 'ipca': None, 'tr': None, 'poupanca': None}
-            current_date_simulacao += relativedelta(months=1)
-            
-        return indices, ultimo_mes_com_dado, df
-    except Exception as e:
-        st.error(f"Erro ao acessar dados do BC: {str(e)}")
-        return {}, 0, pd.DataFrame()
-
-# ============================================
-# LÓGICA DE JUROS DE OBRA (Sem alterações)
-# ============================================
-
-def _obter_percentual_obra(mes_obra_atual, prazo_obra_total, metodo, marcos={}):
-    """Calcula o percentual de conclusão da obra para um determinado mês."""
-    if mes_obra_atual <= 0:
-        return 0.0
-    if mes_obra_atual >= prazo_obra_total:
-        return 1.0
-        
-    percentual = 0.0
-    if metodo == 'Linear':
-        percentual = mes_obra_atual / prazo_obra_total
-    elif metodo == 'Progressiva (S-Curve)':
-        t = mes_obra_atual / prazo_obra_total
-        percentual = (3 * t**2) - (2 * t**3)
-    elif metodo == 'Manual':
-        if not marcos:
-            return 0.0
-        meses_ordenados = sorted(marcos.keys())
-        if mes_obra_atual < meses_ordenados[0]:
-            fator = mes_obra_atual / meses_ordenados[0]
-            percentual = marcos[meses_ordenados[0]] * fator
-        else:
-            mes_anterior, perc_anterior = 0, 0
-            encontrou_intervalo = False
-            for mes_marco in meses_ordenados:
-                if mes_obra_atual >= mes_marco:
-                    mes_anterior, perc_anterior = mes_marco, marcos[mes_marco]
-                else:
-                    mes_seguinte, perc_seguinte = mes_marco, marcos[mes_marco]
-                    if (mes_seguinte - mes_anterior) > 0:
-                        fator = (mes_obra_atual - mes_anterior) / (mes_seguinte - mes_anterior)
-                        percentual = perc_anterior + fator * (perc_seguinte - perc_anterior)
-                    else:
-                        percentual = perc_anterior
-                    encontrou_intervalo = True
-                    break
-            if not encontrou_intervalo:
-                mes_seguinte, perc_seguinte = prazo_obra_total, 100
-                if (mes_seguinte - mes_anterior) > 0:
-                    fator = (mes_obra_atual - mes_anterior) / (mes_seguinte - mes_anterior)
-                    percentual = perc_anterior + fator * (perc_seguinte - perc_anterior)
-                else:
-                    percentual = perc_anterior
-        percentual /= 100.0
-        
-    return min(1.0, max(0.0, percentual))
-
-
-def calcular_juros_obra_detalhado(params_gerais, params_banco, params_construtora, valor_financiado):
-    historico = []
-    data_assinatura_banco = datetime.strptime(params_gerais['mes_assinatura'], "%m/%Y")
-    data_inicio_obra = datetime.combine(params_construtora['data_inicio_obra'], datetime.min.time())
-
-    meses_obra_ate_contrato = (data_assinatura_banco.year - data_inicio_obra.year) * 12 + (data_assinatura_banco.month - data_inicio_obra.month)
-    prazo_restante_obra_usuario = params_construtora.get('num_parcelas_entrada', 0) + params_construtora['meses_pre']
-    prazo_obra_total_meses = meses_obra_ate_contrato + prazo_restante_obra_usuario
-    metodo_calculo = params_banco['metodo_calculo_juros']
-
-    if prazo_obra_total_meses <= 0:
-        return pd.DataFrame()
-        
-    marcos = {}
-    if metodo_calculo == 'Manual':
-        try:
-            items = params_banco['marcos_liberacao'].replace(" ", "").split(',')
-            for item in items:
-                mes, perc = item.split(':')
-                marcos[int(mes)] = float(perc)
-        except Exception:
-            st.error("Formato dos marcos de liberação inválido. Use: 'mes:percentual, mes:percentual'. Ex: '6:20, 12:50'")
-            return pd.DataFrame()
-            
-    meses_restantes_obra = prazo_obra_total_meses - meses_obra_ate_contrato
-    if meses_restantes_obra <= 0:
-        return pd.DataFrame()
-        
-    taxa_juros_mensal = (params_banco['taxa_juros_anual'] / 100) / 12
-    taxa_admin_mensal_valor = params_banco.get('taxa_admin_mensal', 0)
-    seguro_total_inicial = params_banco.get('seguro_total_primeira_parcela', 0)
-    percentual_dfi = params_banco.get('percentual_dfi_estimado', 30.0) / 100
-    valor_seguro_dfi = seguro_total_inicial * percentual_dfi
-    valor_seguro_mip_inicial = seguro_total_inicial - valor_seguro_dfi
-    taxa_mip = valor_seguro_mip_inicial / valor_financiado if valor_financiado > 0 else 0
-    
-    for i in range(meses_restantes_obra):
-        data_corrente = data_assinatura_banco + relativedelta(months=i)
-        mes_total_obra_atual = meses_obra_ate_contrato + i + 1
-        
-        percentual_conclusao_acumulado = _obter_percentual_obra(
-            mes_obra_atual=mes_total_obra_atual,
-            prazo_obra_total=prazo_obra_total_meses,
-            metodo=metodo_calculo,
-            marcos=marcos
-        )
-        
-        perc_obra_inicio_contrato = _obter_percentual_obra(
-            mes_obra_atual=meses_obra_ate_contrato,
-            prazo_obra_total=prazo_obra_total_meses,
-            metodo=metodo_calculo,
-            marcos=marcos
-        )
-        
-        percentual_conclusao_acumulado = max(perc_obra_inicio_contrato, percentual_conclusao_acumulado)
-        
-        saldo_liberado_obra = valor_financiado * percentual_conclusao_acumulado
-        juros_obra = saldo_liberado_obra * taxa_juros_mensal
-        
-        seguro_mip_obra = taxa_mip * saldo_liberado_obra
-        seguro_obra = seguro_mip_obra + valor_seguro_dfi
-        
-        encargos_obra = taxa_admin_mensal_valor + seguro_obra
-        parcela_obra = juros_obra + encargos_obra
-        
-        historico.append({
-            'DataObj': data_corrente,
-            'Mês/Data': f"Obra {i+1} - [{data_corrente.strftime('%m/%Y')}]",
-            'Fase': 'Juros de Obra',
-            'Saldo Devedor': valor_financiado,
-            'Amortização Base (R$)': 0,
-            'Juros (R$)': juros_obra,
-            'Correção Monetária Paga (R$)': 0,
-            'Encargos (R$)': encargos_obra,
-            'Parcela Total (R$)': parcela_obra,
-            'Correção Monetária Gerada (R$)': 0,
-            'Índice Correção': f'{percentual_conclusao_acumulado:.2%} concluído',
-            'Taxa de Juros (%)': taxa_juros_mensal * 100
-        })
-        
-    return pd.DataFrame(historico)
-
-# ============================================
-# SIMULAÇÃO BANCÁRIA (Sem alterações)
+# FUNÇÕES DE INTERFACE (MODIFICADO)
 # ============================================
 
-def simular_financiamento_bancario_completo(params_gerais, params_banco, params_construtora, valores_reais=None, offset_mes=0, include_obra=True, valor_financiado_override=None, prazo_amort_override=None):
-    historico_df = pd.DataFrame()
-    valor_financiado = valor_financiado_override if valor_financiado_override is not None else (params_gerais['valor_total_imovel'] - params_gerais['valor_entrada'])
-    taxa_juros_mensal = (params_banco['taxa_juros_anual'] / 100) / 12
-    taxa_admin_mensal_valor = params_banco.get('taxa_admin_mensal', 0)
-    
-    seguro_total_inicial = params_banco.get('seguro_total_primeira_parcela', 0)
-    percentual_dfi = params_banco.get('percentual_dfi_estimado', 30.0) / 100
-    valor_seguro_dfi = seguro_total_inicial * percentual_dfi
-    valor_seguro_mip_inicial = seguro_total_inicial - valor_seguro_dfi
-    taxa_mip = valor_seguro_mip_inicial / valor_financiado if valor_financiado > 0 else 0
-
-    indexador = params_banco.get('indexador', 'TR')
-    tr_medio = params_banco.get('tr_medio', 0.0)
-    ipca_medio = params_banco.get('ipca_medio', 0.0)
-    poupanca_medio = params_banco.get('poupanca_medio', 0.0)
-    sistema = params_banco.get('sistema_amortizacao', 'PRICE')
-    
-    if include_obra:
-        df_juros_obra = calcular_juros_obra_detalhado(params_gerais, params_banco, params_construtora, valor_financiado)
-        if not df_juros_obra.empty:
-            historico_df = pd.concat([historico_df, df_juros_obra], ignore_index=True)
-            
-    saldo_devedor = valor_financiado
-    prazo_amort = prazo_amort_override if prazo_amort_override is not None else params_construtora['meses_pos']
-    
-    if prazo_amort <= 0:
-        return historico_df
-        
-    data_inicio_amortizacao = datetime.strptime(params_gerais['mes_assinatura'], "%m/%Y")
-    if not historico_df.empty:
-        data_inicio_amortizacao = historico_df['DataObj'].max() + relativedelta(months=1)
-        
-    historico_amort = []
-    for i in range(prazo_amort):
-        data_corrente = data_inicio_amortizacao + relativedelta(months=i)
-        
-        taxa_index, indice_aplicado = 0, 'Fixa'
-        if indexador in ['TR', 'IPCA', 'Poupança']:
-            chave_mes = offset_mes + i + 1
-            if valores_reais and chave_mes in valores_reais and pd.notna(valores_reais[chave_mes].get(indexador.lower())):
-                taxa_index = valores_reais[chave_mes].get(indexador.lower(), 0) or 0
-                indice_aplicado = indexador
-            else:
-                if indexador == 'TR':
-                    taxa_index = tr_medio
-                elif indexador == 'IPCA':
-                    taxa_index = ipca_medio
-                elif indexador == 'Poupança':
-                    taxa_index = poupanca_medio
-                indice_aplicado = f'{indexador} (Médio)'
-                
-        juros = saldo_devedor * taxa_juros_mensal
-        ajuste_index = saldo_devedor * taxa_index
-        
-        seguro_mip = taxa_mip * saldo_devedor
-        seguro_mensal = seguro_mip + valor_seguro_dfi
-
-        encargos = seguro_mensal + taxa_admin_mensal_valor
-        amortizacao = 0
-        
-        if sistema == 'PRICE':
-            r, n = taxa_juros_mensal, prazo_amort
-            parcela_fix = (r * valor_financiado) / (1 - (1 + r) ** (-n)) if r > 0 else valor_financiado / n
-            amortizacao = parcela_fix - juros
-        elif sistema == 'SAC':
-            amortizacao = valor_financiado / prazo_amort
+def exibir_diagnosticos(diagnosticos):
+    """Mostra os avisos e erros devolvidos pelo motor, sem repetir mensagens iguais de cenários diferentes."""
+    for _, linha in agregar_diagnosticos(diagnosticos).iterrows():
+        if linha['nivel'] == 'erro':
+            st.error(linha['mensagem'])
         else:
-            st.error(f'Sistema de amortização desconhecido: {sistema}. Use SAC ou PRICE.')
-            return pd.DataFrame()
-            
-        parcela_total = amortizacao + juros + encargos + ajuste_index
-        saldo_devedor = max(saldo_devedor - amortizacao, 0)
-        
-        historico_amort.append({
-            'DataObj': data_corrente,
-            'Mês/Data': f"{i+1} - [{data_corrente.strftime('%m/%Y')}]",
-            'Fase': f'Amortização {sistema}',
-            'Saldo Devedor': saldo_devedor,
-            'Amortização Base (R$)': amortizacao,
-            'Juros (R$)': juros,
-            'Correção Monetária Paga (R$)': 0,
-            'Encargos (R$)': encargos,
-            'Parcela Total (R$)': parcela_total,
-            'Correção Monetária Gerada (R$)': ajuste_index,
-            'Índice Correção': indice_aplicado,
-            'Taxa de Juros (%)': taxa_juros_mensal * 100
-        })
-        
-    df_amort = pd.DataFrame(historico_amort)
-    return pd.concat([historico_df, df_amort], ignore_index=True) if not df_amort.empty else historico_df
-
-# ============================================
-# SIMULAÇÃO COMBINADA (Sem alterações)
-# ============================================
-
-def simular_cenario_combinado(params_construtora, params_banco, valores_reais=None):
-    df_full_constructor = simular_financiamento(params_construtora, valores_reais)
-    if df_full_constructor.empty:
-        return pd.DataFrame()
-        
-    df_pre = df_full_constructor[df_full_constructor['Fase'] != 'Pós'].copy()
-    if df_pre.empty:
-        return pd.DataFrame()
-        
-    valor_financiado_para_banco = df_pre['Saldo Devedor'].iloc[-1]
-    num_parcelas_entrada = params_construtora.get('num_parcelas_entrada', 0)
-    total_meses_pre_chaves = num_parcelas_entrada + params_construtora['meses_pre']
-    
-    try:
-        data_primeira_parcela = datetime.strptime(params_construtora['mes_primeira_parcela'], "%m/%Y")
-        data_inicio_banco = data_primeira_parcela + relativedelta(months=total_meses_pre_chaves)
-    except Exception:
-        data_inicio_banco = datetime.now()
-        
-    params_gerais_banco = {
-        'mes_assinatura': data_inicio_banco.strftime("%m/%Y"),
-        'valor_total_imovel': params_construtora['valor_total_imovel'],
-        'valor_entrada': params_construtora['valor_entrada']
-    }
-    
-    prazo_amort_para_banco = params_construtora['meses_pos']
-    
-    df_banco = simular_financiamento_bancario_completo(
-        params_gerais=params_gerais_banco,
-        params_banco=params_banco,
-        params_construtora=params_construtora,
-        valores_reais=valores_reais,
-        offset_mes=total_meses_pre_chaves,
-        include_obra=False,
-        valor_financiado_override=valor_financiado_para_banco,
-        prazo_amort_override=prazo_amort_para_banco
-    )
-    
-    if df_banco.empty:
-        return df_pre
-        
-    df_comb = pd.concat([df_pre, df_banco], ignore_index=True, sort=False)
-    df_comb = df_comb.sort_values('DataObj').reset_index(drop=True)
-    return df_comb
-
-# ============================================
-# SIMULAÇÃO ASSOCIATIVA (Sem alterações)
-# ============================================
-
-def simular_cenario_associativo(params_construtora, params_banco, valores_reais=None):
-    df_full_constructor = simular_financiamento(params_construtora, valores_reais)
-    if df_full_constructor.empty:
-        return pd.DataFrame()
-        
-    df_pre_construtora = df_full_constructor[df_full_constructor['Fase'] != 'Pós'].copy()
-    if df_pre_construtora.empty:
-        return pd.DataFrame()
-        
-    valor_financiado_banco_inicial = df_pre_construtora['Saldo Devedor'].iloc[-1]
-    data_assinatura_construtora = datetime.strptime(params_construtora['mes_assinatura'], "%m/%Y")
-    params_gerais_banco = {'mes_assinatura': data_assinatura_construtora.strftime("%m/%Y")}
-    
-    df_juros_obra = calcular_juros_obra_detalhado(
-        params_gerais=params_gerais_banco,
-        params_banco=params_banco,
-        params_construtora=params_construtora,
-        valor_financiado=valor_financiado_banco_inicial
-    )
-    
-    if not df_juros_obra.empty:
-        df_pre_combinado = pd.merge(df_pre_construtora, df_juros_obra, on='DataObj', how='outer', suffixes=('_c', '_b'))
-        
-        df_pre_combinado['Parcela Total (R$)_c'] = df_pre_combinado['Parcela Total (R$)_c'].fillna(0)
-        df_pre_combinado['Parcela Total (R$)_b'] = df_pre_combinado['Parcela Total (R$)_b'].fillna(0)
-        df_pre_combinado['Juros (R$)_b'] = df_pre_combinado['Juros (R$)_b'].fillna(0)
-        df_pre_combinado['Encargos (R$)_b'] = df_pre_combinado['Encargos (R$)_b'].fillna(0)
-        df_pre_combinado['Parcela Total (R$)'] = df_pre_combinado['Parcela Total (R$)_c'] + df_pre_combinado['Parcela Total (R$)_b']
-        df_pre_combinado['Juros (R$)'] = df_pre_combinado['Juros (R$)_b']
-        df_pre_combinado['Encargos (R$)'] = df_pre_combinado['Encargos (R$)_b']
-        
-        for col in ['Mês/Data', 'Fase', 'Saldo Devedor', 'Amortização Base (R$)', 'Correção Monetária Paga (R$)', 'Taxa de Juros (%)', 'Correção Monetária Gerada (R$)', 'Índice Correção']:
-            df_pre_combinado[col] = df_pre_combinado[f'{col}_c'].fillna(df_pre_combinado[f'{col}_b'])
-            
-        df_pre_combinado['Fase'] = 'Pré (Construtora + J. Obra)'
-        
-        colunas_finais = list(df_pre_construtora.columns)
-        df_pre_final = df_pre_combinado[colunas_finais]
-    else:
-        df_pre_final = df_pre_construtora
-        
-    data_inicio_amortizacao = df_pre_final['DataObj'].max() + relativedelta(months=1)
-    params_gerais_banco_pos = {'mes_assinatura': data_inicio_amortizacao.strftime("%m/%Y")}
-    prazo_amort_para_banco = params_construtora['meses_pos']
-    total_meses_pre_chaves = params_construtora.get('num_parcelas_entrada', 0) + params_construtora['meses_pre']
-    
-    df_banco_pos = simular_financiamento_bancario_completo(
-        params_gerais=params_gerais_banco_pos,
-        params_banco=params_banco,
-        params_construtora=params_construtora,
-        valores_reais=valores_reais,
-        offset_mes=total_meses_pre_chaves,
-        include_obra=False,
-        valor_financiado_override=valor_financiado_banco_inicial,
-        prazo_amort_override=prazo_amort_para_banco
-    )
-    
-    if df_banco_pos.empty:
-        return df_pre_final
-        
-    df_final = pd.concat([df_pre_final, df_banco_pos], ignore_index=True, sort=False)
-    return df_final.sort_values('DataObj').reset_index(drop=True)
-
-# ============================================
-# FUNÇÕES DE INTERFACE (MODIFICADO)
-# ============================================
+            st.warning(linha['mensagem'])
+
+def descrever_indices(metricas):
+    """Resumo da atualidade dos índices do BC compartilhados entre as sessões."""
+    if not metricas['carregado']:
+        if metricas['ultimo_erro']:
+            return f"Índices do BC indisponíveis: {metricas['ultimo_erro']}"
+        return "Índices do BC sendo carregados..."
+    horas = metricas['idade_segundos'] / 3600
+    publicado = max((m for m in metricas['ultimo_mes_publicado'].values() if m), key=lambda m: (m[3:], m[:2]), default='-')
+    situacao = "" if metricas['fresco'] else " (desatualizados, renovando)"
+    return f"Índices do BC atualizados há {horas:.1f} h, publicados até {publicado}{situacao}."
 
 def display_detailed_table(df, title):
     with st.expander(f"👁️ Ver Tabela Detalhada - {title}"):
@@ -891,21 +304,9 @@ def setup_ui():
             jcol3.number_input("Poupança média mensal (decimal)", format="%.6f", help="Usado se não houver dados do SGS. Ex: 0.5% = 0.005", key="poupanca_medio")
 
 
-def main():
-    st.set_page_config(layout="wide", page_title="Simulador e Comparador de Financiamento")
-    st.title("Simulador de Financiamento Imobiliário 🚧🏗️")
-    
-    # MODIFICADO: Removido df_banco e cet_banco da inicialização
-    for key in ['df_resultado', 'df_combinado', 'df_associativo', 'cet_construtora', 'cet_combinado', 'cet_associativo']:
-        if key not in st.session_state:
-            st.session_state[key] = pd.DataFrame() if 'df' in key else 0.0
-
-    if 'parametros_carregados' not in st.session_state:
-        carregar_parametros_padrao()
-            
-    setup_ui()
-
-    params = {
+def montar_params():
+    """Monta o dicionário de parâmetros da construtora a partir do session_state."""
+    return {
         'data_inicio_obra': st.session_state.data_inicio_obra,
         'mes_assinatura': st.session_state.mes_assinatura,
         'mes_primeira_parcela': st.session_state.mes_primeira_parcela,
@@ -925,8 +326,11 @@ def main():
         'parcelas_anuais': st.session_state.get('parcelas_anuais', {}),
         'percentual_minimo_quitacao': 0.3, 'limite_correcao': None
     }
-    
-    params_banco = {
+
+
+def montar_params_banco():
+    """Monta o dicionário de parâmetros do banco a partir do session_state."""
+    return {
         'taxa_juros_anual': st.session_state.get('taxa_juros_anual', 0.0),
         'indexador': st.session_state.get('indexador', 'TR'),
         'sistema_amortizacao': st.session_state.get('sistema_amortizacao', 'PRICE'),
@@ -940,66 +344,124 @@ def main():
         'marcos_liberacao': st.session_state.get('marcos_liberacao', '')
     }
 
+
+def assinatura_entradas(params, params_banco):
+    """Resumo (hash) das entradas que afetam os resultados, usado para evitar recálculos desnecessários."""
+    conteudo = json.dumps([params, params_banco], sort_keys=True, default=str)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+
+def simulacao_vigente(modo, entradas, indices=None):
+    """Indica se os resultados em tela já correspondem a este modo, a estas entradas e (com o BC) a esta cópia dos índices."""
+    atual = st.session_state.get('simulacao_atual')
+    return atual is not None and (atual['modo'], atual['entradas'], atual.get('indices')) == (modo, entradas, indices)
+
+
+def concluir_simulacao(modo, entradas, indices=None, ultimo_mes=0):
+    """Guarda a simulação em tela e redesenha a página (o aviso de parâmetros alterados fica no painel de entradas)."""
+    st.session_state.simulacao_atual = {'modo': modo, 'entradas': entradas, 'indices': indices, 'ultimo_mes': ultimo_mes}
+    st.rerun(scope="app")
+
+
+def run_full_simulation(params, params_banco, sim_params, real_values=None, diagnosticos=None):
+    # MODIFICADO: Removido reset de df_banco e cet_banco
+    st.session_state.df_resultado = pd.DataFrame()
+    st.session_state.df_combinado = pd.DataFrame()
+    st.session_state.df_associativo = pd.DataFrame()
+    st.session_state.cet_construtora, st.session_state.cet_combinado, st.session_state.cet_associativo = 0.0, 0.0, 0.0
+    diagnosticos = diagnosticos if diagnosticos is not None else []
+
+    # Os três cenários e seus CETs são simulados ao mesmo tempo (um processo por cenário)
+    resultados = simular_cenarios_completos(params, params_banco, sim_params, real_values, diagnosticos)
+    for scenario, df_key in [('construtora', 'df_resultado'), ('combinado', 'df_combinado'), ('associativo', 'df_associativo')]:
+        st.session_state[df_key], st.session_state[f'cet_{scenario}'] = resultados[scenario]
+
+    st.session_state.diagnosticos = diagnosticos
+    st.session_state.indices_simulacao = real_values
+
+
+@st.cache_resource(show_spinner=False)
+def contrato_calibracao():
+    """Contrato fixo (o exemplo do serviço HTTP) usado para avaliar o pool dos cenários."""
+    params, params_banco, _, _ = validar_requisicao(PAYLOAD_EXEMPLO)
+    return params, params_banco, params, None
+
+
+@st.fragment
+def painel_parametros():
+    """Painéis de entrada: reexecutam sozinhos a cada alteração, sem redesenhar os resultados."""
+    setup_ui()
+
+    # Os financiadores mudam o resto da página (cenário destacado, comparação de ofertas)
+    financiadores = (st.session_state.financiador_pre, st.session_state.financiador_pos)
+    if st.session_state.setdefault('financiadores_exibidos', financiadores) != financiadores:
+        st.session_state.financiadores_exibidos = financiadores
+        st.rerun(scope="app")
+
+    simulacao = st.session_state.get('simulacao_atual')
+    if simulacao and simulacao['entradas'] != assinatura_entradas(montar_params(), montar_params_banco()):
+        st.info("Os parâmetros mudaram desde a última simulação. Clique em um dos botões abaixo para atualizar os resultados.", icon="🔄")
+
+
+@st.fragment
+def painel_resultados():
+    """Botões de simulação e resultados: só recalculam quando as entradas relevantes mudam."""
+    params = montar_params()
+    params_banco = montar_params_banco()
+    entradas = assinatura_entradas(params, params_banco)
+
     st.header("Gerar Simulação e Comparar Cenários")
-    
-    def run_full_simulation(sim_params, real_values=None):
-        # MODIFICADO: Removido reset de df_banco e cet_banco
-        st.session_state.df_resultado = pd.DataFrame()
-        st.session_state.df_combinado = pd.DataFrame()
-        st.session_state.df_associativo = pd.DataFrame()
-        st.session_state.cet_construtora, st.session_state.cet_combinado, st.session_state.cet_associativo = 0.0, 0.0, 0.0
-
-        st.session_state.df_resultado = simular_financiamento(sim_params, real_values)
-        
-        if not st.session_state.df_resultado.empty:
-            # MODIFICADO: Removido todo o bloco de cálculo do cenário hipotético
-            
-            st.session_state.df_combinado = simular_cenario_combinado(params.copy(), params_banco, real_values)
-            st.session_state.df_associativo = simular_cenario_associativo(params.copy(), params_banco, real_values)
-            
-            # MODIFICADO: Simplificado loop de cálculo do CET
-            for scenario in ['construtora', 'combinado', 'associativo']:
-                df_key = {'construtora': 'df_resultado', 'combinado': 'df_combinado', 'associativo': 'df_associativo'}[scenario]
-                cet_key = f'cet_{scenario}'
-                df = st.session_state[df_key]
-                if not df.empty:
-                    pagamento_t0 = df['Parcela Total (R$)'].iloc[0] if not df[df['Fase'] == 'Assinatura'].empty else 0
-                    valor_financiado_liquido = sim_params['valor_total_imovel'] - pagamento_t0
-                    pagamentos_futuros = df['Parcela Total (R$)'][df['Fase'] != 'Assinatura'].tolist()
-                    st.session_state[cet_key] = calcular_cet(valor_financiado_liquido, pagamentos_futuros)
+    metricas_indices = armazem_padrao().metricas()
+    st.caption(descrever_indices(metricas_indices))
+    # Os modos com o BC refazem a simulação quando a cópia dos índices é renovada
+    versao_indices = metricas_indices['atualizado_em']
 
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         if st.button("1. Simular com Médias", type="primary", use_container_width=True):
-            run_full_simulation(params.copy())
+            if not simulacao_vigente('medias', entradas):
+                run_full_simulation(params, params_banco, params.copy())
+                concluir_simulacao('medias', entradas)
             
     with col2:
         if st.button("2. Simular Híbrido (BC + Médias)", use_container_width=True):
-            total_meses = params.get('num_parcelas_entrada', 0) + params['meses_pre'] + params['meses_pos']
-            valores_reais, ultimo_mes, _ = buscar_indices_bc(params['mes_primeira_parcela'], total_meses)
-            if ultimo_mes > 0:
-                st.info(f"Dados reais do BC aplicados até a parcela {ultimo_mes}.")
-            run_full_simulation(params.copy(), valores_reais)
+            if not simulacao_vigente('hibrido', entradas, versao_indices):
+                total_meses = params.get('num_parcelas_entrada', 0) + params['meses_pre'] + params['meses_pos']
+                diagnosticos = []
+                valores_reais, ultimo_mes, _ = buscar_indices(params['mes_primeira_parcela'], total_meses, diagnosticos)
+                run_full_simulation(params, params_banco, params.copy(), valores_reais, diagnosticos)
+                concluir_simulacao('hibrido', entradas, versao_indices, ultimo_mes)
             
     with col3:
         if st.button("3. Simular Apenas com BC (Puro)", use_container_width=True):
-            total_meses = params.get('num_parcelas_entrada', 0) + params['meses_pre'] + params['meses_pos']
-            valores_reais, ultimo_mes, _ = buscar_indices_bc(params['mes_primeira_parcela'], total_meses)
-            if ultimo_mes > 0:
-                params_sim = params.copy()
-                params_sim['limite_correcao'] = ultimo_mes
-                st.info(f"Dados reais do BC aplicados até a parcela {ultimo_mes}.")
-                run_full_simulation(params_sim, valores_reais)
-            else:
-                st.warning("Nenhum dado histórico encontrado para essa data.")
+            if not simulacao_vigente('bc', entradas, versao_indices):
+                total_meses = params.get('num_parcelas_entrada', 0) + params['meses_pre'] + params['meses_pos']
+                diagnosticos = []
+                valores_reais, ultimo_mes, _ = buscar_indices(params['mes_primeira_parcela'], total_meses, diagnosticos)
+                if ultimo_mes > 0:
+                    params_sim = params.copy()
+                    params_sim['limite_correcao'] = ultimo_mes
+                    run_full_simulation(params, params_banco, params_sim, valores_reais, diagnosticos)
+                    concluir_simulacao('bc', entradas, versao_indices, ultimo_mes)
+                else:
+                    exibir_diagnosticos(diagnosticos)
+                    st.warning("Nenhum dado histórico encontrado para essa data.")
         
     with col4:
         limite_manual = st.number_input("Limite Manual de Correção", min_value=0, value=params['meses_pre'] + params.get('num_parcelas_entrada', 0))
         if st.button("4. Simular com Limite", use_container_width=True):
-            params_sim = params.copy()
-            params_sim['limite_correcao'] = limite_manual
-            run_full_simulation(params_sim)
+            modo = f'limite:{limite_manual}'
+            if not simulacao_vigente(modo, entradas):
+                params_sim = params.copy()
+                params_sim['limite_correcao'] = limite_manual
+                run_full_simulation(params, params_banco, params_sim)
+                concluir_simulacao(modo, entradas)
             
+    simulacao = st.session_state.get('simulacao_atual')
+    if simulacao and simulacao.get('ultimo_mes'):
+        st.info(f"Dados reais do BC aplicados até a parcela {simulacao['ultimo_mes']}.")
+    exibir_diagnosticos(st.session_state.diagnosticos)
+
     if not st.session_state.df_resultado.empty:
         # MODIFICADO: Removido df_banco e cet_banco da chamada da função
         mostrar_comparacao(
@@ -1013,5 +475,220 @@ def main():
             st.session_state.financiador_pos
         )
 
+
+# Campos de cada oferta editáveis na tabela; os demais vêm dos parâmetros do banco acima
+COLUNAS_OFERTAS = {
+    'nome': st.column_config.TextColumn("Banco / Oferta", required=True),
+    'taxa_juros_anual': st.column_config.NumberColumn("Juros (% a.a.)", min_value=0.0, format="%.4f", required=True),
+    'indexador': st.column_config.SelectboxColumn("Indexador", options=['TR', 'IPCA', 'Poupança', 'Fixa'], required=True),
+    'sistema_amortizacao': st.column_config.SelectboxColumn("Sistema", options=['PRICE', 'SAC'], required=True),
+    'taxa_admin_mensal': st.column_config.NumberColumn("Admin (R$/mês)", min_value=0.0, format="%.2f"),
+    'seguro_total_primeira_parcela': st.column_config.NumberColumn("Seguro 1ª parcela (R$)", min_value=0.0, format="%.2f"),
+}
+
+
+@st.fragment
+def painel_ofertas():
+    """Comparação de várias ofertas de banco numa única simulação em lote."""
+    st.header("Comparar Ofertas de Bancos")
+    params_banco = montar_params_banco()
+    if 'ofertas_base' not in st.session_state:
+        st.session_state.ofertas_base = pd.DataFrame([{'nome': 'Oferta atual', **{c: params_banco[c] for c in COLUNAS_OFERTAS if c != 'nome'}}])
+
+    st.caption("Inclua uma linha por oferta recebida. Demais condições (seguro DFI, médias dos índices, evolução da obra) seguem os parâmetros do banco acima.")
+    editadas = st.data_editor(st.session_state.ofertas_base, column_config=COLUNAS_OFERTAS, num_rows="dynamic", hide_index=True, use_container_width=True, key="editor_ofertas")
+    c1, c2 = st.columns([1, 2])
+    criterio = c2.radio("Ordenar por", list(CRITERIOS), format_func=lambda c: CRITERIOS[c], horizontal=True, key="criterio_ofertas")
+
+    if c1.button("Comparar Ofertas", use_container_width=True):
+        linhas = editadas.dropna(subset=['taxa_juros_anual']).to_dict('records')
+        if not linhas:
+            st.warning("Informe ao menos uma oferta com taxa de juros.")
+        else:
+            ofertas = [{**params_banco, **{k: v for k, v in linha.items() if pd.notna(v)}} for linha in linhas]
+            diagnosticos = []
+            st.session_state.tabela_ofertas = comparar_ofertas(montar_params(), ofertas, st.session_state.get('indices_simulacao'), diagnosticos)
+            exibir_diagnosticos(diagnosticos)
+
+    tabela = st.session_state.get('tabela_ofertas')
+    if tabela is not None and not tabela.empty:
+        st.dataframe(melhores_ofertas(tabela), hide_index=True, use_container_width=True)
+        formatos = {CRITERIOS['custo_total']: format_currency, CRITERIOS['maior_parcela']: format_currency,
+                    CRITERIOS['cet']: "{:.2f}%", 'Taxa (% a.a.)': "{:.2f}%", 'Término': lambda d: d.strftime('%m/%Y') if pd.notna(d) else '-'}
+        st.dataframe(ranking_ofertas(tabela, criterio).style.format(formatos, na_rep='-'), hide_index=True, use_container_width=True)
+
+    st.subheader("Portabilidade")
+    st.caption("Em cada mês da amortização, leva o saldo devedor do banco atual para a oferta escolhida, pelo prazo restante.")
+    ofertas_validas = editadas.dropna(subset=['taxa_juros_anual']).to_dict('records')
+    nomes = [linha.get('nome') or f"Oferta {i + 1}" for i, linha in enumerate(ofertas_validas)]
+    c1, c2, c3 = st.columns(3)
+    escolhida = c1.selectbox("Nova oferta", range(len(nomes)), format_func=lambda i: nomes[i], key="oferta_portabilidade") if nomes else None
+    custos_troca = c2.number_input("Custos da troca (R$)", min_value=0.0, value=3000.0, step=500.0, key="custos_portabilidade")
+    c3.write("")
+    if c3.button("Analisar Portabilidade", use_container_width=True, disabled=escolhida is None):
+        linha = ofertas_validas[escolhida]
+        nova = {**params_banco, **{k: v for k, v in linha.items() if k != 'nome' and pd.notna(v)}}
+        diagnosticos = []
+        st.session_state.portabilidade = analisar_portabilidade(montar_params(), params_banco, nova, st.session_state.get('indices_simulacao'), custos_troca, diagnosticos)
+        exibir_diagnosticos(diagnosticos)
+
+    analise = st.session_state.get('portabilidade')
+    if analise is not None and not analise['curva'].empty:
+        melhor = analise['melhor_mes']
+        c1, c2, c3 = st.columns(3)
+        if melhor is None:
+            c1.metric("Melhor mês para trocar", "Não compensa")
+        else:
+            c1.metric("Melhor mês para trocar", melhor['Mês da Troca'].strftime('%m/%Y'), f"economia de {format_currency(melhor['Economia (R$)'])}")
+        ultimo = analise['ultimo_mes_vantajoso']
+        c2.metric("Compensa trocar até", ultimo['Mês da Troca'].strftime('%m/%Y') if ultimo is not None else "-")
+        c3.metric("Custos recuperados em", analise['equilibrio'].strftime('%m/%Y') if analise['equilibrio'] is not None else "-")
+        st.line_chart(analise['curva'].set_index('Mês da Troca')['Economia (R$)'])
+
+
+CENARIOS_META = {
+    'construtora': "Direto com a Construtora",
+    'sequencial': "Financiamento Pós-Chaves (Sequencial)",
+    'associativo': "Financiamento Associativo (Simultâneo)",
+}
+
+
+@st.fragment
+def painel_meta():
+    """Busca de meta: valor de uma entrada que leva uma métrica do cenário até o alvo."""
+    st.header("Busca de Meta")
+    st.caption("Encontra o menor valor da variável que deixa a métrica no alvo, mantendo as demais condições da simulação.")
+    c1, c2, c3 = st.columns(3)
+    cenario = c1.selectbox("Cenário", list(CENARIOS_META), format_func=CENARIOS_META.get, index=1, key="meta_cenario")
+    variavel = c2.selectbox("Variável", list(VARIAVEIS), format_func=lambda v: VARIAVEIS[v]['rotulo'], key="meta_variavel")
+    metrica = c3.selectbox("Métrica", list(METRICAS), format_func=METRICAS.get, key="meta_metrica")
+    c1, c2, c3 = st.columns(3)
+    sentido = c1.radio("A métrica deve ficar", ['maximo', 'minimo'], format_func={'maximo': "no máximo", 'minimo': "no mínimo"}.get, horizontal=True, key="meta_sentido")
+    alvo = c2.number_input("Alvo", value=11.0 if metrica == 'cet' else 5000.0, format="%.2f", key=f"meta_alvo_{metrica}")
+    c3.write("")
+    if c3.button("Buscar", use_container_width=True, key="meta_buscar"):
+        diagnosticos = []
+        params_banco = montar_params_banco() if cenario != 'construtora' else None
+        st.session_state.resultado_meta = (variavel, metrica, buscar_meta(montar_params(), params_banco, variavel, metrica, alvo, cenario,
+                                                                          st.session_state.get('indices_simulacao'), sentido, diagnosticos=diagnosticos))
+        exibir_diagnosticos(diagnosticos)
+
+    if st.session_state.get('resultado_meta'):
+        variavel, metrica, resultado = st.session_state.resultado_meta
+        if not resultado['atingivel']:
+            st.warning("Nenhum valor na faixa possível atinge esse alvo.")
+        else:
+            valor = resultado['valor'] if variavel == 'meses_pos' else format_currency(resultado['valor'])
+            obtido = f"{resultado['metricas'][metrica]:.2f}%" if metrica == 'cet' else format_currency(resultado['metricas'][metrica])
+            st.success(f"{VARIAVEIS[variavel]['rotulo']}: **{valor}** ({METRICAS[metrica]}: {obtido})")
+
+
+@st.fragment
+def painel_estresse():
+    """Teste de estresse: choques de INCC, juros e prazo respondidos pela superfície pré-calculada."""
+    st.header("Teste de Estresse")
+    st.caption("Os controles são respondidos por interpolação numa grade de choques simulada de uma vez; nos pontos da grade e após \"Recalcular exato\" os valores são exatos.")
+    params, params_banco = montar_params(), montar_params_banco()
+    diagnosticos = []
+    superficie = superficie_estresse(params, params_banco, st.session_state.get('indices_simulacao'), diagnosticos=diagnosticos)
+    exibir_diagnosticos(diagnosticos)
+
+    c1, c2, c3 = st.columns(3)
+    eixos = superficie.eixos
+    incc = c1.slider(CHOQUES['incc']['rotulo'], float(eixos['incc'][0]), float(eixos['incc'][-1]), 0.0, step=0.05, key="estresse_incc")
+    juros = c2.slider(CHOQUES['juros']['rotulo'], float(eixos['juros'][0]), float(eixos['juros'][-1]), 0.0, step=0.25, key="estresse_juros")
+    prazo = c3.slider(CHOQUES['prazo']['rotulo'], int(eixos['prazo'][0]), int(eixos['prazo'][-1]), 0, step=1, key="estresse_prazo")
+
+    posicao = (incc, juros, prazo)
+    if st.button("Recalcular exato", key="estresse_recalcular"):
+        st.session_state.estresse_exato = (posicao, superficie.exato(*posicao))
+    guardado = st.session_state.get('estresse_exato')
+    exato = guardado is not None and guardado[0] == posicao
+    resultados = guardado[1] if exato else superficie.interpolar(*posicao)
+    base = superficie.interpolar()
+
+    linhas = []
+    for cenario, r in resultados.items():
+        b = base[cenario]
+        linhas.append({
+            'Cenário': CENARIOS_META[cenario],
+            'Custo Total (R$)': r['custo_total'], 'Δ Custo (R$)': r['custo_total'] - b['custo_total'],
+            'Maior Parcela (R$)': r['maior_parcela'], 'Δ Parcela (R$)': r['maior_parcela'] - b['maior_parcela'],
+            'CET (% a.a.)': r['cet'], 'Δ CET (pp)': r['cet'] - b['cet'],
+        })
+    formatos = {c: format_currency for c in ['Custo Total (R$)', 'Δ Custo (R$)', 'Maior Parcela (R$)', 'Δ Parcela (R$)']}
+    formatos.update({'CET (% a.a.)': "{:.2f}%", 'Δ CET (pp)': "{:+.2f}"})
+    st.dataframe(pd.DataFrame(linhas).style.format(formatos, na_rep='-'), hide_index=True, use_container_width=True)
+    st.caption("Valores exatos nesta posição." if exato else f"Valores interpolados ({superficie.pontos} pontos simulados na grade).")
+
+
+@st.fragment
+def painel_tabela_vendas():
+    """Importação de uma tabela de vendas (XLSX) e simulação de todas as unidades em lote."""
+    st.header("Importar Tabela de Vendas")
+    st.caption("Uma linha por unidade com valor, entrada, mensais, semestrais e anuais. Datas, índices e prazo pós-chaves que a planilha não trouxer vêm dos parâmetros acima.")
+    c1, c2 = st.columns([2, 1])
+    arquivo = c1.file_uploader("Planilha (.xlsx)", type=['xlsx'], key="arquivo_tabela_vendas")
+    rota = c2.selectbox("Rota das unidades sem a coluna 'Rota'", list(ROTAS), key="rota_tabela_vendas")
+    if c2.button("Importar e Simular", use_container_width=True, disabled=arquivo is None):
+        params = montar_params()
+        padrao = {campo: params[campo] for campo in ('data_inicio_obra', 'mes_assinatura', 'mes_primeira_parcela', 'meses_pos', 'inicio_correcao', 'incc_medio', 'ipca_medio')}
+        padrao['rota'] = rota
+        try:
+            importacao = importar_tabela_vendas(arquivo, padrao)
+        except Exception as e:
+            st.session_state.tabela_vendas = None
+            st.error(f"Não foi possível ler a planilha: {e}")
+        else:
+            diagnosticos = []
+            carteira = importacao.simular(montar_params_banco(), st.session_state.get('indices_simulacao'), diagnosticos) if importacao.unidades else None
+            st.session_state.tabela_vendas = (importacao, carteira)
+            exibir_diagnosticos(diagnosticos)
+
+    if st.session_state.get('tabela_vendas'):
+        importacao, carteira = st.session_state.tabela_vendas
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Unidades importadas", len(importacao.unidades))
+        c2.metric("Linhas com erro", importacao.tabela_erros()['linha'].nunique())
+        c3.metric("Leitura", f"{importacao.duracao:.2f} s")
+        if importacao.erros:
+            with st.expander("Erros por linha", expanded=True):
+                st.dataframe(importacao.tabela_erros(), hide_index=True, use_container_width=True)
+        if importacao.informacoes.get('ignoradas'):
+            st.caption("Colunas ignoradas: " + ", ".join(importacao.informacoes['ignoradas']))
+        if carteira is not None:
+            resumo = carteira.resumo_unidades()
+            formatos = {'custo_total': format_currency, 'maior_parcela': format_currency, 'cet': "{:.2f}%",
+                        'termino': lambda d: d.strftime('%m/%Y') if pd.notna(d) else '-'}
+            st.dataframe(resumo.style.format(formatos, na_rep='-'), hide_index=True, use_container_width=True)
+            st.bar_chart(carteira.recebiveis('rota'))
+
+
+def main():
+    st.set_page_config(layout="wide", page_title="Simulador e Comparador de Financiamento")
+    st.title("Simulador de Financiamento Imobiliário 🚧🏗️")
+    # Primeira busca dos índices do BC em segundo plano já no carregamento da página
+    armazem_padrao()
+    
+    # MODIFICADO: Removido df_banco e cet_banco da inicialização
+    for key in ['df_resultado', 'df_combinado', 'df_associativo', 'cet_construtora', 'cet_combinado', 'cet_associativo']:
+        if key not in st.session_state:
+            st.session_state[key] = pd.DataFrame() if 'df' in key else 0.0
+    if 'diagnosticos' not in st.session_state:
+        st.session_state.diagnosticos = []
+
+    if 'parametros_carregados' not in st.session_state:
+        carregar_parametros_padrao()
+            
+    # Avalia o pool dos cenários em segundo plano (no primeiro carregamento e, depois, quando a medição vence)
+    executor_cenarios(calibracao=contrato_calibracao())
+    painel_parametros()
+    painel_resultados()
+    painel_meta()
+    painel_estresse()
+    painel_tabela_vendas()
+    if "Banco (Caixa, etc.)" in (st.session_state.get('financiador_pre'), st.session_state.get('financiador_pos')):
+        painel_ofertas()
+
 if __name__ == "__main__":
     main()
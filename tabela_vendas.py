@@ -0,0 +1,444 @@
+"""Importação em lote de tabelas de vendas da construtora (XLSX).
+
+As construtoras enviam uma planilha com uma linha por unidade: valor do
+imóvel, entrada, parcelas mensais, semestrais e anuais, saldo pós-chaves. A
+planilha é lida em modo de fluxo do openpyxl (`read_only`, uma linha por vez,
+sem carregar a pasta inteira), os cabeçalhos são reconhecidos pelos nomes mais
+comuns (sem diferenciar acentos, maiúsculas e "R$") e cada linha vira os
+`params` do motor, com quantas semestrais e anuais a planilha trouxer. Linhas
+com problema não interrompem a leitura: são devolvidas com a lista de erros.
+
+As unidades importadas seguem para `carteira.simular_carteira` (motor
+vetorizado, todas de uma vez); para pastas muito grandes, `ler_tabela_vendas`
+é um gerador que pode alimentar `fluxo.gerar_blocos`.
+
+Uso:
+    python tabela_vendas.py tabela.xlsx --assinatura 04/2026 --primeira-parcela 05/2026 --meses-pos 100
+    python tabela_vendas.py exemplo.xlsx --gerar-exemplo 5000
+"""
+import argparse
+import logging
+import re
+import time
+import unicodedata
+from datetime import date, datetime
+from functools import lru_cache
+
+import pandas as pd
+
+from carteira import ROTAS, simular_carteira
+from motor import format_currency
+
+# Condições comuns a todas as unidades quando a planilha não traz a coluna
+PADRAO_IMPORTACAO = {
+    'data_inicio_obra': None,
+    'mes_assinatura': None,
+    'mes_primeira_parcela': None,
+    'meses_pos': None,
+    'inicio_correcao': 1,
+    'incc_medio': 0.0,
+    'ipca_medio': 0.0,
+    'percentual_minimo_quitacao': 0.3,
+    'limite_correcao': None,
+    'rota': 'Construtora',
+}
+
+# Campo -> cabeçalhos aceitos, já normalizados por `normalizar_cabecalho`
+CABECALHOS = {
+    'unidade': {'unidade', 'unid', 'apto', 'apt', 'apartamento', 'lote', 'casa'},
+    'valor_total_imovel': {'total', 'total imovel', 'imovel', 'preco', 'preco total', 'venda', 'preco venda', 'total venda'},
+    'valor_entrada': {'entrada', 'entrada total', 'sinal', 'ato'},
+    'num_parcelas_entrada': {'qtd entrada'},
+    'parcelas_mensais_pre': {'mensal', 'mensal pre'},
+    'meses_pre': {'qtd mensal', 'qtd mensal pre', 'mes pre', 'qtd mes pre', 'prazo pre'},
+    'valor_pos': {'saldo', 'saldo pos', 'saldo pos chave', 'saldo devedor', 'pos chave', 'chave', 'financiamento'},
+    'meses_pos': {'qtd mes pos', 'mes pos', 'prazo pos', 'prazo pos chave', 'qtd pos'},
+    'rota': {'rota'},
+    'mes_assinatura': {'assinatura', 'mes assinatura'},
+    'mes_primeira_parcela': {'primeira', 'mes primeira', 'inicio pagamento'},
+    'data_inicio_obra': {'inicio obra'},
+}
+
+# Periodicidade padrão (em meses da fase pré-chaves) de cada tipo de parcela extra
+PERIODOS_EXTRAS = {'semestral': 6, 'anual': 12}
+
+# Palavras ignoradas e sinônimos aplicados antes da comparação dos cabeçalhos
+_IGNORADAS = {'r', 'rs', 'valor', 'parcela', 'de', 'da', 'do', 'das', 'dos', 'a', 'e', 'em'}
+_SINONIMOS = {
+    'n': 'qtd', 'no': 'qtd', 'num': 'qtd', 'numero': 'qtd', 'quantidade': 'qtd', 'quant': 'qtd', 'nro': 'qtd',
+    'mensais': 'mensal', 'semestrais': 'semestral', 'anuais': 'anual', 'parcelas': 'parcela', 'meses': 'mes',
+    'chaves': 'chave', 'intermediaria': 'semestral', 'intermediarias': 'semestral', 'anuidade': 'anual',
+}
+_EXTRA = re.compile(r'^(?P<mes>mes )?(?:(?P<ordem_antes>\d+)a? )?(?P<tipo>semestral|anual)(?: (?P<ordem>\d+))?$')
+_QTD_EXTRA = re.compile(r'^qtd (?P<tipo>semestral|anual)$')
+
+# Linhas percorridas à procura do cabeçalho (títulos e logotipos costumam vir antes)
+LINHAS_CABECALHO = 30
+
+
+def normalizar_cabecalho(texto):
+    """'Nº de Parcelas Mensais (R$)' -> 'qtd mensal': sem acentos, pontuação, palavras de ligação e plurais."""
+    if texto is None:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii').lower()
+    palavras = [_SINONIMOS.get(p, p) for p in re.split(r'[^a-z0-9]+', texto)]
+    return ' '.join(p for p in palavras if p and p not in _IGNORADAS)
+
+
+def mapear_colunas(cabecalho):
+    """Associa cada coluna do cabeçalho a um campo ou parcela extra.
+
+    Retorna (campos, extras, ignoradas): campos {campo: coluna}; extras
+    {(tipo, ordem): {'valor': coluna, 'mes': coluna}} (ordem None para a
+    coluna única repetida pela quantidade em {(tipo, 'qtd'): coluna}); e
+    os cabeçalhos não reconhecidos.
+    """
+    campos, extras, ignoradas = {}, {}, []
+    for coluna, texto in enumerate(cabecalho):
+        nome = normalizar_cabecalho(texto)
+        if not nome:
+            continue
+        campo = next((c for c, aceitos in CABECALHOS.items() if nome in aceitos), None)
+        if campo is not None and campo not in campos:
+            campos[campo] = coluna
+            continue
+        qtd = _QTD_EXTRA.match(nome)
+        if qtd:
+            extras[(qtd['tipo'], 'qtd')] = coluna
+            continue
+        extra = _EXTRA.match(nome)
+        if extra:
+            ordem = extra['ordem'] or extra['ordem_antes']
+            chave = (extra['tipo'], int(ordem) if ordem else None)
+            extras.setdefault(chave, {})['mes' if extra['mes'] else 'valor'] = coluna
+            continue
+        ignoradas.append(str(texto))
+    return campos, extras, ignoradas
+
+
+def _encontrar_cabecalho(linhas):
+    """Primeira linha (entre as LINHAS_CABECALHO iniciais) que traz unidade e valor do imóvel."""
+    for numero, linha in enumerate(linhas, start=1):
+        campos, extras, ignoradas = mapear_colunas(linha)
+        if 'valor_total_imovel' in campos and ('unidade' in campos or 'valor_entrada' in campos):
+            return numero, (campos, extras, ignoradas)
+        if numero >= LINHAS_CABECALHO:
+            break
+    raise ValueError(f"cabeçalho não encontrado nas primeiras {LINHAS_CABECALHO} linhas: são necessárias as colunas de unidade e valor do imóvel")
+
+# ============================================
+# CONVERSÃO DE CÉLULAS
+# ============================================
+
+def _vazio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _numero(valor):
+    """Número de uma célula: aceita numérico ou texto no formato brasileiro ('R$ 1.234,56')."""
+    if isinstance(valor, bool):
+        raise ValueError("esperado um número")
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = re.sub(r'[^\d,.\-]', '', str(valor))
+    if ',' in texto or re.fullmatch(r'-?\d{1,3}(\.\d{3})+', texto):
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return float(texto)
+    except ValueError:
+        raise ValueError(f"{valor!r} não é um número") from None
+
+
+def _inteiro(valor):
+    numero = _numero(valor)
+    if numero != int(numero):
+        raise ValueError(f"{valor!r} não é um número inteiro")
+    return int(numero)
+
+
+@lru_cache(maxsize=1024)
+def _mes_ano(valor):
+    """'MM/AAAA' a partir de data ou texto."""
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime("%m/%Y")
+    texto = str(valor).strip()
+    datetime.strptime(texto, "%m/%Y")
+    return texto
+
+
+@lru_cache(maxsize=1024)
+def _data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor).strip(), "%d/%m/%Y").date()
+
+# ============================================
+# LINHA -> PARAMS
+# ============================================
+
+def converter_linha(linha, campos, extras, padrao, numero=None):
+    """Converte uma linha da planilha em uma unidade de `carteira.simular_carteira`.
+
+    Retorna (unidade, erros), com os erros como dicionários 'linha',
+    'unidade' e 'erro'; com erros, a unidade é None. Devolve (None, []) para
+    linhas em branco, sem valores ou de totais.
+    """
+    def celula(campo):
+        coluna = campos.get(campo)
+        return None if coluna is None or coluna >= len(linha) else linha[coluna]
+
+    def coluna_extra(coluna):
+        return None if coluna is None or coluna >= len(linha) else linha[coluna]
+
+    valores = [celula(c) for c in ('valor_total_imovel', 'valor_entrada', 'parcelas_mensais_pre')]
+    if all(_vazio(v) for v in valores):
+        return None, []
+
+    identificacao = celula('unidade')
+    identificacao = f"linha {numero}" if _vazio(identificacao) else str(identificacao).strip()
+    if normalizar_cabecalho(identificacao).startswith('total'):
+        return None, []
+    erros = []
+
+    def ler(campo, conversor, obrigatorio=True, minimo=None):
+        bruto = celula(campo)
+        if _vazio(bruto):
+            bruto = padrao.get(campo)
+        if _vazio(bruto):
+            if obrigatorio:
+                erros.append(f"{campo}: ausente na planilha e nos padrões")
+            return None
+        try:
+            valor = conversor(bruto)
+        except (TypeError, ValueError) as e:
+            erros.append(f"{campo}: {e}")
+            return None
+        if minimo is not None and valor < minimo:
+            erros.append(f"{campo}: deve ser no mínimo {minimo}")
+            return None
+        return valor
+
+    valor_total = ler('valor_total_imovel', _numero, minimo=0.01)
+    valor_entrada = ler('valor_entrada', _numero, obrigatorio=False, minimo=0) or 0.0
+    num_entrada = ler('num_parcelas_entrada', _inteiro, obrigatorio=False, minimo=0) or 0
+    mensal = ler('parcelas_mensais_pre', _numero, obrigatorio=False, minimo=0) or 0.0
+    meses_pre = ler('meses_pre', _inteiro, obrigatorio=False, minimo=0) or 0
+    meses_pos = ler('meses_pos', _inteiro, minimo=0)
+    valor_pos = ler('valor_pos', _numero, obrigatorio=False, minimo=0)
+    mes_assinatura = ler('mes_assinatura', _mes_ano)
+    mes_primeira = ler('mes_primeira_parcela', _mes_ano)
+    inicio_obra = ler('data_inicio_obra', _data, obrigatorio=False)
+    rota = ler('rota', lambda v: str(v).strip().capitalize())
+    if rota is not None and rota not in ROTAS:
+        erros.append(f"rota: {rota!r} inválida, use {list(ROTAS)}")
+    if rota in ('Sequencial', 'Associativo') and inicio_obra is None:
+        erros.append("data_inicio_obra: obrigatória nas rotas bancárias")
+    if mensal > 0 and meses_pre == 0:
+        erros.append("meses_pre: parcela mensal informada sem a quantidade de meses")
+
+    parcelas_extras = {}
+    for tipo, periodo in PERIODOS_EXTRAS.items():
+        por_mes = {}
+        for _, ordem in [k for k in extras if k[0] == tipo and k[1] != 'qtd']:
+            colunas = extras[(tipo, ordem)]
+            bruto = coluna_extra(colunas.get('valor'))
+            if _vazio(bruto):
+                continue
+            rotulo = f"{tipo} {ordem}" if ordem else tipo
+            try:
+                valor = _numero(bruto)
+                if ordem is None:
+                    quantidade = coluna_extra(extras.get((tipo, 'qtd')))
+                    mes_inicial = coluna_extra(colunas.get('mes'))
+                    primeiro = _inteiro(mes_inicial) if not _vazio(mes_inicial) else periodo
+                    if not _vazio(quantidade):
+                        quantidade = _inteiro(quantidade)
+                    else:
+                        # Sem quantidade, a parcela se repete a cada período até o fim da fase pré-chaves
+                        quantidade = (meses_pre - primeiro) // periodo + 1 if meses_pre >= primeiro else 0
+                    meses = [primeiro + periodo * k for k in range(quantidade)]
+                else:
+                    mes = coluna_extra(colunas.get('mes'))
+                    meses = [_inteiro(mes) if not _vazio(mes) else periodo * ordem]
+            except ValueError as e:
+                erros.append(f"{rotulo}: {e}")
+                continue
+            if valor < 0:
+                erros.append(f"{rotulo}: valor negativo")
+                continue
+            for mes in meses:
+                if not 1 <= mes <= meses_pre:
+                    erros.append(f"{rotulo}: mês {mes} fora da fase pré-chaves (1 a {meses_pre})")
+                    break
+                por_mes[mes] = por_mes.get(mes, 0.0) + valor
+        parcelas_extras[tipo] = por_mes
+
+    if erros:
+        return None, [{'linha': numero, 'unidade': identificacao, 'erro': e} for e in erros]
+
+    total_pre = mensal * meses_pre + sum(parcelas_extras['semestral'].values()) + sum(parcelas_extras['anual'].values())
+    if valor_pos is None:
+        valor_pos = round(valor_total - valor_entrada - total_pre, 2)
+        if valor_pos < 0:
+            return None, [{'linha': numero, 'unidade': identificacao, 'erro': f"valor_pos: entrada e fase pré-chaves ({format_currency(valor_entrada + total_pre)}) superam o valor do imóvel ({format_currency(valor_total)})"}]
+    if valor_pos > 0 and meses_pos == 0:
+        return None, [{'linha': numero, 'unidade': identificacao, 'erro': "meses_pos: saldo pós-chaves sem prazo"}]
+
+    params = {
+        'data_inicio_obra': inicio_obra,
+        'mes_assinatura': mes_assinatura,
+        'mes_primeira_parcela': mes_primeira,
+        'valor_total_imovel': valor_total,
+        'valor_entrada': valor_entrada,
+        'tipo_pagamento_entrada': 'Parcelada' if num_entrada > 0 else 'Paga no ato',
+        'num_parcelas_entrada': num_entrada,
+        'entrada_mensal': valor_entrada / num_entrada if num_entrada > 0 else 0,
+        'inicio_correcao': padrao.get('inicio_correcao', 1),
+        'incc_medio': padrao.get('incc_medio', 0.0),
+        'ipca_medio': padrao.get('ipca_medio', 0.0),
+        'meses_pre': meses_pre,
+        'meses_pos': meses_pos,
+        'parcelas_mensais_pre': mensal,
+        'valor_amortizacao_pos': valor_pos / meses_pos if meses_pos > 0 else 0,
+        'parcelas_semestrais': parcelas_extras['semestral'],
+        'parcelas_anuais': parcelas_extras['anual'],
+        'percentual_minimo_quitacao': padrao.get('percentual_minimo_quitacao', 0.3),
+        'limite_correcao': padrao.get('limite_correcao'),
+    }
+    return {'unidade': identificacao, 'rota': rota, 'params': params, 'linha': numero}, []
+
+# ============================================
+# LEITURA DA PLANILHA
+# ============================================
+
+def ler_tabela_vendas(arquivo, padrao=None, aba=None, informacoes=None):
+    """Gera (numero_da_linha, unidade, erros) para cada linha de dados da planilha, em fluxo.
+
+    `arquivo` é um caminho ou arquivo aberto; `aba` escolhe a planilha (a
+    ativa por padrão); `padrao` completa as condições que a planilha não traz
+    (ver PADRAO_IMPORTACAO). Se `informacoes` for um dicionário, recebe
+    'aba', 'linha_cabecalho', 'colunas' e 'ignoradas' assim que o cabeçalho é lido.
+    """
+    from openpyxl import load_workbook
+
+    padrao = {**PADRAO_IMPORTACAO, **(padrao or {})}
+    pasta = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        planilha = pasta[aba] if aba else pasta.active
+        linhas = planilha.iter_rows(values_only=True)
+        numero_cabecalho, (campos, extras, ignoradas) = _encontrar_cabecalho(linhas)
+        if informacoes is not None:
+            informacoes.update({
+                'aba': planilha.title, 'linha_cabecalho': numero_cabecalho,
+                'colunas': {**campos, **{f"{t} {o}" if o is not None else t: c for (t, o), c in extras.items()}},
+                'ignoradas': ignoradas,
+            })
+        for numero, linha in enumerate(linhas, start=numero_cabecalho + 1):
+            unidade, erros = converter_linha(linha, campos, extras, padrao, numero)
+            if unidade is not None or erros:
+                yield numero, unidade, erros
+    finally:
+        pasta.close()
+
+
+class ImportacaoTabela:
+    """Resultado de `importar_tabela_vendas`: unidades válidas, erros por linha e o mapeamento das colunas."""
+
+    def __init__(self, unidades, erros, informacoes, duracao):
+        self.unidades = unidades
+        self.erros = erros
+        self.informacoes = informacoes
+        self.duracao = duracao
+
+    def tabela_erros(self):
+        """Uma linha por erro: linha da planilha, unidade e mensagem."""
+        return pd.DataFrame(self.erros, columns=['linha', 'unidade', 'erro'])
+
+    def simular(self, params_banco_padrao=None, valores_reais=None, diagnosticos=None):
+        """Simula todas as unidades válidas de uma vez (ver `carteira.simular_carteira`)."""
+        if not self.unidades:
+            raise ValueError("nenhuma unidade válida para simular")
+        return simular_carteira(self.unidades, params_banco_padrao, valores_reais, diagnosticos)
+
+
+def importar_tabela_vendas(arquivo, padrao=None, aba=None):
+    """Lê a planilha inteira e separa unidades válidas e erros por linha."""
+    inicio = time.perf_counter()
+    informacoes = {}
+    unidades, erros = [], []
+    for numero, unidade, erros_linha in ler_tabela_vendas(arquivo, padrao, aba, informacoes):
+        if unidade is not None:
+            unidades.append(unidade)
+        erros.extend(erros_linha)
+    return ImportacaoTabela(unidades, erros, informacoes, time.perf_counter() - inicio)
+
+# ============================================
+# LINHA DE COMANDO
+# ============================================
+
+def gerar_planilha_exemplo(caminho, unidades, semente=0):
+    """Grava uma tabela de vendas sintética (modo de escrita em fluxo) para testes de volume."""
+    import numpy as np
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(semente)
+    pasta = Workbook(write_only=True)
+    planilha = pasta.create_sheet("Tabela de Vendas")
+    planilha.append(["Tabela de Vendas - Empreendimento Exemplo"])
+    planilha.append([])
+    planilha.append(["Unidade", "Valor Total (R$)", "Entrada (R$)", "Nº Parcelas Entrada", "Parcela Mensal (R$)", "Qtd. Mensais",
+                     "1ª Semestral", "2ª Semestral", "3ª Semestral", "Anual (R$)", "Qtd. Anuais", "Prazo Pós-Chaves"])
+    for i in range(unidades):
+        total = round(float(rng.uniform(250_000, 900_000)), 2)
+        meses_pre = int(rng.integers(18, 42))
+        semestral = round(total * 0.01, 2)
+        planilha.append([f"{i // 8 + 1:03d}{i % 8 + 1:02d}", total, round(total * 0.05, 2), int(rng.integers(0, 4)),
+                         round(total * 0.004, 2), meses_pre, semestral, semestral, semestral if meses_pre >= 18 else None,
+                         round(total * 0.03, 2), meses_pre // 12, int(rng.choice([120, 240, 360]))])
+    pasta.save(caminho)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa uma tabela de vendas (XLSX) e simula todas as unidades em lote")
+    parser.add_argument('arquivo')
+    parser.add_argument('--aba')
+    parser.add_argument('--assinatura', default="04/2026", help="mês da assinatura (MM/AAAA) quando a planilha não traz")
+    parser.add_argument('--primeira-parcela', default="05/2026")
+    parser.add_argument('--inicio-obra', default="01/10/2025", help="DD/MM/AAAA")
+    parser.add_argument('--meses-pos', type=int, help="prazo pós-chaves quando a planilha não traz")
+    parser.add_argument('--incc', type=float, default=0.5446, help="INCC médio mensal (%%)")
+    parser.add_argument('--rota', default='Construtora', choices=list(ROTAS))
+    parser.add_argument('--gerar-exemplo', type=int, metavar='UNIDADES', help="grava uma planilha sintética em ARQUIVO antes de importar")
+    args = parser.parse_args()
+    logging.getLogger('motor').setLevel(logging.ERROR)
+
+    if args.gerar_exemplo:
+        gerar_planilha_exemplo(args.arquivo, args.gerar_exemplo)
+    padrao = {'mes_assinatura': args.assinatura, 'mes_primeira_parcela': args.primeira_parcela, 'meses_pos': args.meses_pos,
+              'data_inicio_obra': _data(args.inicio_obra), 'incc_medio': args.incc / 100, 'rota': args.rota}
+    importacao = importar_tabela_vendas(args.arquivo, padrao, args.aba)
+    info = importacao.informacoes
+    print(f"Aba '{info['aba']}', cabeçalho na linha {info['linha_cabecalho']}: {len(importacao.unidades)} unidades, "
+          f"{len(importacao.erros)} erros, leitura em {importacao.duracao:.2f} s")
+    if info['ignoradas']:
+        print("Colunas ignoradas:", ", ".join(info['ignoradas']))
+    if importacao.erros:
+        print(importacao.tabela_erros().head(20).to_string(index=False))
+    if not importacao.unidades:
+        return
+
+    banco = {'taxa_juros_anual': 10.0, 'indexador': 'TR', 'sistema_amortizacao': 'PRICE', 'taxa_admin_mensal': 25.0,
+             'seguro_total_primeira_parcela': 94.92, 'percentual_dfi_estimado': 30.0, 'tr_medio': 0.0, 'ipca_medio': 0.004669,
+             'poupanca_medio': 0.005, 'metodo_calculo_juros': 'Progressiva (S-Curve)', 'marcos_liberacao': ''}
+    inicio = time.perf_counter()
+    carteira = importacao.simular(banco)
+    duracao = time.perf_counter() - inicio
+    resumo = carteira.resumo_unidades()
+    print(f"Simulação em lote: {duracao:.2f} s")
+    print(resumo[['custo_total', 'maior_parcela', 'cet']].describe().round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""Configuração comum dos testes: raiz do projeto no caminho e `sgs_local` sem a API do BC."""
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+import sgs_local  # noqa: E402
+
+sys.modules['sgs'] = sgs_local
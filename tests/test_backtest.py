@@ -0,0 +1,17 @@
+"""Backtest histórico com as séries do `sgs_local`."""
+import numpy as np
+
+import servico
+from backtest import carregar_historico, executar_backtest
+
+
+def test_modo_puro_limita_so_a_construtora():
+    params, params_banco, _, _ = servico.validar_requisicao(servico.PAYLOAD_EXEMPLO)
+    historico = carregar_historico('01/2018')
+    hibrido = executar_backtest(params, params_banco, historico, '01/2018', modo='hibrido', diagnosticos=[])
+    puro = executar_backtest(params, params_banco, historico, '01/2018', modo='puro', diagnosticos=[])
+    assert len(puro) and puro.index.isin(hibrido.index).all()
+
+    for cenario in ('sequencial', 'associativo'):
+        np.testing.assert_allclose(puro[(cenario, 'custo_total')], hibrido.loc[puro.index, (cenario, 'custo_total')])
+    assert not np.allclose(puro[('construtora', 'custo_total')], hibrido.loc[puro.index, ('construtora', 'custo_total')])
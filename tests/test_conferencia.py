@@ -0,0 +1,51 @@
+"""Motor vetorizado contra o motor de referência em contratos sorteados."""
+import numpy as np
+import pytest
+
+import conferencia
+from conferencia import conferir_em_sombra, conferir_lote, executar_conferencia, gerar_contrato
+from motor_vetorizado import simular_cenarios_lote
+
+
+@pytest.mark.parametrize('semente', [0, 1, 2])
+def test_contratos_sorteados_sem_divergencia(semente):
+    contratos, divergencias = executar_conferencia(60, semente)
+    assert len(contratos) == 60
+    assert divergencias.empty, divergencias.head(20).to_string()
+
+
+def test_parcelas_pre_nulas_e_negativas():
+    rng = np.random.default_rng(7)
+    contratos = [gerar_contrato(rng) for _ in range(40)]
+    for i, (params, _, _) in enumerate(contratos):
+        params['meses_pre'] = max(params['meses_pre'], 12)
+        params['parcelas_mensais_pre'] = (0.0, -500.0, -8_000.0, 1_500.0)[i % 4]
+    lista_params, lista_pb, lista_vr = (list(coluna) for coluna in zip(*contratos))
+    divergencias = conferir_lote(lista_params, lista_pb, lista_vr)
+    assert divergencias.empty, divergencias.head(20).to_string()
+
+
+def test_gerador_cobre_parcelas_pre_nao_positivas():
+    rng = np.random.default_rng(0)
+    valores = [gerar_contrato(rng)[0]['parcelas_mensais_pre'] for _ in range(200)]
+    assert any(v == 0 for v in valores)
+    assert any(v < 0 for v in valores)
+
+
+def test_sombra_reproduzivel_com_semente(monkeypatch):
+    rng = np.random.default_rng(3)
+    contratos = [gerar_contrato(rng) for _ in range(30)]
+    lista_params, lista_pb, lista_vr = (list(coluna) for coluna in zip(*contratos))
+    resultados = simular_cenarios_lote(lista_params, lista_pb, lista_vr, diagnosticos=[], sombra=0)
+    escolhidos = []
+    monkeypatch.setattr(conferencia, 'comparar_contrato', lambda i, *args, **kwargs: escolhidos.append(i) or [])
+
+    def sorteados(semente):
+        escolhidos.clear()
+        conferir_em_sombra(lista_params, lista_pb, lista_vr, None, resultados, ('construtora',), 5, [],
+                           rng=np.random.default_rng(semente))
+        return list(escolhidos)
+
+    primeira = sorteados(11)
+    assert len(primeira) == 5
+    assert sorteados(11) == primeira
@@ -0,0 +1,42 @@
+"""Busca de meta sobre o contrato de exemplo do serviço."""
+import numpy as np
+import pytest
+
+import servico
+from meta import ResolvedorMeta
+
+
+@pytest.fixture
+def contrato_parcelado():
+    """Entrada parcelada em 3 vezes e sem extras: a maior parcela tem um vale estreito na entrada."""
+    params, params_banco, _, erros = servico.validar_requisicao(servico.PAYLOAD_EXEMPLO)
+    assert not erros and params['tipo_pagamento_entrada'] == 'Parcelada'
+    return dict(params, parcelas_semestrais={}, parcelas_anuais={}), params_banco
+
+
+def test_alvo_entre_pontos_da_varredura(contrato_parcelado):
+    params, params_banco = contrato_parcelado
+    assert ResolvedorMeta(params, params_banco).metricas(10000)['maior_parcela'] < 6500
+
+    resultado = ResolvedorMeta(params, params_banco).resolver('maior_parcela', 6500)
+    assert resultado['atingivel']
+    assert resultado['metricas']['maior_parcela'] <= 6500
+    # Menor entrada que atende: um centavo a menos já passa do alvo
+    resolvedor = ResolvedorMeta(params, params_banco)
+    assert resolvedor.metricas(resultado['valor'] - 0.01)['maior_parcela'] > 6500
+
+
+def test_preferir_maior_no_vale(contrato_parcelado):
+    params, params_banco = contrato_parcelado
+    resultado = ResolvedorMeta(params, params_banco).resolver('maior_parcela', 6500, preferir='maior')
+    assert resultado['atingivel']
+    assert resultado['metricas']['maior_parcela'] <= 6500
+    assert ResolvedorMeta(params, params_banco).metricas(resultado['valor'] + 0.01)['maior_parcela'] > 6500
+
+
+def test_alvo_abaixo_do_minimo_e_inatingivel(contrato_parcelado):
+    params, params_banco = contrato_parcelado
+    resolvedor = ResolvedorMeta(params, params_banco)
+    minimo = min(resolvedor.metricas(x)['maior_parcela'] for x in np.arange(0, 30000, 250))
+    resultado = ResolvedorMeta(params, params_banco).resolver('maior_parcela', minimo - 100)
+    assert not resultado['atingivel'] and resultado['valor'] is None
@@ -0,0 +1,76 @@
+"""Modo centavo exato: quitação, rateio da correção, extratos PRICE/SAC e conversão para reais."""
+import numpy as np
+import pytest
+
+from conferencia import gerar_contrato
+from motor_centavos import arredondar_centavos, simular_banco_centavos
+from motor_vetorizado import CENARIOS, SISTEMA_PRICE, SISTEMA_SAC, simular_cenarios_lote
+
+
+@pytest.fixture(scope='module')
+def lote():
+    rng = np.random.default_rng(7)
+    lista_params, lista_pb, lista_vr = (list(c) for c in zip(*[gerar_contrato(rng) for _ in range(150)]))
+    return simular_cenarios_lote(lista_params, lista_pb, lista_vr, diagnosticos=[], sombra=0, centavos=True)
+
+
+def test_arredondamento_meio_centavo_afasta_do_zero():
+    assert arredondar_centavos([0.5, 1.5, 2.5, -0.5, -2.5, 2227053.9999999995]).tolist() == [1, 2, 3, -1, -3, 2227054]
+
+
+def test_ultima_parcela_do_banco_zera_o_saldo(lote):
+    banco, amortizacao = lote['detalhe']['banco'], lote['detalhe']['amortizacao']
+    prazo = amortizacao['prazo']
+    com_prazo = np.flatnonzero(prazo > 0)
+    assert len(com_prazo)
+    for i in com_prazo:
+        assert amortizacao['saldo'][i, prazo[i] - 1] == 0
+        assert amortizacao['amortizacao'][i].sum() == banco['valor_financiado'][i]
+
+
+def test_correcao_gerada_paga_ou_no_saldo(lote):
+    entrada, construtora = lote['detalhe']['entrada'], lote['detalhe']['construtora']
+    cronograma = entrada['cronograma']
+    # Correção gerada com parcelas ainda por vencer vai para o rateio; a do fim fica no saldo
+    restante_depois = np.cumsum(cronograma[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    for i in np.flatnonzero(entrada['valido']):
+        gerada, paga = construtora['correcao_gerada'][i], construtora['correcao_paga'][i]
+        assert gerada.dtype == paga.dtype == np.int64
+        assert paga.sum() == gerada[:-1][restante_depois[i] > 0].sum()
+        if entrada['meses'] and (construtora['saldo'][i] > 0).all():
+            esperado = entrada['saldo_inicial'][i] - cronograma[i].sum() - paga.sum() + gerada.sum()
+            assert construtora['saldo'][i, -1] == esperado
+
+
+def _banco(sistema):
+    # R$ 1.000,00 a 1% a.m. em 3 parcelas; MIP de 0,01% do saldo, DFI R$ 1,00 e taxa de administração R$ 0,50
+    return {
+        'valor_financiado': np.array([100000], dtype=np.int64), 'taxa_juros': np.array([0.01]),
+        'sistema': np.array([sistema], dtype=np.int8), 'taxa_mip': np.array([0.0001]),
+        'seguro_dfi': np.array([100], dtype=np.int64), 'taxa_admin': np.array([50], dtype=np.int64),
+        'params_banco': [{}],
+    }
+
+
+@pytest.mark.parametrize('sistema, juros, amortizacao, encargos', [
+    # PRICE: parcela 1000 / (1 - 1,01^-3) = 340,0221 -> R$ 340,02; a última quita o saldo
+    (SISTEMA_PRICE, [1000, 670, 337], [33002, 33332, 33666], [160, 157, 153]),
+    # SAC: 1000 / 3 = 333,333 -> R$ 333,33 por mês; a última leva o centavo que sobra
+    (SISTEMA_SAC, [1000, 667, 333], [33333, 33333, 33334], [160, 157, 153]),
+])
+def test_extrato_price_e_sac(sistema, juros, amortizacao, encargos):
+    extrato = simular_banco_centavos(_banco(sistema), np.array([3]))
+    assert extrato['juros'][0].tolist() == juros
+    assert extrato['amortizacao'][0].tolist() == amortizacao
+    assert extrato['encargos'][0].tolist() == encargos
+    assert extrato['saldo'][0].tolist() == [100000 - sum(amortizacao[:1]), 100000 - sum(amortizacao[:2]), 0]
+    assert extrato['parcela'][0].tolist() == [j + a + e for j, a, e in zip(juros, amortizacao, encargos)]
+
+
+def test_resultado_em_reais_preserva_os_centavos(lote):
+    for cenario in CENARIOS:
+        resultado = lote[cenario]
+        centavos = resultado['pagamentos_centavos']
+        assert centavos.dtype == np.int64
+        np.testing.assert_array_equal(np.rint(resultado['pagamentos'] * 100).astype(np.int64), centavos)
+        np.testing.assert_array_equal(np.rint(resultado['custo_total'] * 100).astype(np.int64), centavos.sum(axis=1))
@@ -0,0 +1,48 @@
+"""Percentis de latência do serviço HTTP (também usados pelo teste de carga da interface)."""
+import pytest
+
+from servico import RegistroLatencia, percentil
+
+
+@pytest.mark.parametrize('p, esperado', [(50, 5), (90, 9), (95, 10), (99, 10), (100, 10), (10, 1), (1, 1), (0, 1)])
+def test_percentil_posto_mais_proximo(p, esperado):
+    assert percentil(list(range(1, 11)), p) == esperado
+
+
+def test_percentil_amostras_pares_e_impares():
+    assert percentil([1, 2, 3, 4], 50) == 2
+    assert percentil([1, 2, 3, 4, 5], 50) == 3
+    assert percentil([7], 99) == 7
+    assert percentil([], 50) == 0.0
+
+
+def test_registro_latencia_resumo():
+    registro = RegistroLatencia()
+    for i in range(1, 11):
+        registro.registrar('/cet', i / 1000, 200)
+    registro.registrar('/cet', 0.5, 503)
+    resumo = registro.resumo()['/cet']
+    assert resumo['amostras'] == 11
+    assert resumo['p50_ms'] == pytest.approx(6)
+    assert resumo['p90_ms'] == pytest.approx(10)
+    assert resumo['max_ms'] == pytest.approx(500)
+    assert resumo['status'] == {'200': 10, '503': 1}
+
+
+def test_modo_bc_igual_a_interface():
+    import indices
+    import motor
+    from servico import PAYLOAD_EXEMPLO, executar_cenario, validar_requisicao
+
+    params, params_banco, opcoes, erros = validar_requisicao(dict(PAYLOAD_EXEMPLO, indices='bc'))
+    assert not erros
+    total_meses = params['num_parcelas_entrada'] + params['meses_pre'] + params['meses_pos']
+    valores_reais, ultimo_mes, _ = indices.buscar_indices(params['mes_primeira_parcela'], total_meses, [])
+    assert ultimo_mes > 0
+    # Como o botão "Simular Apenas com BC": o limite de correção só na construtora
+    interface = motor.simular_cenarios_completos(params, params_banco, dict(params, limite_correcao=ultimo_mes), valores_reais, [], executor=False)
+    for cenario, chave in (('construtora', 'construtora'), ('sequencial', 'combinado'), ('associativo', 'associativo')):
+        resumo = executar_cenario(cenario, params, params_banco, opcoes)['resumo']
+        df, cet = interface[chave]
+        assert resumo['custo_total'] == pytest.approx(df['Parcela Total (R$)'].sum())
+        assert resumo['cet'] == pytest.approx(cet)